@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+"""
+Benchmark module upgrades against local file:// remotes, counting the git
+commands and network operations (fetch, pull, ls-remote, clone) each
+upgrade makes.
+
+    $ python bench/git_upgrade.py [--modules 20]
+
+Requires GitPython and the git executable. Runs the upgrade path used by
+"lense module upgrade" (ls-remote pre-check, branch fetch, fast-forward
+merge) and, for comparison, the previous path (fetch, ref scans, pull,
+fetch).
+"""
+import sys
+import shutil
+import argparse
+import subprocess
+from time import time
+from tempfile import mkdtemp
+from os import path, makedirs
+
+# Client libraries from the source tree
+sys.path.insert(0, path.join(path.dirname(path.dirname(path.abspath(__file__))), 'usr', 'lib', 'python2.7', 'dist-packages'))
+
+try:
+    import builtins
+except ImportError:
+    import __builtin__ as builtins
+
+# The client imports its exceptions from lense-common
+try:
+    import lense.common.exceptions
+except ImportError:
+    import types
+    exceptions = types.ModuleType('lense.common.exceptions')
+    exceptions.ClientError  = type('ClientError', (Exception,), {})
+    exceptions.RequestError = type('RequestError', (Exception,), {})
+    sys.modules['lense.common'] = types.ModuleType('lense.common')
+    sys.modules['lense.common.exceptions'] = exceptions
+
+from git.cmd import Git
+
+# Commands talking to the remote
+NETWORK = ['fetch', 'pull', 'ls-remote', 'clone']
+
+class Quiet(object):
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+class BenchClient(Quiet):
+    ARGS = {}
+
+    def conf(self, section, key, default=None):
+        return default
+
+    @staticmethod
+    def confget(block, key, default=None):
+        value = block.get(key) if isinstance(block, dict) else None
+        return default if value is None else value
+
+    def ensure(self, result, value=None, isnot=None, error=None, code=None):
+        if (value is not None and not result == value) or (isnot is not None and result == isnot):
+            raise Exception(error)
+        return result
+
+class BenchLense(object):
+    CLIENT   = BenchClient()
+    LOG      = Quiet()
+    FEEDBACK = Quiet()
+
+    def mkdir(self, target):
+        if not path.isdir(target):
+            makedirs(target)
+        return target
+
+builtins.LENSE = BenchLense()
+
+from lense.client.github import ClientGitHub
+
+class GitCounter(object):
+    """
+    Count git commands by wrapping git.cmd.Git.execute.
+    """
+    def __init__(self):
+        self.commands = 0
+        self.network  = 0
+        self._execute = Git.execute
+
+    def __enter__(self):
+        counter = self
+        def execute(git, command, *args, **kwargs):
+            counter.commands += 1
+            if any(c in NETWORK for c in command[1:3]):
+                counter.network += 1
+            return counter._execute(git, command, *args, **kwargs)
+        Git.execute = execute
+        return self
+
+    def __exit__(self, *args):
+        Git.execute = self._execute
+
+def git(*args):
+    subprocess.check_call(('git',) + args, stdout=subprocess.DEVNULL if hasattr(subprocess, 'DEVNULL') else None)
+
+def make_remote(root, name):
+    """
+    Create a bare remote with a working copy used to push new commits.
+    """
+    work = path.join(root, 'work', name)
+    bare = path.join(root, 'remotes', '{0}.git'.format(name))
+    git('init', '-q', work)
+    git('-C', work, 'checkout', '-q', '-b', 'master')
+    git('-C', work, 'config', 'user.email', 'bench@example.com')
+    git('-C', work, 'config', 'user.name', 'bench')
+    commit(work, 'manifest.json')
+    git('clone', '-q', '--bare', work, bare)
+    git('-C', work, 'remote', 'add', 'origin', bare)
+    return work, 'file://{0}'.format(bare)
+
+def commit(work, name):
+    with open(path.join(work, name), 'w') as f:
+        f.write(name)
+    git('-C', work, 'add', '.')
+    git('-C', work, 'commit', '-q', '-m', name)
+
+def upgrade(local, remote):
+    """
+    The "lense module upgrade" path.
+    """
+    github = ClientGitHub.fetch(local, remote, 'master')
+    if github.behind:
+        github.update()
+
+def upgrade_legacy(local, remote):
+    """
+    The previous upgrade path: fetch, scan refs, pull, fetch.
+    """
+    from git import Repo
+    repo = Repo(local)
+    repo.remotes.origin.fetch()
+    [r for r in repo.refs if r.name == 'master']
+    [r for r in repo.remotes.origin.refs if r.name == 'origin/master']
+    repo.remotes.origin.pull('master')
+    Repo(local).remotes.origin.fetch()
+
+def run(label, state, func, modules, root):
+    with GitCounter() as counter:
+        start = time()
+        for name, (work, remote) in modules.items():
+            func(path.join(root, 'local', label, name), remote)
+        elapsed = time() - start
+    print('{0:<28} {1:>8.3f}s {2:>10} {3:>10} {4:>12.2f}'.format(
+        '{0} ({1})'.format(label, state), elapsed, counter.commands, counter.network, float(counter.network) / len(modules)))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark module upgrades against file:// remotes')
+    parser.add_argument('--modules', type=int, default=20, help='Number of module repositories')
+    args = parser.parse_args()
+
+    root = mkdtemp(prefix='lense-bench-')
+    try:
+        modules = dict(('module{0}'.format(i), make_remote(root, 'module{0}'.format(i))) for i in range(args.modules))
+        for label in ['current', 'legacy']:
+            for name, (work, remote) in modules.items():
+                ClientGitHub.clone(path.join(root, 'local', label, name), remote, 'master')
+
+        print('{0:<28} {1:>9} {2:>10} {3:>10} {4:>12}'.format('upgrade', 'time', 'commands', 'network', 'network/mod'))
+        run('current', 'up to date', upgrade, modules, root)
+        run('legacy', 'up to date', upgrade_legacy, modules, root)
+
+        # Push a commit to every remote
+        for work, remote in modules.values():
+            commit(work, 'update.txt')
+            git('-C', work, 'push', '-q', 'origin', 'master')
+        run('current', 'behind', upgrade, modules, root)
+        run('legacy', 'behind', upgrade_legacy, modules, root)
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""
+Benchmark the client JSON codec with each installed backend (json, orjson,
+ujson, simplejson) on the large payload paths: decoding a multi-megabyte
+response, encoding it for the response cache and parsing a streamed NDJSON
+response line by line.
+
+    $ python bench/json_codec.py [--records 20000] [--repeat 5]
+"""
+import sys
+import argparse
+from time import time
+from os import path, environ
+from importlib import import_module
+
+# Client libraries from the source tree
+sys.path.insert(0, path.join(path.dirname(path.dirname(path.abspath(__file__))), 'usr', 'lib', 'python2.7', 'dist-packages'))
+
+try:
+    from importlib import reload
+except ImportError:
+    pass
+
+# The client imports its exceptions from lense-common
+try:
+    import lense.common.exceptions
+except ImportError:
+    import types
+    exceptions = types.ModuleType('lense.common.exceptions')
+    exceptions.ClientError  = type('ClientError', (Exception,), {})
+    exceptions.RequestError = type('RequestError', (Exception,), {})
+    sys.modules['lense.common'] = types.ModuleType('lense.common')
+    sys.modules['lense.common.exceptions'] = exceptions
+
+from lense.client import codec
+from lense.client.compat import to_bytes
+
+# Streamed response chunk size, as passed to iter_content()
+CHUNK_SIZE = 65536
+
+def payload(records):
+    """
+    Build a response similar to a large API object listing.
+    """
+    return [{
+        'uuid': '8c4f7b52-6f2a-4c1e-9d3b-{0:012d}'.format(i),
+        'username': 'user{0}'.format(i),
+        'email': 'user{0}@example.com'.format(i),
+        'is_active': i % 7 != 0,
+        'groups': ['default', 'group{0}'.format(i % 50)],
+        'last_login': None if i % 3 else '2016-01-01T00:00:00Z',
+        'quota': {'used': i * 1.5, 'limit': 1024, 'unit': 'MB'}
+    } for i in range(records)]
+
+def chunks(content):
+    """
+    Yield a response body in chunks, as read from a streamed response.
+    """
+    for i in range(0, len(content), CHUNK_SIZE):
+        yield content[i:i + CHUNK_SIZE]
+
+def stream_lines(content):
+    """
+    Split a chunked NDJSON body into lines, as iter_lines() does.
+    """
+    pending = b''
+    for chunk in chunks(content):
+        lines   = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            if line:
+                yield line
+    if pending:
+        yield pending
+
+def timed(func, repeat):
+    """
+    Return the best time of several runs in milliseconds.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time()
+        func()
+        elapsed = (time() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def backends():
+    """
+    Yield each installed backend, reloading the codec to select it.
+    """
+    for name in ['json'] + codec.BACKENDS:
+        try:
+            import_module(name)
+        except ImportError:
+            print('{0:<12} not installed'.format(name))
+            continue
+        environ['LENSE_CLIENT_JSON'] = name
+        reload(codec)
+        yield codec.BACKEND
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the client JSON codec backends')
+    parser.add_argument('--records', type=int, default=20000, help='Number of records in the response')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement, the best is reported')
+    args = parser.parse_args()
+
+    # Response bodies
+    records  = payload(args.records)
+    response = to_bytes(codec.dumps(records))
+    ndjson   = b'\n'.join(to_bytes(codec.dumps(r)) for r in records) + b'\n'
+    print('response: {0:.1f} MB, ndjson: {1:.1f} MB, {2} records\n'.format(
+        len(response) / 1048576.0, len(ndjson) / 1048576.0, args.records))
+
+    print('{0:<12} {1:>12} {2:>12} {3:>12}'.format('backend', 'loads (ms)', 'dumps (ms)', 'ndjson (ms)'))
+    results = {}
+    for name in backends():
+        results[name] = (
+            timed(lambda: codec.loads(response), args.repeat),
+            timed(lambda: codec.dumps(records), args.repeat),
+            timed(lambda: [codec.loads(line) for line in stream_lines(ndjson)], args.repeat))
+        print('{0:<12} {1:>12.1f} {2:>12.1f} {3:>12.1f}'.format(name, *results[name]))
+
+    # Speedup over the standard library
+    base = results['json']
+    for name, result in results.items():
+        if not name == 'json':
+            print('\n{0}: {1}'.format(name, ', '.join('{0} x{1:.1f}'.format(op, b / r)
+                for op, b, r in zip(['loads', 'dumps', 'ndjson'], base, result))))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+import sys
+import types
+import pytest
+from os import makedirs
+from os.path import dirname, abspath, join, isdir
+
+# Client libraries from the source tree
+sys.path.insert(0, join(dirname(dirname(abspath(__file__))), 'usr', 'lib', 'python2.7', 'dist-packages'))
+
+try:
+    import builtins
+except ImportError:
+    import __builtin__ as builtins
+
+# Use lense-common when installed, otherwise provide the exceptions the client imports
+try:
+    import lense.common.exceptions
+except ImportError:
+    exceptions = types.ModuleType('lense.common.exceptions')
+    exceptions.ClientError  = type('ClientError', (Exception,), {})
+    exceptions.RequestError = type('RequestError', (Exception,), {})
+    http = types.ModuleType('lense.common.http')
+    http.HTTP_GET, http.HTTP_POST, http.HTTP_PUT = 'GET', 'POST', 'PUT'
+    http.HEADER    = types.SimpleNamespace(CONTENT_TYPE='Content-Type', ACCEPT='Accept', API_USER='Lense-API-User',
+        API_TOKEN='Lense-API-Token', API_KEY='Lense-API-Key', API_GROUP='Lense-API-Group')
+    http.MIME_TYPE = types.SimpleNamespace(APPLICATION=types.SimpleNamespace(JSON='application/json'),
+        TEXT=types.SimpleNamespace(PLAIN='text/plain'))
+    http.PATH      = types.SimpleNamespace(GET_TOKEN='token')
+    common = types.ModuleType('lense.common')
+    common.__path__   = []
+    common.exceptions = exceptions
+    common.http       = http
+    sys.modules['lense.common'] = common
+    sys.modules['lense.common.exceptions'] = exceptions
+    sys.modules['lense.common.http'] = http
+
+    utils = types.ModuleType('lense.common.utils')
+    utils.ensure_root = lambda: None
+    common.utils = utils
+    sys.modules['lense.common.utils'] = utils
+
+    # Handler and interface classes are loaded through lense.import_class
+    import lense
+    from importlib import import_module
+    def import_class(cls, module, init=True, args=None, kwargs=None):
+        loaded = getattr(import_module(module), cls)
+        return loaded(*(args or []), **(kwargs or {})) if init else loaded
+    lense.import_class = import_class
+
+# The module handler imports Django settings, unused by the client
+try:
+    import django.conf
+except ImportError:
+    django = types.ModuleType('django')
+    django.setup = lambda: None
+    django.conf = types.ModuleType('django.conf')
+    django.conf.settings = types.SimpleNamespace()
+    sys.modules['django'] = django
+    sys.modules['django.conf'] = django.conf
+
+from lense.common.exceptions import ClientError, RequestError
+
+# Unset ensure() comparison
+NOT_SET = object()
+
+class FakeArgs(object):
+    """
+    Parsed command line arguments.
+    """
+    def __init__(self, args=None):
+        self.container = dict(args or {})
+
+    def get(self, key, default=None):
+        return self.container.get(key, default)
+
+    def construct(self, **kwargs):
+        pass
+
+class FakeRecorder(object):
+    """
+    Records calls to any method, i.e. LENSE.LOG or LENSE.CLIENT.METRICS.
+    """
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args))
+
+class FakeClient(object):
+    """
+    Client interface with an in-memory configuration.
+    """
+    def __init__(self, conf=None, args=None):
+        self.CONF    = conf or {}
+        self.ARGS    = FakeArgs(args)
+        self.METRICS = FakeRecorder()
+
+    def conf(self, section, key, default=None, boolean=False):
+        value = self.confget(self.CONF.get(section), key)
+        value = default if value is None else value
+        if boolean and isinstance(value, str):
+            return value.strip().lower() in ['1', 'true', 'yes', 'on']
+        return bool(value) if boolean else value
+
+    @staticmethod
+    def confget(block, key, default=None):
+        if block is None:
+            return default
+        value = block.get(key) if isinstance(block, dict) else getattr(block, key, None)
+        return default if value is None else value
+
+    def _ensure(self, exc, result, value=NOT_SET, isnot=NOT_SET, error=None, code=None, **kwargs):
+        if (value is not NOT_SET and not result == value) or (isnot is not NOT_SET and result == isnot):
+            raise exc(error)
+        return result
+
+    def ensure(self, *args, **kwargs):
+        return self._ensure(ClientError, *args, **kwargs)
+
+    def ensure_request(self, *args, **kwargs):
+        return self._ensure(RequestError, *args, **kwargs)
+
+class FakeLense(object):
+    """
+    The global LENSE object used by client modules.
+    """
+    def __init__(self, conf=None, args=None):
+        self.CONF     = types.SimpleNamespace(engine=types.SimpleNamespace(proto='http', host='localhost', port=10550))
+        self.CLIENT   = FakeClient(conf, args)
+        self.LOG      = FakeRecorder()
+        self.FEEDBACK = FakeRecorder()
+
+    def die(self, msg):
+        raise SystemExit(msg)
+
+    def ensure(self, result, exc=ClientError, **kwargs):
+        return self.CLIENT._ensure(exc, result, **kwargs)
+
+    def mkdir(self, path):
+        if not isdir(path):
+            makedirs(path)
+        return path
+
+@pytest.fixture
+def lense(monkeypatch):
+    """
+    Install a fake LENSE global, returns a function to reconfigure it with
+    the installed fake as its "current" attribute.
+    """
+    def configure(conf=None, args=None):
+        fake = FakeLense(conf, args)
+        monkeypatch.setattr(builtins, 'LENSE', fake, raising=False)
+        configure.current = fake
+        return fake
+    configure()
+    return configure
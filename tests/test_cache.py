@@ -0,0 +1,59 @@
+import stat
+from os import listdir
+from os import stat as os_stat
+
+import pytest
+
+from lense.common.exceptions import ClientError
+from lense.client import cache as cache_module
+from lense.client.cache import ClientResponseCache
+
+def make_cache(lense, tmpdir, monkeypatch, conf=None, args=None):
+    monkeypatch.setattr(cache_module, 'RESPONSE_CACHE', str(tmpdir.join('cache')))
+    lense(conf={'cache': conf or {}}, args=args)
+    return ClientResponseCache()
+
+def test_get_returns_a_copy(lense, tmpdir, monkeypatch):
+    cache = make_cache(lense, tmpdir, monkeypatch, conf={'enabled': True})
+    key   = cache.key('http://engine', 'user', None, 'admin', 'default')
+    cache.set(key, 'user', 200, {'users': ['admin']})
+    cache.get(key)['content']['users'].append('mutated')
+    assert cache.get(key)['content'] == {'users': ['admin']}
+
+def test_cli_ttl_overrides_path_ttl(lense, tmpdir, monkeypatch):
+    cache = make_cache(lense, tmpdir, monkeypatch, conf={'paths': {'user': 600}}, args={'cache_ttl': '5'})
+    assert cache.enabled
+    assert cache._ttl('user') == 5.0
+
+def test_path_ttl_without_cli_ttl(lense, tmpdir, monkeypatch):
+    cache = make_cache(lense, tmpdir, monkeypatch, conf={'enabled': True, 'ttl': 30, 'paths': {'user': 600}})
+    assert cache._ttl('user') == 600.0
+    assert cache._ttl('group') == 30.0
+
+def test_disk_entries_are_private(lense, tmpdir, monkeypatch):
+    cache = make_cache(lense, tmpdir, monkeypatch, conf={'enabled': True})
+    key   = cache.key('http://engine', 'user', None, 'admin', 'default')
+    cache.set(key, 'user', 200, {})
+    mode  = os_stat(cache._file(key)).st_mode
+    assert stat.S_IMODE(mode) == 0o600
+
+def test_writes_invalidate_disk_entries_when_disabled(lense, tmpdir, monkeypatch):
+    enabled = make_cache(lense, tmpdir, monkeypatch, conf={'enabled': True})
+    enabled.set(enabled.key('http://engine', 'user', None, 'admin', 'default'), 'user', 200, {})
+    enabled.set(enabled.key('http://engine', 'group', None, 'admin', 'default'), 'group', 200, {})
+
+    # A later run without the cache still invalidates the resource on disk
+    disabled = make_cache(lense, tmpdir, monkeypatch, conf={'enabled': False})
+    assert not disabled.enabled
+    disabled.invalidate('user/admin')
+    assert [f for f in listdir(str(tmpdir.join('cache')))] == [enabled.key('http://engine', 'group', None, 'admin', 'default') + '.json']
+
+def test_flags_are_parsed(lense, tmpdir, monkeypatch):
+    cache = make_cache(lense, tmpdir, monkeypatch, conf={'enabled': 'false', 'disk': '0'})
+    assert cache.enabled is False
+    assert cache.disk is False
+
+@pytest.mark.parametrize('ttl', ['soon', '0', '-5'])
+def test_invalid_cli_ttl(lense, tmpdir, monkeypatch, ttl):
+    with pytest.raises(ClientError):
+        make_cache(lense, tmpdir, monkeypatch, args={'cache_ttl': ttl})
@@ -0,0 +1,143 @@
+from time import sleep
+from copy import deepcopy
+from threading import Thread, Event, Lock, current_thread
+
+from lense.client import coalesce
+from lense.client.coalesce import ClientCoalescer
+
+class CountingEvent(object):
+    """
+    Event counting the callers waiting for a shared request.
+    """
+    waiting = 0
+    lock    = Lock()
+
+    def __init__(self):
+        self._event = Event()
+
+    def set(self):
+        self._event.set()
+
+    def wait(self, timeout=None):
+        with CountingEvent.lock:
+            CountingEvent.waiting += 1
+        return self._event.wait(timeout)
+
+def wait_for(check):
+    for _ in range(500):
+        if check():
+            return
+        sleep(0.01)
+    raise AssertionError('Timed out waiting for callers')
+
+def run_callers(coalescer, count, func):
+    """
+    Call the coalescer from several threads with the same key.
+    """
+    results = [None] * count
+    errors  = [None] * count
+
+    def caller(i):
+        try:
+            results[i] = coalescer.do(('GET', 'user'), func)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [Thread(target=caller, args=[i]) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+def test_concurrent_callers_share_one_request(lense, monkeypatch):
+    monkeypatch.setattr(coalesce, 'Event', CountingEvent)
+    monkeypatch.setattr(CountingEvent, 'waiting', 0)
+    coalescer = ClientCoalescer()
+    release   = Event()
+    calls     = []
+
+    def request():
+        calls.append(1)
+        release.wait(5)
+        return {'users': ['admin']}
+
+    threads, results, errors = run_callers(coalescer, 5, request)
+    wait_for(lambda: CountingEvent.waiting == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(r == {'users': ['admin']} for r in results)
+
+    # Every caller has its own copy
+    results[0]['users'].append('mutated')
+    assert results[1] == {'users': ['admin']}
+    assert lense.current.CLIENT.METRICS.calls.count(('incr', ('coalesced_requests_total',))) == 4
+
+def test_errors_are_shared(lense):
+    coalescer = ClientCoalescer()
+    release   = Event()
+
+    def request():
+        release.wait(5)
+        raise ValueError('failed')
+
+    threads, results, errors = run_callers(coalescer, 3, request)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert all(isinstance(e, ValueError) for e in errors)
+
+def test_sequential_calls_are_not_coalesced(lense):
+    coalescer = ClientCoalescer()
+    calls     = []
+    for _ in range(3):
+        coalescer.do(('GET', 'user'), lambda: calls.append(1))
+    assert len(calls) == 3
+    assert not coalescer._calls
+
+def test_leader_changes_do_not_reach_followers(lense, monkeypatch):
+    monkeypatch.setattr(coalesce, 'Event', CountingEvent)
+    monkeypatch.setattr(CountingEvent, 'waiting', 0)
+    coalescer = ClientCoalescer()
+    release   = Event()
+    mutated   = Event()
+    results   = {}
+
+    def request():
+        release.wait(5)
+        return {'users': ['admin']}
+
+    # Followers copy the result only after the leader has changed its own
+    def slow_copy(result):
+        if not current_thread().name == 'leader':
+            mutated.wait(5)
+        return deepcopy(result)
+
+    def leader():
+        results['leader'] = coalescer.do(('GET', 'user'), request, copy=slow_copy)
+        results['leader']['users'].append('formatted')
+        mutated.set()
+
+    def follower():
+        results['follower'] = coalescer.do(('GET', 'user'), request, copy=slow_copy)
+
+    threads = [Thread(target=leader, name='leader')]
+    threads[0].start()
+    wait_for(lambda: coalescer._calls)
+    threads.append(Thread(target=follower, name='follower'))
+    threads[1].start()
+    wait_for(lambda: CountingEvent.waiting == 1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results['leader'] == {'users': ['admin', 'formatted']}
+    assert results['follower'] == {'users': ['admin']}
+
+def test_single_caller_gets_the_result_without_a_copy(lense):
+    coalescer = ClientCoalescer()
+    result    = {'users': ['admin']}
+    copies    = []
+    assert coalescer.do(('GET', 'user'), lambda: result, copy=copies.append) is result
+    assert not copies
@@ -0,0 +1,57 @@
+import io
+import os
+
+import pytest
+
+from lense.client import completion
+
+@pytest.fixture
+def support(tmpdir, monkeypatch):
+    """
+    A support cache with three request commands and a fresh index path.
+    """
+    cache = tmpdir.join('support.json')
+    cache.write('{"user_get": {}, "user_create": {}, "group_get": {}}')
+    monkeypatch.setattr(completion, 'SUPPORT_CACHE', str(cache))
+    monkeypatch.setattr(completion, 'COMPLETE_INDEX', str(tmpdir.join('complete.index')))
+    return cache
+
+@pytest.fixture
+def complete(monkeypatch):
+    """
+    Run a completion and return the words printed.
+    """
+    def run(*words):
+        output = io.StringIO()
+        monkeypatch.setattr(completion, 'stdout', output)
+        with pytest.raises(SystemExit):
+            completion.complete(list(words))
+        return output.getvalue().split()
+    return run
+
+def test_commands_come_from_the_handler_registry():
+    from lense.client.handlers import HANDLERS
+    assert completion.COMMANDS == sorted(['help'] + list(HANDLERS.keys()))
+
+@pytest.mark.parametrize('words,expected', [
+    ([''], ['help', 'module', 'request', 'stats', 'test']),
+    (['s'], ['stats']),
+    (['help', ''], ['module', 'request', 'stats', 'test']),
+    (['help', 'he'], []),
+    (['request', 'user_'], ['user_create', 'user_get']),
+    (['request', 'x'], []),
+    (['module', 'user_'], [])
+])
+def test_completions(support, complete, words, expected):
+    assert complete(*words) == expected
+
+def test_index_is_rebuilt_when_the_support_cache_changes(support, complete):
+    assert complete('request', 'g') == ['group_get']
+    support.write('{"group_get": {}, "group_list": {}}')
+    mtime = os.stat(completion.COMPLETE_INDEX).st_mtime
+    os.utime(str(support), (mtime + 10, mtime + 10))
+    assert complete('request', 'g') == ['group_get', 'group_list']
+
+def test_no_support_cache(tmpdir, monkeypatch, complete):
+    monkeypatch.setattr(completion, 'SUPPORT_CACHE', str(tmpdir.join('missing.json')))
+    assert complete('request', '') == []
@@ -0,0 +1,25 @@
+from lense.client.concurrency import ClientConcurrency
+
+def test_slow_path_does_not_look_congested(lense):
+    lense(conf={'concurrency': {'initial': 4}})
+    concurrency = ClientConcurrency()
+
+    # A fast token request followed by normal slow resource requests
+    concurrency.sample(0.003, 200, ('http://engine', 'POST', 'token'))
+    for _ in range(20):
+        concurrency.sample(0.3, 200, ('http://engine', 'GET', 'user'))
+    assert concurrency.limit > 4
+
+def test_backs_off_on_overload(lense):
+    lense(conf={'concurrency': {'initial': 8, 'backoff': 0.5}})
+    concurrency = ClientConcurrency()
+    concurrency.sample(0.1, 503, ('http://engine', 'GET', 'user'))
+    assert concurrency.limit == 4
+
+def test_backs_off_when_path_latency_rises(lense):
+    lense(conf={'concurrency': {'initial': 8, 'backoff': 0.5, 'tolerance': 2.0}})
+    concurrency = ClientConcurrency()
+    concurrency.sample(0.001, 200, ('http://engine', 'GET', 'user'))
+    limit = concurrency.limit
+    concurrency.sample(0.5, 200, ('http://engine', 'GET', 'user'))
+    assert concurrency.limit == limit * 0.5
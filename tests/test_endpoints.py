@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+import pytest
+
+requests = pytest.importorskip('requests')
+
+from lense.client.retry import ClientRetryPolicy
+from lense.client.timeouts import ClientTimeouts
+from lense.client.endpoints import ClientEndpoints
+
+NODES = ['http://node1:10550', 'http://node2:10550', 'http://node3:10550']
+
+class FakeResponse(object):
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers     = {}
+        self.elapsed     = timedelta(milliseconds=10)
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def endpoints(lense):
+    return ClientEndpoints(NODES, eject_after=2, eject_for=60)
+
+@pytest.fixture
+def nodes(lense, monkeypatch):
+    """
+    Route attempts to per-node behaviour: a status code or an exception.
+    """
+    from lense.client.rest import ClientREST
+    lense.current.CLIENT.HEDGE = type('Hedge', (object,), {'enabled': False, 'observe': lambda self, latency: None})()
+    behaviour = {}
+    attempts  = []
+    def attempt(cls, endpoint, path, method, **kwargs):
+        attempts.append(endpoint)
+        result = behaviour.get(endpoint, 200)
+        if isinstance(result, Exception):
+            raise result
+        return FakeResponse(result)
+    monkeypatch.setattr(ClientREST, 'attempt', classmethod(attempt))
+    monkeypatch.setattr(ClientRetryPolicy, '_tokens', None)
+    return behaviour, attempts
+
+def send(endpoints):
+    from lense.client.rest import ClientREST
+    return ClientREST.send(endpoints, 'user', 'GET', ClientRetryPolicy(attempts=3, backoff=0), ClientTimeouts())
+
+def test_round_robin_skips_tried_endpoints(endpoints):
+    first = endpoints.select()
+    assert endpoints.select([first]) is not first
+    assert sum(e.outstanding for e in endpoints.endpoints) == 2
+
+def test_connection_failure_fails_over_to_the_next_node(endpoints, nodes):
+    behaviour, attempts = nodes
+    behaviour[NODES[0]] = requests.ConnectionError('refused')
+    assert send(endpoints).status_code == 200
+    assert len(attempts) == 2
+    assert attempts[0] == NODES[0] and not attempts[1] == NODES[0]
+    assert all(e.outstanding == 0 for e in endpoints.endpoints)
+
+def test_failing_node_is_ejected(endpoints, nodes):
+    behaviour, attempts = nodes
+    behaviour[NODES[0]] = 503
+    for _ in range(3):
+        send(endpoints)
+    ejected = endpoints.endpoints[0]
+    assert ejected.ejected > 0
+    del attempts[:]
+
+    # Ejected nodes are not selected while others are available
+    for _ in range(4):
+        send(endpoints)
+    assert not NODES[0] in attempts
+
+def test_single_endpoint_is_never_ejected(lense, nodes):
+    behaviour, attempts = nodes
+    behaviour[NODES[0]] = requests.ConnectionError('refused')
+    endpoints = ClientEndpoints(NODES[:1], eject_after=1)
+    with pytest.raises(requests.ConnectionError):
+        send(endpoints)
+    assert endpoints.endpoints[0].ejected == 0
+
+def test_unexpected_errors_release_the_endpoint(endpoints, nodes):
+    behaviour, attempts = nodes
+    behaviour[NODES[0]] = KeyError('bug')
+    with pytest.raises(KeyError):
+        send(endpoints)
+    assert endpoints.endpoints[0].outstanding == 0
+    assert endpoints.endpoints[0].failures == 0
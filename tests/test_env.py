@@ -0,0 +1,52 @@
+import os
+from os import path
+
+import pytest
+
+from lense.common.exceptions import ClientError
+from lense.client import env as env_module
+from lense.client.env import ClientEnvironment
+
+ENV_SH = '''
+export LENSE_API_USER="admin"
+export LENSE_API_KEY='secret'
+export LENSE_PROFILE_STAGING_API_USER=deploy
+export LENSE_PROFILE_STAGING_API_ENDPOINT="https://staging:10550"
+export LENSE_OTHER=1
+'''
+
+@pytest.fixture
+def env_sh(tmpdir, monkeypatch):
+    """
+    An env.sh file, with parsed files and the stale cache under tmpdir.
+    """
+    monkeypatch.setattr(env_module, 'PARSED', {})
+    monkeypatch.setattr(env_module, 'ENV_CACHE', str(tmpdir.join('env.cache.json')))
+    env_sh = tmpdir.join('env.sh')
+    env_sh.write(ENV_SH)
+    return env_sh
+
+def test_profiles(lense, env_sh):
+    env = ClientEnvironment(str(env_sh))
+    assert env.get() == {'user': 'admin', 'key': 'secret'}
+    assert env.get('Staging') == {'user': 'deploy', 'endpoint': 'https://staging:10550'}
+    assert env.environ['LENSE_OTHER'] == '1'
+    with pytest.raises(ClientError):
+        env.get('missing')
+
+def test_parsed_once_while_unchanged(lense, env_sh, monkeypatch):
+    ClientEnvironment(str(env_sh)).load()
+    monkeypatch.setattr(ClientEnvironment, '_parse', lambda self: pytest.fail('parsed again'))
+    assert ClientEnvironment(str(env_sh)).get()['user'] == 'admin'
+
+def test_changed_file_is_parsed_again(lense, env_sh):
+    assert ClientEnvironment(str(env_sh)).get()['user'] == 'admin'
+    mtime = path.getmtime(str(env_sh))
+    env_sh.write(ENV_SH.replace('"admin"', '"operator"'))
+    os.utime(str(env_sh), (mtime + 10, mtime + 10))
+    assert ClientEnvironment(str(env_sh)).get()['user'] == 'operator'
+
+def test_credentials_are_not_copied_to_disk(lense, env_sh, tmpdir):
+    tmpdir.join('env.cache.json').write('{"stale": true}')
+    ClientEnvironment(str(env_sh)).load()
+    assert sorted(os.listdir(str(tmpdir))) == ['env.sh']
@@ -0,0 +1,33 @@
+import pytest
+
+from lense.client.formatters import ClientFilter
+
+USER = {'username': 'admin', 'is_active': True, 'is_staff': False, 'last_login': None, 'uid': 1, 'quota': {'limit': 1024}}
+
+@pytest.mark.parametrize('expression,matched', [
+    ('username=admin', True),
+    ('username!=admin', False),
+    ('is_active=true', True),
+    ('is_active=false', False),
+    ('is_active=True', False),
+    ('is_active=1', False),
+    ('is_staff=false', True),
+    ('last_login=null', True),
+    ('last_login!=null', False),
+    ('uid=1', True),
+    ('uid=true', False),
+    ('quota.limit=1024', True),
+    ('quota.limit>1000,is_active=true', True),
+    ('username~^adm', True),
+    ('missing=null', True)
+])
+def test_filter_compares_json_values(lense, expression, matched):
+    assert ClientFilter(expression).match(USER) == matched
+
+def test_filter_compares_numeric_strings_as_strings(lense):
+    assert ClientFilter('uid=1').match({'uid': '1'})
+    assert not ClientFilter('uid=01').match({'uid': 1})
+
+def test_regex_matches_non_ascii_values(lense):
+    assert ClientFilter(u'name~^Jos').match({'name': u'José'})
+    assert ClientFilter('uid~^1').match({'uid': 12})
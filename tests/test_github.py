@@ -0,0 +1,236 @@
+import io
+import os
+import tarfile
+import subprocess
+from os import path
+
+import pytest
+
+git = pytest.importorskip('git')
+
+from lense.common.exceptions import ClientError
+from lense.client.github import ClientGitHub
+
+def run(*args, **kwargs):
+    subprocess.check_call(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **kwargs)
+
+@pytest.fixture
+def remote(tmpdir):
+    """
+    A local bare repository with one commit on master, served over file://.
+    """
+    work = str(tmpdir.join('work'))
+    bare = str(tmpdir.join('remote.git'))
+    run('git', 'init', '-q', '-b', 'master', work)
+    run('git', '-C', work, 'config', 'user.email', 'test@example.com')
+    run('git', '-C', work, 'config', 'user.name', 'test')
+    with open(path.join(work, 'manifest.json'), 'w') as f:
+        f.write('{"name": "test"}')
+    run('git', '-C', work, 'add', '.')
+    run('git', '-C', work, 'commit', '-q', '-m', 'initial')
+    run('git', 'clone', '-q', '--bare', work, bare)
+    run('git', '-C', work, 'remote', 'add', 'origin', bare)
+    return {'work': work, 'bare': bare, 'url': 'file://{0}'.format(bare)}
+
+def push(remote, name):
+    with open(path.join(remote['work'], name), 'w') as f:
+        f.write(name)
+    run('git', '-C', remote['work'], 'add', '.')
+    run('git', '-C', remote['work'], 'commit', '-q', '-m', name)
+    run('git', '-C', remote['work'], 'push', '-q', 'origin', 'master')
+
+class FakeResponse(object):
+    def __init__(self, data):
+        self.status_code = 200
+        self.raw         = io.BytesIO(data)
+
+class FakeSession(object):
+    def __init__(self, data):
+        self.data = data
+
+    def get(self, url, **kwargs):
+        return FakeResponse(self.data)
+
+class FakeREST(object):
+    def __init__(self, data):
+        self.data = data
+
+    def session(self):
+        return FakeSession(self.data)
+
+def tarball(*members):
+    """
+    Build a snapshot archive from (TarInfo, data) pairs.
+    """
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode='w:gz') as tar:
+        for info, contents in members:
+            info.size = len(contents or b'')
+            tar.addfile(info, io.BytesIO(contents) if contents else None)
+    return data.getvalue()
+
+def member(name, type=tarfile.REGTYPE, linkname=''):
+    info          = tarfile.TarInfo(name)
+    info.type     = type
+    info.linkname = linkname
+    return info
+
+def test_clone_and_upgrade_over_file(lense, tmpdir, remote):
+    local = str(tmpdir.join('local'))
+    ClientGitHub.clone(local, remote['url'], 'master')
+    assert path.isfile(path.join(local, 'manifest.json'))
+
+    # Up to date, only the remote head is checked
+    github = ClientGitHub.fetch(local, remote['url'], 'master')
+    assert not github.behind
+    assert github.network_ops == 1
+
+    # New commit on the remote
+    push(remote, 'added.txt')
+    github = ClientGitHub.fetch(local, remote['url'], 'master')
+    assert github.behind
+    github.update()
+    assert path.isfile(path.join(local, 'added.txt'))
+    assert github.network_ops == 2
+
+def test_snapshot_from_bare_repo(lense, tmpdir, remote):
+    archive = subprocess.check_output(['git', '--git-dir', remote['bare'], 'archive',
+        '--format=tar.gz', '--prefix=remote-master/', 'master'])
+    fake = lense.current
+    fake.CLIENT.REST = FakeREST(archive)
+    local = str(tmpdir.join('local'))
+    ClientGitHub.clone(local, remote['url'], 'master', snapshot=True)
+    assert path.isfile(path.join(local, 'manifest.json'))
+
+@pytest.mark.parametrize('info', [
+    member('remote-master/../escape'),
+    member('remote-master/link', tarfile.SYMTYPE, '/etc/passwd'),
+    member('remote-master/link', tarfile.SYMTYPE, '../../escape'),
+    member('remote-master/sub/link', tarfile.SYMTYPE, '../../escape'),
+    member('remote-master/link', tarfile.LNKTYPE, '/etc/passwd'),
+    member('remote-master/link', tarfile.LNKTYPE, 'remote-master/../../escape'),
+    member('remote-master/device', tarfile.CHRTYPE)
+])
+def test_snapshot_rejects_escaping_members(lense, tmpdir, info):
+    lense.current.CLIENT.REST = FakeREST(tarball((member('remote-master/'), None), (info, None)))
+    local = str(tmpdir.join('local'))
+    with pytest.raises(ClientError):
+        ClientGitHub.clone(local, 'file:///nowhere', 'master', snapshot=True)
+    assert not path.exists(str(tmpdir.join('escape')))
+
+def test_snapshot_allows_internal_links(lense, tmpdir):
+    lense.current.CLIENT.REST = FakeREST(tarball(
+        (member('remote-master/'), None),
+        (member('remote-master/file'), b'data'),
+        (member('remote-master/sub/', tarfile.DIRTYPE), None),
+        (member('remote-master/sub/symlink', tarfile.SYMTYPE, '../file'), None),
+        (member('remote-master/hardlink', tarfile.LNKTYPE, 'remote-master/file'), None)))
+    local = str(tmpdir.join('local'))
+    ClientGitHub.clone(local, 'file:///nowhere', 'master', snapshot=True)
+    with open(path.join(local, 'hardlink'), 'rb') as f:
+        assert f.read() == b'data'
+    assert path.islink(path.join(local, 'sub', 'symlink'))
+
+@pytest.fixture
+def clean_env(monkeypatch, tmpdir):
+    """
+    No git SSH or transfer settings from the environment or global config.
+    """
+    for var in ['GIT_SSH', 'GIT_SSH_COMMAND', 'GIT_HTTP_LOW_SPEED_LIMIT', 'GIT_HTTP_LOW_SPEED_TIME']:
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setenv('GIT_CONFIG_GLOBAL', str(tmpdir.join('gitconfig')))
+    monkeypatch.setenv('GIT_CONFIG_NOSYSTEM', '1')
+    return monkeypatch
+
+def test_timeouts_do_not_change_the_process_environment(lense, tmpdir, clean_env):
+    github = ClientGitHub(str(tmpdir.join('local')), 'git@github.com:lense/module.git', 'master')
+    assert github.env == {'GIT_SSH_COMMAND': 'ssh -o ConnectTimeout=5'}
+    assert not 'GIT_SSH_COMMAND' in os.environ
+
+    github = ClientGitHub(str(tmpdir.join('local')), 'https://github.com/lense/module', 'master')
+    assert github.env == {'GIT_HTTP_LOW_SPEED_LIMIT': '1', 'GIT_HTTP_LOW_SPEED_TIME': '30'}
+    assert not 'GIT_HTTP_LOW_SPEED_TIME' in os.environ
+
+@pytest.mark.parametrize('configure', [
+    lambda env, tmpdir: env.setenv('GIT_SSH', '/usr/local/bin/ssh-wrapper'),
+    lambda env, tmpdir: env.setenv('GIT_SSH_COMMAND', 'ssh -i ~/.ssh/deploy'),
+    lambda env, tmpdir: run('git', 'config', '--file', str(tmpdir.join('gitconfig')), 'core.sshCommand', 'ssh -i ~/.ssh/deploy')
+])
+def test_user_ssh_command_wins(lense, tmpdir, clean_env, configure):
+    configure(clean_env, tmpdir)
+    github = ClientGitHub(str(tmpdir.join('local')), 'ssh://git@github.com/lense/module.git', 'master')
+    assert github.env == {}
+
+def test_file_remotes_get_no_timeout_environment(lense, tmpdir, clean_env, remote):
+    github = ClientGitHub(str(tmpdir.join('local')), remote['url'], 'master')
+    assert github.env == {}
+
+def test_clone_flags_are_parsed(lense, tmpdir, clean_env):
+    lense(conf={'git': {'single_branch': 'false', 'mirror': 'no', 'snapshot': '0'}})
+    github = ClientGitHub(str(tmpdir.join('local')), 'file:///nowhere', 'master')
+    assert (github.single_branch, github.mirror, github.snapshot) == (False, False, False)
+
+def test_diverged_branch_is_not_merged(lense, tmpdir, remote):
+    local = str(tmpdir.join('local'))
+    ClientGitHub.clone(local, remote['url'], 'master')
+    run('git', '-C', local, '-c', 'user.email=test@example.com', '-c', 'user.name=test',
+        'commit', '-q', '--allow-empty', '-m', 'local change')
+    head = git.Repo(local).head.commit.hexsha
+    push(remote, 'upstream.txt')
+
+    github = ClientGitHub.fetch(local, remote['url'], 'master')
+    assert github.behind
+    with pytest.raises(git.exc.GitCommandError):
+        github.update()
+    assert git.Repo(local).head.commit.hexsha == head
+    assert not path.exists(path.join(local, 'upstream.txt'))
+
+def test_up_to_date_check_fetches_no_objects(lense, tmpdir, remote, monkeypatch):
+    local = str(tmpdir.join('local'))
+    ClientGitHub.clone(local, remote['url'], 'master')
+    monkeypatch.setattr(ClientGitHub, '_fetch_branch', lambda self: pytest.fail('fetched objects'))
+    assert not ClientGitHub.fetch(local, remote['url'], 'master').behind
+
+def branches(local):
+    return sorted(r.name for r in git.Repo(local).remotes.origin.refs)
+
+def test_shallow_single_branch_clone(lense, tmpdir, remote):
+    run('git', '-C', remote['work'], 'push', '-q', 'origin', 'master:dev')
+    push(remote, 'second.txt')
+    local = str(tmpdir.join('local'))
+    ClientGitHub.clone(local, remote['url'], 'master', depth=1)
+    assert path.isfile(path.join(local, '.git', 'shallow'))
+    assert len(list(git.Repo(local).iter_commits())) == 1
+    assert 'origin/master' in branches(local)
+    assert not 'origin/dev' in branches(local)
+
+def test_mirror_clone_is_dissociated(lense, tmpdir, remote, monkeypatch):
+    from lense.client import github as github_module
+    monkeypatch.setattr(github_module, 'MIRROR_HOME', str(tmpdir.join('mirrors')))
+    first, second = str(tmpdir.join('first')), str(tmpdir.join('second'))
+    ClientGitHub.clone(first, remote['url'], 'master', mirror=True)
+    push(remote, 'added.txt')
+    ClientGitHub.clone(second, remote['url'], 'master', mirror=True)
+
+    # One mirror, updated for the second clone, not borrowed from afterwards
+    assert len(os.listdir(str(tmpdir.join('mirrors')))) == 1
+    assert path.isfile(path.join(second, 'added.txt'))
+    assert not path.exists(path.join(second, '.git', 'objects', 'info', 'alternates'))
+
+def test_snapshot_members_are_stripped_of_the_top_directory(lense, tmpdir):
+    github = ClientGitHub(str(tmpdir.join('local')), 'file:///nowhere', 'master')
+    archive = tarball(
+        (member('pax_global_header', tarfile.XGLTYPE), None),
+        (member('remote-master/', tarfile.DIRTYPE), None),
+        (member('remote-master/manifest.json'), b'{}'),
+        (member('remote-master/engine/', tarfile.DIRTYPE), None))
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        assert [m.name for m in github._snapshot_members(tar)] == ['manifest.json', 'engine']
+
+def test_snapshot_install_cannot_be_upgraded(lense, tmpdir):
+    lense.current.CLIENT.REST = FakeREST(tarball((member('remote-master/manifest.json'), b'{}')))
+    local = str(tmpdir.join('local'))
+    ClientGitHub.clone(local, 'file:///nowhere', 'master', snapshot=True)
+    with pytest.raises(ClientError) as error:
+        ClientGitHub.fetch(local, 'file:///nowhere', 'master')
+    assert 'snapshot' in str(error.value)
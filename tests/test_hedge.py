@@ -0,0 +1,51 @@
+from time import sleep
+
+from lense.client.hedge import ClientHedge
+
+class FakeResponse(object):
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.closed      = False
+
+    def close(self):
+        self.closed = True
+
+def respond(status_code, after):
+    response = FakeResponse(status_code)
+    def call():
+        sleep(after)
+        return response
+    return response, call
+
+def make_hedge(lense):
+    lense(conf={'hedge': {'enabled': True, 'min_samples': 1, 'budget': 1}})
+    hedge = ClientHedge()
+    hedge.observe(0.01)
+    return hedge
+
+def test_fast_response_wins_and_loser_is_closed(lense):
+    hedge             = make_hedge(lense)
+    slow, primary     = respond(200, 0.3)
+    fast, backup      = respond(200, 0)
+    assert hedge.race(primary, backup) is fast
+    sleep(0.4)
+    assert slow.closed
+    assert not fast.closed
+
+def test_retryable_response_does_not_win(lense):
+    hedge             = make_hedge(lense)
+    ok, primary       = respond(200, 0.2)
+    failed, backup    = respond(503, 0)
+    assert hedge.race(primary, backup) is ok
+    assert failed.closed
+
+def test_retryable_response_is_returned_when_both_fail(lense):
+    hedge             = make_hedge(lense)
+    first, primary    = respond(502, 0.2)
+    second, backup    = respond(503, 0)
+    assert hedge.race(primary, backup) is second
+    assert first.closed
+
+def test_enabled_string_is_parsed(lense):
+    lense(conf={'hedge': {'enabled': 'false'}})
+    assert ClientHedge().enabled is False
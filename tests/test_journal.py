@@ -0,0 +1,44 @@
+import json
+from os import path
+
+from lense.client.journal import ClientJournal
+
+def journal_in(lense, tmpdir, **conf):
+    conf.setdefault('enabled', True)
+    conf.setdefault('path', str(tmpdir.join('journal.ndjson')))
+    lense(conf={'journal': conf})
+    return ClientJournal()
+
+def lines(name):
+    with open(name) as f:
+        return [json.loads(line) for line in f]
+
+def test_disabled_by_default(lense, tmpdir):
+    journal = ClientJournal()
+    journal.path = str(tmpdir.join('journal.ndjson'))
+    journal.write('http://localhost:10550', 'user', 'get', 200, 0.1)
+    journal.close()
+    assert not journal.enabled
+    assert not path.exists(journal.path)
+
+def test_entries_are_written_in_order(lense, tmpdir):
+    journal = journal_in(lense, tmpdir, enabled='yes')
+    for i in range(3):
+        journal.write('http://localhost:10550', 'user/{0}'.format(i), 'get', 200, 0.1, size=10)
+    journal.close()
+    written = lines(journal.path)
+    assert [e['path'] for e in written] == ['user/0', 'user/1', 'user/2']
+    assert written[0]['method'] == 'GET'
+
+def test_rotation_keeps_the_configured_backups(lense, tmpdir):
+    journal = journal_in(lense, tmpdir, max_bytes=1, backups=2)
+
+    # Each write fills the journal and rotates it
+    for i in range(4):
+        journal._queue.put({'path': 'user/{0}'.format(i)})
+        journal._queue.put(None)
+        journal._writer()
+    assert journal.files() == [journal.path + '.2', journal.path + '.1']
+    assert lines(journal.path + '.2') == [{'path': 'user/2'}]
+    assert lines(journal.path + '.1') == [{'path': 'user/3'}]
+    assert not path.exists(journal.path + '.3')
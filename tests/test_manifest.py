@@ -0,0 +1,97 @@
+import json
+from threading import Thread
+
+import pytest
+
+requests = pytest.importorskip('requests')
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+from lense.common.exceptions import ClientError
+from lense.client import manifest as manifest_module
+from lense.client.manifest import ClientManifestFetcher
+
+class GitHubRaw(BaseHTTPRequestHandler):
+    """
+    Serves manifests by path with an ETag, answering revalidations with 304.
+    """
+    manifests = {}
+    requests  = []
+
+    def do_GET(self):
+        GitHubRaw.requests.append((self.path, self.headers.get('If-None-Match')))
+        manifest = self.manifests.get(self.path)
+        if manifest is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        etag = '"{0}"'.format(manifest['version'])
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = json.dumps(manifest).encode('utf-8')
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class FakeREST(object):
+    _session = requests.Session()
+
+    @classmethod
+    def session(cls):
+        return cls._session
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(GitHubRaw, 'manifests', {})
+    monkeypatch.setattr(GitHubRaw, 'requests', [])
+    httpd  = HTTPServer(('127.0.0.1', 0), GitHubRaw)
+    thread = Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield 'http://127.0.0.1:{0}'.format(httpd.server_address[1])
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.fixture
+def fetcher(lense, server, tmpdir, monkeypatch):
+    monkeypatch.setattr(manifest_module, 'MANIFEST_CACHE', str(tmpdir.join('manifests')))
+    lense(conf={'manifest': {'url': server + '/{account}/{repository}/{branch}/manifest.json', 'timeout': 5}})
+    lense.current.CLIENT.REST = FakeREST
+    return ClientManifestFetcher()
+
+def test_cached_manifest_is_revalidated(fetcher):
+    GitHubRaw.manifests['/lense/module/master/manifest.json'] = {'name': 'module', 'version': '1'}
+    assert fetcher.get('lense', 'module')['version'] == '1'
+    assert fetcher.get('lense', 'module')['version'] == '1'
+    assert GitHubRaw.requests == [
+        ('/lense/module/master/manifest.json', None),
+        ('/lense/module/master/manifest.json', '"1"')
+    ]
+
+def test_changed_manifest_replaces_the_cache(fetcher):
+    GitHubRaw.manifests['/lense/module/master/manifest.json'] = {'name': 'module', 'version': '1'}
+    fetcher.get('lense', 'module')
+    GitHubRaw.manifests['/lense/module/master/manifest.json'] = {'name': 'module', 'version': '2'}
+    assert fetcher.get('lense', 'module')['version'] == '2'
+    assert fetcher._load(fetcher.url.format(account='lense', repository='module', branch='master'))['etag'] == '"2"'
+
+def test_branches_are_cached_separately(fetcher):
+    GitHubRaw.manifests['/lense/module/master/manifest.json'] = {'name': 'module', 'version': '1'}
+    GitHubRaw.manifests['/lense/module/dev/manifest.json'] = {'name': 'module', 'version': '2-dev'}
+    assert fetcher.get('lense', 'module')['version'] == '1'
+    assert fetcher.get('lense', 'module', 'dev')['version'] == '2-dev'
+    assert [r[1] for r in GitHubRaw.requests] == [None, None]
+
+def test_missing_manifest(fetcher):
+    with pytest.raises(ClientError):
+        fetcher.get('lense', 'missing')
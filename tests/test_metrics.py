@@ -0,0 +1,35 @@
+from lense.client.metrics import ClientMetrics
+
+def make_metrics(lense, tmpdir, **conf):
+    attrs = {'enabled': True, 'path': str(tmpdir.join('metrics.prom'))}
+    attrs.update(conf)
+    lense(conf={'metrics': attrs})
+    return ClientMetrics()
+
+def test_enabled_is_a_bool(lense, tmpdir):
+    assert make_metrics(lense, tmpdir, enabled='false').enabled is False
+    assert make_metrics(lense, tmpdir, enabled=1).enabled is True
+
+def test_gauges_survive_later_runs(lense, tmpdir):
+    first = make_metrics(lense, tmpdir)
+    first.gauge('concurrency_limit', 8)
+    first.flush()
+
+    # A later run without the gauge keeps the last value
+    second = make_metrics(lense, tmpdir)
+    second.incr('requests_total')
+    second.flush()
+    with open(second.path) as f:
+        exposition = f.read()
+    assert 'lense_client_concurrency_limit 8' in exposition
+    assert '# TYPE lense_client_concurrency_limit gauge' in exposition
+    assert '# TYPE lense_client_requests_total counter' in exposition
+
+def test_statsd_timings_are_bounded(lense, tmpdir, monkeypatch):
+    metrics = make_metrics(lense, tmpdir, export='statsd', statsd_buffer=10)
+    sent    = []
+    monkeypatch.setattr(metrics, '_send_statsd', sent.extend)
+    for _ in range(25):
+        metrics.observe('request_seconds', 0.1)
+    assert len(sent) == 20
+    assert len(metrics._timings) == 5
@@ -0,0 +1,170 @@
+import json
+from os import makedirs
+from threading import Lock
+from time import sleep
+
+import pytest
+
+from lense.client.concurrency import ClientConcurrency
+from lense.client.registry import ClientModuleRegistry
+from lense.client.handlers import module as module_handler
+from lense.client.handlers.module import ClientHandler_Module
+
+class FakeResponse(object):
+    def __init__(self, code):
+        self.code = code
+
+class Engine(object):
+    """
+    Records handler registration requests and the peak number in flight.
+    """
+    def __init__(self, codes=None):
+        self.codes    = codes or {}
+        self.requests = []
+        self.inflight = 0
+        self.peak     = 0
+        self._lock    = Lock()
+
+    def request(self, path, method, data, ensure=True):
+        with self._lock:
+            self.inflight += 1
+            self.peak      = max(self.peak, self.inflight)
+        sleep(0.05)
+        with self._lock:
+            self.inflight -= 1
+            self.requests.append((path, json.loads(data)))
+        name = json.loads(data).get('name')
+        return FakeResponse(self.codes.get(name, 200))
+
+@pytest.fixture
+def handler(lense, tmpdir, monkeypatch):
+    """
+    A module handler with an empty modules root and a fake engine.
+    """
+    root = tmpdir.mkdir('modules')
+    monkeypatch.setattr(module_handler, 'ClientModuleRegistry', lambda r: ClientModuleRegistry(str(root)))
+    lense(conf={'concurrency': {'initial': 4}})
+    client             = lense.current.CLIENT
+    client.CONCURRENCY = ClientConcurrency()
+    client.REST        = Engine()
+    client.support     = {}
+    handler            = ClientHandler_Module()
+    handler.root       = str(root)
+    return handler
+
+def manifests(tmpdir, *handlers):
+    directory = tmpdir.mkdir('manifests')
+    for i, handler in enumerate(handlers):
+        directory.join('{0}.json'.format(i)).write(handler if isinstance(handler, str) else json.dumps(handler))
+    return str(directory)
+
+def handler_data(name):
+    return {'name': name, 'path': name, 'method': 'GET'}
+
+def test_handlers_are_registered_concurrently(lense, handler, tmpdir):
+    handlers = handler._get_handler_manifests(manifests(tmpdir, *[handler_data('h{0}'.format(i)) for i in range(8)]))
+    handler._register_handlers(handlers)
+    engine = lense.current.CLIENT.REST
+    assert sorted(data['name'] for path, data in engine.requests) == sorted('h{0}'.format(i) for i in range(8))
+    assert all(data['validate'] is False for path, data in engine.requests)
+    assert 1 < engine.peak <= 4
+    assert lense.current.FEEDBACK.calls[-1] == ('info', ('Registered 8 handler(s), concurrency_limit=4',))
+
+def test_invalid_manifests_register_nothing(lense, handler, tmpdir):
+    directory = manifests(tmpdir, handler_data('ok'), '{broken', {'name': 'no_path'})
+    with pytest.raises(SystemExit) as error:
+        handler._get_handler_manifests(directory)
+    assert 'Failed to validate 2 handler manifest(s)' in str(error.value)
+    assert len([c for c in lense.current.FEEDBACK.calls if c[0] == 'error']) == 2
+    assert not lense.current.CLIENT.REST.requests
+
+def test_bulk_registration_when_supported(lense, handler):
+    lense.current.CLIENT.support = {'handler_bulk': {'path': 'handler/bulk', 'method': 'POST'}}
+    handler._register_handlers([handler_data('a'), handler_data('b')])
+    assert lense.current.CLIENT.REST.requests == [('handler/bulk', {'handlers': [handler_data('a'), handler_data('b')]})]
+
+def test_failed_registrations_are_counted(lense, handler):
+    lense.current.CLIENT.REST.codes = {'b': 500}
+    with pytest.raises(SystemExit) as error:
+        handler._register_handlers([handler_data('a'), handler_data('b'), handler_data('c')])
+    assert 'Failed to register 1 of 3 handler(s)' in str(error.value)
+
+class FakeGitHub(object):
+    """
+    Module remotes: the names of modules behind and failing, with the
+    fetches that overlapped.
+    """
+    behind_modules = set()
+    failing        = {}
+    fetched        = []
+    overlap        = [0, 0]
+    lock           = Lock()
+
+    def __init__(self, local, remote, branch):
+        self.local        = local
+        self.name         = local.rsplit('/', 1)[1]
+        self.behind       = self.name in self.behind_modules
+        self.local_commit = 'abc123'
+
+    @classmethod
+    def fetch(cls, local, remote, branch):
+        with cls.lock:
+            cls.overlap[0] += 1
+            cls.overlap[1]  = max(cls.overlap)
+        sleep(0.05)
+        with cls.lock:
+            cls.overlap[0] -= 1
+            cls.fetched.append(local.rsplit('/', 1)[1])
+        return cls(local, remote, branch)
+
+    def update(self):
+        if self.name in self.failing:
+            raise self.failing[self.name]
+
+@pytest.fixture
+def installed(lense, handler, monkeypatch):
+    """
+    Install modules in the handler's modules root.
+    """
+    monkeypatch.setattr(FakeGitHub, 'fetched', [])
+    monkeypatch.setattr(FakeGitHub, 'overlap', [0, 0])
+    lense.current.CLIENT.GITHUB = FakeGitHub
+    def install(*names):
+        for name in names:
+            root = handler.root + '/' + name
+            makedirs(root)
+            with open(root + '/manifest.json', 'w') as f:
+                json.dump({'name': name, 'description': name, 'author': 'test', 'version': '0.1',
+                    'source': {'type': 'github', 'uri': 'https://github.com/lense/' + name}}, f)
+        return handler
+    return install
+
+def summary(lense):
+    return [c[1][0] for c in lense.current.FEEDBACK.calls if c[0] == 'block'][-1]
+
+def test_upgrade_all_fetches_in_parallel_and_updates_behind_modules(lense, installed, monkeypatch):
+    monkeypatch.setattr(FakeGitHub, 'behind_modules', set(['beta']))
+    handler = installed('alpha', 'beta', 'gamma', 'delta')
+    lense.current.CLIENT.ARGS.container.update({'all': True, 'jobs': '4'})
+    handler.upgrade()
+    assert sorted(FakeGitHub.fetched) == ['alpha', 'beta', 'delta', 'gamma']
+    assert FakeGitHub.overlap[1] > 1
+    assert sorted(summary(lense)) == ['alpha: up to date', 'beta: updated -> abc123', 'delta: up to date', 'gamma: up to date']
+
+def test_upgrade_selected_modules_with_one_job(lense, installed):
+    handler = installed('alpha', 'beta', 'gamma')
+    handler.module = 'alpha, gamma'
+    lense.current.CLIENT.ARGS.container['jobs'] = '1'
+    handler.upgrade()
+    assert sorted(FakeGitHub.fetched) == ['alpha', 'gamma']
+    assert FakeGitHub.overlap[1] == 1
+
+def test_failed_upgrades_are_reported_after_the_others(lense, installed, monkeypatch):
+    monkeypatch.setattr(FakeGitHub, 'behind_modules', set(['alpha', 'beta']))
+    monkeypatch.setattr(FakeGitHub, 'failing', {'alpha': ValueError('not a fast-forward')})
+    handler = installed('alpha', 'beta')
+    lense.current.CLIENT.ARGS.container['all'] = True
+    with pytest.raises(SystemExit) as error:
+        handler.upgrade()
+    assert 'Failed to upgrade 1 of 2 module(s)' in str(error.value)
+    assert sorted(summary(lense)) == ['alpha: failed: not a fast-forward', 'beta: updated -> abc123']
@@ -0,0 +1,64 @@
+import io
+import json
+
+import pytest
+
+pytest.importorskip('requests')
+
+from lense.client import formatters
+
+SUPPORT = {'path': 'user', 'method': 'GET', 'supports': ['fields', 'filter']}
+USERS   = [{'username': 'admin', 'is_active': True, 'uid': 1}, {'username': 'guest', 'is_active': False, 'uid': 2}]
+
+@pytest.fixture
+def rest(lense, monkeypatch):
+    from lense.client.rest import ClientREST
+    monkeypatch.setattr(ClientREST, 'headers', lambda self: {})
+    return ClientREST.__new__(ClientREST)
+
+@pytest.fixture
+def client(lense, monkeypatch):
+    """
+    A client interface writing formatted output to a buffer.
+    """
+    from lense.client import interface
+    output = io.StringIO()
+    monkeypatch.setattr(interface, 'get_formatter', lambda name, fields=None: formatters.FORMATTERS[name](stream=output, fields=fields))
+    client        = interface.ClientInterface()
+    client.ARGS   = lense.current.CLIENT.ARGS
+    client.output = output
+    return client
+
+def render(client, content, server):
+    """
+    Write a response, returning the decoded output.
+    """
+    from lense.client.interface import ClientResponse
+    with pytest.raises(SystemExit):
+        client.http_response(ClientResponse(content), server=server)
+    return json.loads(client.output.getvalue())
+
+@pytest.mark.parametrize('supports,expected', [
+    (['fields', 'filter'], {'fields': 'username', 'filter': 'is_active=true'}),
+    (['filter'], {'filter': 'is_active=true'}),
+    ([], {})
+])
+def test_only_advertised_options_are_sent(lense, rest, supports, expected):
+    lense.current.CLIENT.ARGS.container.update({'select': 'username', 'filter': 'is_active=true'})
+    support = dict(SUPPORT, supports=supports)
+    assert rest.passthrough(support) == expected
+    assert rest.request_params('GET', None, support).get('params', {}) == expected
+
+def test_query_parameters_are_separate_from_post_data(lense, rest):
+    lense.current.CLIENT.ARGS.container['fields'] = 'uuid'
+    params = rest.request_params('POST', {'username': 'new'}, dict(SUPPORT, method='POST'))
+    assert params['data'] == {'username': 'new'}
+    assert params['params'] == {'fields': 'uuid'}
+
+def test_client_applies_options_the_engine_did_not(lense, client):
+    lense.current.CLIENT.ARGS.container.update({'fields': 'username', 'filter': 'is_active=true'})
+    assert render(client, USERS, []) == [{'username': 'admin'}]
+
+def test_client_skips_options_applied_by_the_engine(lense, client):
+    lense.current.CLIENT.ARGS.container.update({'fields': 'username', 'filter': 'is_active=true'})
+    assert render(client, USERS, ['fields', 'filter']) == USERS
@@ -0,0 +1,65 @@
+import json
+from os import path, makedirs
+
+import pytest
+
+from lense.client import registry as registry_module
+from lense.client.registry import ClientModuleRegistry
+
+@pytest.fixture
+def root(tmpdir):
+    """
+    A modules root with one installed module.
+    """
+    root = str(tmpdir.join('modules'))
+    makedirs(path.join(root, 'example'))
+    with open(path.join(root, 'example', 'manifest.json'), 'w') as f:
+        json.dump({'name': 'example', 'version': '0.1.0'}, f)
+    return root
+
+def index_of(root):
+    return '{0}.index.json'.format(root)
+
+class TestReadOnlyCommands(object):
+    """
+    Listing and inspecting modules never writes the index.
+    """
+    def test_missing_index_is_rebuilt_in_memory(self, lense, root):
+        registry = ClientModuleRegistry(root)
+        assert [m['name'] for m in registry.all()] == ['example']
+        assert registry.get('example')['version'] == '0.1.0'
+        assert not path.exists(index_of(root))
+
+    def test_unreadable_index_is_left_alone(self, lense, root):
+        with open(index_of(root), 'w') as f:
+            f.write('{not json')
+        registry = ClientModuleRegistry(root)
+        assert registry.get('example')['name'] == 'example'
+        with open(index_of(root)) as f:
+            assert f.read() == '{not json'
+
+class TestChangingCommands(object):
+    """
+    Install, remove and upgrade save the index explicitly.
+    """
+    def test_save_writes_the_index(self, lense, root):
+        registry = ClientModuleRegistry(root)
+        registry.update('example')
+        registry.save()
+        with open(index_of(root)) as f:
+            assert json.load(f)['modules']['example']['version'] == '0.1.0'
+        assert not registry.changed
+
+    def test_saved_index_is_used_without_rescanning(self, lense, root, monkeypatch):
+        registry = ClientModuleRegistry(root)
+        registry.save()
+        loaded = ClientModuleRegistry(root)
+        monkeypatch.setattr(loaded, 'update', lambda name: pytest.fail('rescanned {0}'.format(name)))
+        assert [m['name'] for m in loaded.all()] == ['example']
+
+    def test_save_skips_a_read_only_index(self, lense, root, monkeypatch):
+        monkeypatch.setattr(registry_module, 'access', lambda path, mode: False)
+        registry = ClientModuleRegistry(root)
+        registry.save()
+        assert registry.changed
+        assert not path.exists(index_of(root))
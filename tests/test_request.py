@@ -0,0 +1,88 @@
+import json
+import types
+from threading import Lock
+from time import sleep
+
+import pytest
+
+from lense.client.concurrency import ClientConcurrency
+
+# The argument parser loads every handler, import it before the request handler
+import lense.client.args
+from lense.client.handlers.request import ClientHandler_Request
+
+SUPPORT = {'user_create': {'path': 'user', 'method': 'POST', 'desc': 'Create a user'}}
+
+class Engine(object):
+    """
+    Records request bodies, failing usernames listed in "reject".
+    """
+    def __init__(self, reject=()):
+        self.reject   = reject
+        self.bodies   = []
+        self.kwargs   = []
+        self.inflight = 0
+        self.peak     = 0
+        self._lock    = Lock()
+
+    def request(self, path, method, data, support=None, ensure=True, retry=None):
+        with self._lock:
+            self.inflight += 1
+            self.peak      = max(self.peak, self.inflight)
+        sleep(0.02)
+        with self._lock:
+            self.inflight -= 1
+        body = data.read() if hasattr(data, 'read') else (data if isinstance(data, bytes) else b''.join(data))
+        self.bodies.append(body)
+        self.kwargs.append({'data': data, 'retry': retry})
+        code = 400 if any(name in str(body) for name in self.reject) else 200
+        return types.SimpleNamespace(code=code, content={'error': 'rejected'} if code == 400 else {})
+
+@pytest.fixture
+def request_handler(lense, tmpdir):
+    """
+    Build a request handler for the user_create command with a data file.
+    """
+    def build(lines, engine=None, **args):
+        data_file = tmpdir.join(args.pop('name', 'users.ndjson'))
+        data_file.write_binary(lines)
+        lense(conf={'concurrency': {'initial': 4, 'max': 8}},
+            args=dict(args, command='user_create', data_file=str(data_file)))
+        lense.current.CLIENT.support     = SUPPORT
+        lense.current.CLIENT.CONCURRENCY = ClientConcurrency()
+        lense.current.CLIENT.REST        = engine or Engine()
+        return ClientHandler_Request()
+    return build
+
+def test_records_are_posted_concurrently(lense, request_handler):
+    records = [json.dumps({'username': 'user{0}'.format(i)}) for i in range(12)]
+    handler = request_handler(('\n'.join(records) + '\n\n').encode('utf-8'))
+    assert handler.ndjson
+    with pytest.raises(SystemExit) as exit:
+        handler._upload(SUPPORT['user_create'])
+    assert exit.value.code == 0
+    engine = lense.current.CLIENT.REST
+    assert sorted(engine.bodies) == sorted(r.encode('utf-8') for r in records)
+    assert engine.peak > 1
+    assert lense.current.FEEDBACK.calls[-1] == ('success', ('records_posted=12, records_failed=0, concurrency_limit=4',))
+
+def test_failed_records_are_reported_by_line(lense, request_handler):
+    handler = request_handler(b'{"username": "ok"}\n\n{"username": "bad"}\n', engine=Engine(reject=['bad']))
+    with pytest.raises(SystemExit) as exit:
+        handler._upload(SUPPORT['user_create'])
+    assert str(exit.value).startswith('records_posted=1, records_failed=1')
+    errors = [c[1][0] for c in lense.current.FEEDBACK.calls if c[0] == 'error']
+    assert errors == ["Record on line 3 failed: HTTP 400: {'error': 'rejected'}"]
+
+@pytest.mark.parametrize('chunked', [False, True])
+def test_data_file_is_streamed_once(lense, request_handler, chunked):
+    body    = b'{"users": [' + b','.join(b'{"username": "u"}' for _ in range(5000)) + b']}'
+    handler = request_handler(body, name='users.json', chunked=chunked)
+    assert not handler.ndjson
+    handler._stream(SUPPORT['user_create'])
+    engine = lense.current.CLIENT.REST
+    assert engine.bodies == [body]
+
+    # Sized files are sent as a file object, chunked bodies as a generator
+    assert hasattr(engine.kwargs[0]['data'], 'read') != chunked
+    assert engine.kwargs[0]['retry'].attempts == 1
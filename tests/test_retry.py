@@ -0,0 +1,81 @@
+import pytest
+from time import time
+
+from lense.common.exceptions import RequestError
+from lense.client.retry import ClientRetryPolicy
+from lense.client.timeouts import ClientTimeouts
+from lense.client.endpoints import ClientEndpoints
+
+class FakeResponse(object):
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers     = headers or {}
+
+    def close(self):
+        pass
+
+@pytest.fixture(autouse=True)
+def budget(monkeypatch):
+    monkeypatch.setattr(ClientRetryPolicy, '_tokens', None)
+
+def test_delay_honours_retry_after(lense):
+    policy = ClientRetryPolicy(max_backoff=5.0)
+    assert policy.delay(1, FakeResponse(503, {'Retry-After': '30'})) == 30.0
+
+def test_delay_backoff_is_capped(lense):
+    policy = ClientRetryPolicy(backoff=10.0, max_backoff=0.5)
+    assert 0 <= policy.delay(3, FakeResponse(503)) <= 0.5
+
+def test_budget_is_refilled_by_successes(lense):
+    policy = ClientRetryPolicy(attempts=10, budget=2, refill=0.5)
+    assert policy.retry('GET', 1, response=FakeResponse(503))
+    assert policy.retry('GET', 1, response=FakeResponse(503))
+    assert not policy.retry('GET', 1, response=FakeResponse(503))
+
+    # Two successful requests earn one retry
+    policy.success()
+    policy.success()
+    assert policy.retry('GET', 1, response=FakeResponse(503))
+    assert not policy.retry('GET', 1, response=FakeResponse(503))
+
+def test_budget_is_bounded(lense):
+    policy = ClientRetryPolicy(attempts=10, budget=1, refill=1)
+    for _ in range(5):
+        policy.success()
+    assert policy.retry('GET', 1, response=FakeResponse(503))
+    assert not policy.retry('GET', 1, response=FakeResponse(503))
+
+def test_retry_after_past_deadline_fails_early(lense, monkeypatch):
+    pytest.importorskip('requests')
+    from lense.client.rest import ClientREST
+    lense.current.CLIENT.HEDGE = type('Hedge', (object,), {'enabled': False})()
+    responses = []
+    def call(endpoints, endpoint, path, method, **kwargs):
+        responses.append(FakeResponse(503, {'Retry-After': '60'}))
+        return responses[-1]
+    monkeypatch.setattr(ClientREST, 'call', classmethod(lambda cls, *args, **kwargs: call(*args, **kwargs)))
+
+    start = time()
+    with pytest.raises(RequestError) as error:
+        ClientREST.send(ClientEndpoints(['http://localhost:10550']), 'user', 'GET',
+            ClientRetryPolicy(attempts=3), ClientTimeouts(deadline=2))
+    assert time() - start < 1
+    assert len(responses) == 1
+    assert 'deadline' in str(error.value)
+
+def test_long_retry_after_is_not_waited_for(lense):
+    policy = ClientRetryPolicy(max_retry_after=60)
+    assert policy.retry('GET', 1, response=FakeResponse(503, {'Retry-After': '60'}))
+    assert not policy.retry('GET', 1, response=FakeResponse(503, {'Retry-After': '86400'}))
+
+def test_long_retry_after_returns_the_response(lense, monkeypatch):
+    pytest.importorskip('requests')
+    from lense.client.rest import ClientREST
+    lense.current.CLIENT.HEDGE = type('Hedge', (object,), {'enabled': False})()
+    response = FakeResponse(429, {'Retry-After': '86400'})
+    monkeypatch.setattr(ClientREST, 'call', classmethod(lambda cls, *args, **kwargs: response))
+
+    start = time()
+    assert ClientREST.send(ClientEndpoints(['http://localhost:10550']), 'user', 'GET',
+        ClientRetryPolicy(attempts=3), ClientTimeouts()) is response
+    assert time() - start < 1
@@ -0,0 +1,81 @@
+import json
+from time import time
+
+import pytest
+
+from lense.common.exceptions import ClientError
+from lense.client.journal import ClientJournal
+from lense.client.handlers import stats
+from lense.client.handlers.stats import ClientStats, ClientHandler_Stats
+
+def entry(path, status=200, latency=0.1, ts=None, method='GET', size=0):
+    return {'ts': ts or time(), 'endpoint': 'http://localhost:10550', 'path': path, 'method': method,
+        'status': status, 'latency': latency, 'bytes': size, 'sent': 0}
+
+@pytest.fixture
+def journal(lense, tmpdir):
+    """
+    A journal with one rotated file and the current file.
+    """
+    def write(rotated, current):
+        for name, entries in [('journal.ndjson.1', rotated), ('journal.ndjson', current)]:
+            with open(str(tmpdir.join(name)), 'w') as f:
+                f.write(''.join(json.dumps(e) + '\n' for e in entries))
+        return write
+    lense.current.CLIENT.JOURNAL = ClientJournal()
+    lense.current.CLIENT.JOURNAL.path = str(tmpdir.join('journal.ndjson'))
+    return write
+
+@pytest.fixture
+def output(monkeypatch):
+    """
+    Rows written by the stats handler.
+    """
+    rows = []
+    class Formatter(object):
+        def write(self, written):
+            rows.extend(written)
+    monkeypatch.setattr(stats, 'get_formatter', lambda name, fields=None: Formatter())
+    return rows
+
+def run(lense, args=None):
+    lense.current.CLIENT.ARGS.container.update(args or {})
+    ClientHandler_Stats().default()
+
+@pytest.mark.parametrize('status,error', [(200, False), (304, False), (404, True), (503, True), (None, True)])
+def test_errors(status, error):
+    result = ClientStats()
+    result.add(entry('user', status))
+    assert result.errors == int(error)
+
+def test_percentiles_are_within_ten_percent():
+    result = ClientStats()
+    for ms in range(1, 1001):
+        result.add(entry('user', latency=ms / 1000.0))
+    assert result.percentile(50) == pytest.approx(500, rel=0.1)
+    assert result.percentile(99) == pytest.approx(990, rel=0.1)
+    assert result.row()['avg_ms'] == pytest.approx(500.5)
+
+def test_paths_are_aggregated_across_rotated_files(lense, journal, output):
+    journal([entry('user', latency=0.5), entry('group')], [entry('user', 500, latency=0.5), entry('user', method='POST')])
+    run(lense)
+    by_key = dict(((r['method'], r['path']), r) for r in output)
+    assert by_key[('GET', 'user')]['requests'] == 2
+    assert by_key[('GET', 'user')]['errors'] == 1
+    assert by_key[('GET', 'group')]['requests'] == 1
+    assert by_key[('POST', 'user')]['requests'] == 1
+
+    # Slowest path first
+    assert (output[0]['method'], output[0]['path']) == ('GET', 'user')
+    assert lense.current.FEEDBACK.calls[-1][1][0].startswith('requests=4, paths=3')
+
+def test_top_since_and_path_filters(lense, journal, output):
+    journal([entry('user', ts=time() - 7200)], [entry('user'), entry('group'), entry('group/member'), entry('token')])
+    run(lense, {'top': '2', 'since': '1h', 'path': '^group', 'sort': 'requests'})
+    assert sorted(r['path'] for r in output) == ['group', 'group/member']
+
+@pytest.mark.parametrize('top', ['ten', '-1', '0', '1.5'])
+def test_invalid_top(lense, journal, top):
+    lense.current.CLIENT.ARGS.container['top'] = top
+    with pytest.raises(ClientError):
+        ClientHandler_Stats()
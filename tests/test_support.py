@@ -0,0 +1,92 @@
+import json
+import types
+from os import utime
+from time import time
+from threading import Event
+
+import pytest
+
+pytest.importorskip('requests')
+
+from lense.common.exceptions import RequestError
+
+OLD = {'user_get': {'path': 'user', 'method': 'GET'}}
+NEW = {'user_get': {'path': 'user', 'method': 'GET'}, 'group_get': {'path': 'group', 'method': 'GET'}}
+
+class Engine(object):
+    """
+    Answers handler/list requests, optionally blocking until released.
+    """
+    def __init__(self, content, code=200):
+        self.content = content
+        self.code    = code
+        self.calls   = 0
+        self.release = Event()
+        self.release.set()
+
+    def request_anonymous(self, path, method, timeouts=None):
+        from lense.client.interface import ClientResponse
+        self.calls += 1
+        self.release.wait(5)
+        return ClientResponse(self.content, self.code)
+
+@pytest.fixture
+def cache(tmpdir, monkeypatch):
+    from lense.client import interface
+    path = tmpdir.join('support.json')
+    monkeypatch.setattr(interface, 'SUPPORT_CACHE', str(path))
+    monkeypatch.setattr(interface, 'atexit', types.SimpleNamespace(register=lambda func: None))
+    return path
+
+def client_for(lense, engine):
+    from lense.client.interface import ClientInterface
+    client         = ClientInterface()
+    client.METRICS = lense.current.CLIENT.METRICS
+    client.REST    = engine
+    return client
+
+def write(cache, content, age=0):
+    cache.write(json.dumps(content))
+    utime(str(cache), (time() - age, time() - age))
+
+def test_loaded_on_first_use_and_cached(lense, cache):
+    engine = Engine(NEW)
+    client = client_for(lense, engine)
+    assert engine.calls == 0
+    assert client.support == NEW
+    assert client.support == NEW
+    assert engine.calls == 1
+    assert json.loads(cache.read()) == NEW
+    assert ('cache', ('support', False)) in lense.current.CLIENT.METRICS.calls
+
+def test_fresh_cache_is_not_refreshed(lense, cache):
+    write(cache, OLD)
+    engine = Engine(NEW)
+    assert client_for(lense, engine).support == OLD
+    assert engine.calls == 0
+
+def test_stale_cache_is_used_while_revalidating(lense, cache):
+    write(cache, OLD, age=90000)
+    engine = Engine(NEW)
+    engine.release.clear()
+    client = client_for(lense, engine)
+
+    # The stale copy is returned without waiting for the engine
+    assert client.support == OLD
+    engine.release.set()
+    client._wait_refresh()
+    assert engine.calls == 1
+    assert json.loads(cache.read()) == NEW
+
+def test_failed_revalidation_keeps_the_stale_cache(lense, cache):
+    write(cache, OLD, age=90000)
+    client = client_for(lense, Engine({'error': 'down'}, 503))
+    assert client.support == OLD
+    client._wait_refresh()
+    assert json.loads(cache.read()) == OLD
+    assert lense.current.LOG.calls[-1][0] == 'error'
+
+def test_missing_cache_and_engine_error(lense, cache):
+    with pytest.raises(RequestError):
+        client_for(lense, Engine({'error': 'down'}, 503)).support
+    assert not cache.check()
@@ -0,0 +1,97 @@
+from os import listdir
+from time import time, sleep
+from threading import Thread, Event
+
+import pytest
+
+from lense.client import throttle as throttle_module
+from lense.client.throttle import ClientThrottle, TokenBucket, FileTokenBucket, InFlightGovernor, FileInFlightGovernor
+
+@pytest.fixture
+def home(tmpdir, monkeypatch):
+    """
+    Shared limiter state in a temporary directory.
+    """
+    home = str(tmpdir.join('throttle'))
+    monkeypatch.setattr(throttle_module, 'THROTTLE_HOME', home)
+    return home
+
+def test_shared_string_is_parsed(lense, home):
+    lense(conf={'throttle': {'shared': 'false'}})
+    assert ClientThrottle().shared is False
+
+class TestTokenBucket(object):
+
+    def test_burst_then_rate(self, lense):
+        bucket = TokenBucket(rate=20, burst=3)
+        start  = time()
+        for _ in range(5):
+            bucket.acquire()
+        # Three immediate tokens, two more at 20 per second
+        assert 0.08 <= time() - start < 0.5
+
+    def test_file_bucket_is_shared(self, lense, tmpdir):
+        state = str(tmpdir.join('engine.bucket'))
+        first, second = FileTokenBucket(10, 2, state), FileTokenBucket(10, 2, state)
+        start = time()
+        first.acquire()
+        second.acquire()
+        assert time() - start < 0.05
+
+        # The burst is used up by the other limiter
+        first.acquire()
+        assert time() - start >= 0.08
+
+class TestGovernors(object):
+
+    def hold(self, governor, held, release):
+        governor.acquire()
+        held.append(1)
+        release.wait(5)
+        governor.release()
+
+    @pytest.mark.parametrize('shared', [False, True])
+    def test_in_flight_limit(self, lense, tmpdir, shared):
+        governor = FileInFlightGovernor(2, str(tmpdir.join('slot'))) if shared else InFlightGovernor(2)
+        held     = []
+        release  = Event()
+        threads  = [Thread(target=self.hold, args=[governor, held, release]) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        sleep(0.2)
+        assert len(held) == 2
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert len(held) == 3
+
+class TestClientThrottle(object):
+
+    def test_endpoint_and_path_limits(self, lense, home):
+        lense(conf={'throttle': {
+            'rate': 0, 'max_in_flight': 4,
+            'endpoints': {'node1:10550': {'rate': 5}},
+            'paths': {'user': {'max_in_flight': 1}}
+        }})
+        throttle = ClientThrottle()
+        (node_bucket, node_governor), (path_bucket, path_governor) = throttle.limiters('http://node1:10550', 'user')
+        assert node_bucket.rate == 5 and node_governor.limit == 4
+        assert path_bucket is None and path_governor.limit == 1
+        assert throttle.limiters('http://node1:10550', 'user')[1][1] is path_governor
+
+        # Unlisted paths only have the endpoint limits
+        assert throttle.limiters('http://node1:10550', 'group')[1] == (None, None)
+
+    def test_slot_is_released_on_errors(self, lense, home):
+        lense(conf={'throttle': {'paths': {'user': {'max_in_flight': 1}}}})
+        throttle = ClientThrottle()
+        with pytest.raises(ValueError):
+            with throttle.slot('http://node1:10550', 'user'):
+                raise ValueError('failed')
+        with throttle.slot('http://node1:10550', 'user'):
+            pass
+
+    def test_shared_limits_use_files(self, lense, home):
+        lense(conf={'throttle': {'shared': True, 'rate': 10, 'max_in_flight': 1}})
+        with ClientThrottle().slot('http://node1:10550', 'user'):
+            assert sorted(listdir(home)) == ['node1_10550.bucket', 'node1_10550.slot.0']
@@ -0,0 +1,60 @@
+import pytest
+
+from lense.common.exceptions import RequestError
+from lense.client.retry import ClientRetryPolicy
+from lense.client.timeouts import ClientTimeouts
+from lense.client.endpoints import ClientEndpoints
+
+def test_configuration_precedence(lense):
+    lense(conf={'timeouts': {'connect': 2, 'read': 20, 'deadline': 60}}, args={'timeout': '30'})
+    timeouts = ClientTimeouts.from_conf()
+    assert (timeouts.connect, timeouts.read, timeouts.deadline) == (2.0, 20.0, 30.0)
+    assert ClientTimeouts.from_conf({'read': 5}).read == 5.0
+    assert ClientTimeouts.from_conf(10).deadline == 10.0
+
+def test_attempt_timeouts_are_capped_by_the_deadline(lense):
+    timeouts = ClientTimeouts(connect=5, read=30, deadline=3)
+    connect, read = timeouts.timeout(timeouts.expires())
+    assert 2.9 < connect <= 3 and 2.9 < read <= 3
+    assert ClientTimeouts(connect=5, read=30).timeout(None) == (5.0, 30.0)
+
+class TestSend(object):
+    """
+    Timeouts applied by ClientREST.send.
+    """
+    @pytest.fixture
+    def attempts(self, lense, monkeypatch):
+        requests = pytest.importorskip('requests')
+        from lense.client.rest import ClientREST
+        lense.current.CLIENT.HEDGE = type('Hedge', (object,), {'enabled': False})()
+        monkeypatch.setattr(ClientRetryPolicy, '_tokens', None)
+        attempts = []
+        def call(cls, endpoints, endpoint, path, method, **kwargs):
+            attempts.append(kwargs['timeout'])
+            raise requests.Timeout('read timed out')
+        monkeypatch.setattr(ClientREST, 'call', classmethod(call))
+        return attempts
+
+    def send(self, method, timeouts):
+        from lense.client.rest import ClientREST
+        return ClientREST.send(ClientEndpoints(['http://localhost:10550']), 'user', method,
+            ClientRetryPolicy(attempts=3, backoff=0), timeouts)
+
+    def test_timeouts_are_passed_to_each_attempt(self, attempts):
+        with pytest.raises(RequestError) as error:
+            self.send('GET', ClientTimeouts(connect=1, read=2))
+        assert attempts == [(1.0, 2.0)] * 3
+        assert 'timed out' in str(error.value)
+
+    def test_writes_are_not_retried_after_a_timeout(self, attempts):
+        with pytest.raises(RequestError):
+            self.send('POST', ClientTimeouts(connect=1, read=2))
+        assert len(attempts) == 1
+
+    def test_deadline_shrinks_later_attempts(self, attempts, monkeypatch):
+        from lense.client import retry
+        monkeypatch.setattr(retry, 'uniform', lambda low, high: 0.3)
+        with pytest.raises(RequestError):
+            self.send('GET', ClientTimeouts(connect=5, read=30, deadline=1))
+        assert attempts[0][1] <= 1
+        assert all(later[1] < first[1] for first, later in zip(attempts, attempts[1:]))
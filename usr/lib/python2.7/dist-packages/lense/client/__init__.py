@@ -2,6 +2,7 @@ from sys import argv, exit
 from os.path import dirname, realpath, expanduser
 
 # Lense Libraries
+from lense.client.profiler import PROFILER
 from lense.common.exceptions import ClientError, RequestError
 
 # Global attributes
@@ -26,8 +27,10 @@ class LenseClient(object):
             error = 'Cannot load unsupported command: {0}'.format(argv[0]),
             code  = 1)
     
-        # Run the target command
-        return command().run()
+        # Initialize and run the target command
+        with PROFILER.phase('handler_init'):
+            handler = command()
+        return handler.run()
     
     @classmethod
     def run(cls):
@@ -37,9 +40,11 @@ class LenseClient(object):
         try:
             
             # Bootstrap the client
-            LENSE.CLIENT.bootstrap()
+            with PROFILER.phase('bootstrap'):
+                LENSE.CLIENT.bootstrap()
             
-            # Supported handlers
+            # Global flags / supported handlers
+            LENSE.CLIENT.ARGS.strip_globals()
             handlers = LENSE.CLIENT.ARGS.handlers()
             
             # Pass to handler
@@ -76,11 +81,11 @@ class LenseClient(object):
             
         # Client error
         except ClientError as e:
-            LENSE.LOG.exception(e.message)
-            LENSE.CLIENT.error(e.message)
+            LENSE.LOG.exception(str(e))
+            LENSE.CLIENT.error(str(e))
             
         # Request error
         except RequestError as e:
-            LENSE.LOG.error(e.message)
-            LENSE.CLIENT.http_error(e.code, e.message)
+            LENSE.LOG.error(str(e))
+            LENSE.CLIENT.http_error(e.code, str(e))
             
\ No newline at end of file
@@ -1,13 +1,18 @@
-import re
 from os import environ
 from sys import argv, exit
 from json import loads as json_loads
 from argparse import ArgumentParser, RawTextHelpFormatter
 
 # Lense Libraries
+from lense.client import CLIENT_HOME
+from lense.client.env import ClientEnvironment
+from lense.client.profiler import PROFILER
 from lense.client.handlers import ClientHandlers
 from lense.client.args.options import OPTIONS
 
+# Global flags accepted anywhere on the command line, read before parsing
+GLOBAL_FLAGS = ['--profile']
+
 def get_base_commands():
     """
     Return base command attributes.
@@ -15,7 +20,7 @@ def get_base_commands():
     commands = {
         "help": "Get help for a specific command: lense help <command>"
     }
-    for handler, cls in ClientHandlers().all().iteritems():
+    for handler, cls in ClientHandlers().all().items():
         commands[handler] = cls.desc['summary']
     return commands
 
@@ -28,7 +33,7 @@ class ClientArgs_Base(object):
     desc       = {
         "title": "Lense Client",
         "summary": "Lense platform command line utilities.",
-        "usage": "\n> lense [command] [subcommand] [options]\n> lense help [target]"
+        "usage": "\n> lense [command] [subcommand] [options] [--profile]\n> lense help [target]"
     }
     
     # Target / options / commands
@@ -54,7 +59,7 @@ class ClientArg_Commands(object):
         Return the handlers help prompt
         """
         cmds_str = ''
-        for cmd, help in self._cmds.iteritems():
+        for cmd, help in self._cmds.items():
             if isinstance(help, str):
                 cmds_str += "> {0}: {1}\n".format(cmd, help)
             else:
@@ -67,7 +72,7 @@ class ClientArg_Option(object):
     """
     def __init__(self, **opts):
         """
-        :param    short: Option short key
+        :param    short: Option short key (optional)
         :type     short: str
         :param     long: Option long key
         :type      long: str
@@ -78,7 +83,7 @@ class ClientArg_Option(object):
         """
         
         # Argparse options
-        self.short    = '-{0}'.format(opts['short'])
+        self.short    = '-{0}'.format(opts['short']) if opts.get('short') else None
         self.long     = '--{0}'.format(opts['long'])
         self.help     = opts['help']
         self.action   = opts['action']
@@ -153,32 +158,41 @@ class ClientArgs(object):
     
     def _getenv(self):
         """
-        Look for API connection environment variables.
+        Look for API connection environment variables and profiles.
         """
+        profile = self.container.get('auth_profile')
         
-        # If calling with sudo, merge sudo user environment
-        if LENSE.CLIENT.as_sudo:
-            user_env  = '/home/{0}/.lense/env.sh'.format(LENSE.CLIENT.sysuser)
-            env_regex = re.compile(r'^export (LENSE_[^=]*)=\"([^"]*)\"$')
-            
-            # Get API environment variables
-            with open(user_env, 'r') as f:
-                for line in f.readlines():
-                    if line.startswith('export LENSE'):
-                        env_key = env_regex.sub(r'\g<1>', line.lstrip().rstrip())
-                        env_val = env_regex.sub(r'\g<2>', line.lstrip().rstrip())
-        
-                        # Update environment
-                        environ[env_key] = env_val
-        
-        # Look for Lense API environment variables
-        for k,v in {
+        # Command line arguments take precedence
+        attrs   = {
             'user':  'LENSE_API_USER',
             'key':   'LENSE_API_KEY',
             'group': 'LENSE_API_GROUP'
-        }.iteritems():
+        }
+        
+        # Sudo user environment / named profile
+        if LENSE.CLIENT.as_sudo or profile:
+            user_env = '/home/{0}/.lense/env.sh'.format(LENSE.CLIENT.sysuser) if LENSE.CLIENT.as_sudo else '{0}/env.sh'.format(CLIENT_HOME)
+            env      = ClientEnvironment(user_env)
+            
+            # Merge the sudo user environment
+            if LENSE.CLIENT.as_sudo:
+                env.load()
+                for k,v in env.environ.items():
+                    environ[k] = v
+            
+            # Selected profile overrides the environment
+            if profile:
+                for k,v in env.get(profile).items():
+                    attr = 'host' if k == 'endpoint' else k
+                    if not self.container.get(attr, None):
+                        self.set(attr, v)
+        
+        # Look for Lense API environment variables
+        for k,v in attrs.items():
             if v in environ and not self.container.get(k, None):
                 self.set(k, environ[v])
+        if 'LENSE_API_ENDPOINT' in environ and not self.container.get('host', None):
+            self.set('host', environ['LENSE_API_ENDPOINT'])
     
     def _desc(self):
          return "{0}\n\n{1}.\n".format(self.desc['title'], self.desc['summary'])
@@ -201,12 +215,15 @@ class ClientArgs(object):
 
         # Load module objects
         if self.objs:
-            for k,a in self.objs.iteritems():
+            for k,a in self.objs.items():
                 self.parser.add_argument(k, nargs='?', default=None, help=a['help'])
 
         # Load client switches
         for arg in self.interface.options:
-            self.parser.add_argument(arg.short, arg.long, help=arg.help, action=arg.action)
+            self.parser.add_argument(*[f for f in [arg.short, arg.long] if f], help=arg.help, action=arg.action)
+        
+        # Global flags are not command options
+        self.strip_globals()
         
         # No parameters given
         if len(argv) == 1:
@@ -223,6 +240,17 @@ class ClientArgs(object):
         """
         self.parser.print_help()
     
+    @staticmethod
+    def strip_globals():
+        """
+        Remove global flags from the command line before dispatching to a
+        command handler, the objects they configure (i.e. PROFILER) read
+        them when the client starts.
+        """
+        for flag in GLOBAL_FLAGS:
+            while flag in argv:
+                argv.remove(flag)
+    
     @staticmethod
     def handlers():
         """
@@ -247,4 +275,5 @@ class ClientArgs(object):
         :param cmds: Additional subcommands
         :type  cmds: dict
         """
-        LENSE.CLIENT.ARGS = cls(desc, opts, cmds, objs, base)
\ No newline at end of file
+        with PROFILER.phase('argparse'):
+            LENSE.CLIENT.ARGS = cls(desc, opts, cmds, objs, base)
\ No newline at end of file
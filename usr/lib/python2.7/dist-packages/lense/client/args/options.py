@@ -3,7 +3,7 @@ OPTIONS = [
     {
         "short": "H",
         "long": "host",
-        "help": "Specify an alternative API server to connect to.",
+        "help": "Specify alternative API servers to connect to: host[:port][,host[:port]...]",
         "action": "store"
     },
     {
@@ -23,5 +23,15 @@ OPTIONS = [
         "long": "key",
         "help": "Specify an API key if not set as an environment variable.",
         "action": "store"
+    },
+    {
+        "long": "timeout",
+        "help": "Overall deadline in seconds for each API request, including retries.",
+        "action": "store"
+    },
+    {
+        "long": "auth-profile",
+        "help": "Load API credentials from a named profile in ~/.lense/env.sh.",
+        "action": "store"
     }
-]
\ No newline at end of file
+]
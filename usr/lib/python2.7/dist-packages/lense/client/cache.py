@@ -0,0 +1,177 @@
+from glob import glob
+from time import time
+from copy import deepcopy
+from hashlib import sha1
+from threading import Lock
+from collections import OrderedDict
+from os import makedirs, remove, stat, rename, fdopen
+from os import open as os_open, O_WRONLY, O_CREAT, O_TRUNC
+from os.path import isdir, isfile
+
+# Lense Libraries
+from lense.client import codec
+from lense.client.compat import to_bytes
+from lense.client import CLIENT_HOME
+
+# On-disk response cache
+RESPONSE_CACHE = '{0}/cache'.format(CLIENT_HOME)
+
+class ClientResponseCache(object):
+    """
+    Class object for an opt-in in-memory and on-disk cache of GET responses
+    with per-path TTLs, an LRU size bound and invalidation on writes.
+    """
+    def __init__(self):
+
+        # Time to live from the command line, overrides per-path TTLs
+        self.cli_ttl = self._cli_ttl(LENSE.CLIENT.ARGS.get('cache_ttl'))
+
+        # Cache settings
+        self.enabled = (LENSE.CLIENT.conf('cache', 'enabled', False, boolean=True) or bool(self.cli_ttl)) and \
+            not LENSE.CLIENT.ARGS.get('no_cache', False)
+        self.ttl     = self.cli_ttl or float(LENSE.CLIENT.conf('cache', 'ttl', 60))
+        self.paths   = LENSE.CLIENT.conf('cache', 'paths', {})
+        self.size    = int(LENSE.CLIENT.conf('cache', 'size', 256))
+        self.disk    = LENSE.CLIENT.conf('cache', 'disk', True, boolean=True)
+
+        # In-memory LRU entries
+        self._memory = OrderedDict()
+        self._lock   = Lock()
+
+        # Cache directory
+        if self.enabled and self.disk and not isdir(RESPONSE_CACHE):
+            makedirs(RESPONSE_CACHE, 0o700)
+
+    def _cli_ttl(self, value):
+        """
+        Validate the --cache-ttl argument in seconds.
+        """
+        if value is None:
+            return None
+        try:
+            ttl = float(value)
+        except ValueError:
+            ttl = 0
+        LENSE.CLIENT.ensure(ttl > 0,
+            value = True,
+            error = 'Invalid --cache-ttl "{0}", expected a positive number of seconds'.format(value),
+            code  = 1)
+        return ttl
+
+    def _resource(self, path):
+        """
+        Return the resource a path belongs to (the first path segment).
+        """
+        return path.strip('/').split('/', 1)[0]
+
+    def key(self, endpoint, path, params, user, group):
+        """
+        Construct a cache key for a request.
+
+        :param endpoint: The endpoint URL
+        :type  endpoint: str
+        :param     path: The request path
+        :type      path: str
+        :param   params: The request query parameters
+        :type    params: dict
+        :param     user: The API user
+        :type      user: str
+        :param    group: The API group
+        :type     group: str
+        :rtype: str
+        """
+        digest = sha1(to_bytes(codec.dumps([endpoint, path, params, user, group], sort_keys=True))).hexdigest()
+        return '{0}.{1}'.format(self._resource(path), digest)
+
+    def _file(self, key):
+        return '{0}/{1}.json'.format(RESPONSE_CACHE, key)
+
+    def _ttl(self, path):
+        """
+        Get the time to live for a path, --cache-ttl takes precedence.
+        """
+        if self.cli_ttl:
+            return self.ttl
+        return float(LENSE.CLIENT.confget(self.paths, path, self.ttl))
+
+    def get(self, key):
+        """
+        Retrieve a copy of a cached response entry.
+
+        :param key: The cache key
+        :type  key: str
+        :rtype: dict or None
+        """
+        with self._lock:
+            entry = self._memory.pop(key, None)
+
+            # Load from disk
+            if entry is None and self.disk and isfile(self._file(key)):
+                try:
+                    with open(self._file(key), 'r') as f:
+                        entry = codec.loads(f.read())
+                except (IOError, ValueError):
+                    entry = None
+
+            # Expired entry
+            if entry is None or entry['expires'] < time():
+                LENSE.CLIENT.METRICS.cache('response', False)
+                return None
+
+            # Most recently used
+            self._memory[key] = entry
+            LENSE.CLIENT.METRICS.cache('response', True)
+            return deepcopy(entry)
+
+    def set(self, key, path, code, content):
+        """
+        Store a response in the cache.
+
+        :param     key: The cache key
+        :type      key: str
+        :param    path: The request path
+        :type     path: str
+        :param    code: The response code
+        :type     code: int
+        :param content: The response data
+        :type  content: mixed
+        """
+        entry = {'path': path, 'code': code, 'content': deepcopy(content), 'expires': time() + self._ttl(path)}
+        with self._lock:
+            self._memory[key] = entry
+            while len(self._memory) > self.size:
+                self._memory.popitem(last=False)
+
+            # Write to disk, readable by the owner only
+            if self.disk:
+                tmp = '{0}.tmp'.format(self._file(key))
+                with fdopen(os_open(tmp, O_WRONLY | O_CREAT | O_TRUNC, 0o600), 'w') as f:
+                    f.write(codec.dumps(entry))
+                rename(tmp, self._file(key))
+                self._prune()
+
+    def _prune(self):
+        """
+        Remove the least recently written disk entries beyond the size bound.
+        """
+        files = glob('{0}/*.json'.format(RESPONSE_CACHE))
+        if len(files) <= self.size:
+            return
+        for path in sorted(files, key=lambda f: stat(f).st_mtime)[:len(files) - self.size]:
+            remove(path)
+
+    def invalidate(self, path):
+        """
+        Invalidate cached responses for the resource a path belongs to,
+        including disk entries written by earlier runs with the cache enabled.
+
+        :param path: The request path of a POST/PUT/DELETE request
+        :type  path: str
+        """
+        prefix = '{0}.'.format(self._resource(path))
+        with self._lock:
+            for key in [k for k in self._memory.keys() if k.startswith(prefix)]:
+                del self._memory[key]
+            if isdir(RESPONSE_CACHE):
+                for cached in glob('{0}/{1}*.json'.format(RESPONSE_CACHE, prefix)):
+                    remove(cached)
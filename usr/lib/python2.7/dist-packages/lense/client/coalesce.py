@@ -0,0 +1,67 @@
+from copy import deepcopy
+from threading import Lock, Event
+
+class ClientCall(object):
+    """
+    Class object for a request shared by concurrent identical callers.
+    """
+    def __init__(self):
+        self.done    = Event()
+        self.result  = None
+        self.error   = None
+
+        # Callers waiting for the result
+        self.waiters = 0
+
+class ClientCoalescer(object):
+    """
+    Class object for deduplicating identical concurrent requests: the first
+    caller makes the request and every concurrent caller with the same key,
+    the first included, receives its own copy of the result. The shared
+    result itself is never returned while other callers may copy it.
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock  = Lock()
+
+    def do(self, key, func, copy=deepcopy):
+        """
+        Run a function once for all concurrent callers with the same key.
+
+        :param  key: The request key
+        :type   key: tuple
+        :param func: The function making the request
+        :type  func: callable
+        :param copy: Function copying the result for each caller
+        :type  copy: callable
+        """
+        with self._lock:
+            call   = self._calls.get(key, None)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = ClientCall()
+            else:
+                call.waiters += 1
+
+        # Make the request
+        if leader:
+            try:
+                call.result = func()
+            except Exception as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                    shared = call.waiters
+                call.done.set()
+
+            # Copy the result if other callers are copying it too
+            return copy(call.result) if shared else call.result
+
+        # Wait for the shared request
+        call.done.wait()
+        LENSE.CLIENT.METRICS.incr('coalesced_requests_total')
+        if call.error:
+            raise call.error
+        return copy(call.result)
@@ -0,0 +1,67 @@
+import json
+from os import environ
+from importlib import import_module
+
+# Optional JSON backends, fastest first
+BACKENDS = ['orjson', 'ujson', 'simplejson']
+
+def _load_backend():
+    """
+    Import the fastest available JSON backend, or the one named in the
+    LENSE_CLIENT_JSON environment variable, falling back to the standard
+    library json module.
+    """
+    preferred = environ.get('LENSE_CLIENT_JSON', None)
+    for name in ([preferred] if preferred else BACKENDS):
+        if name == 'json':
+            break
+        try:
+            return name, import_module(name)
+        except ImportError:
+            continue
+    return 'json', json
+
+# Selected backend name / module
+BACKEND, _backend = _load_backend()
+
+def loads(content):
+    """
+    Decode a JSON string. Invalid content raises a ValueError for every
+    backend.
+
+    :param content: The JSON string
+    :type  content: str
+    :rtype: mixed
+    """
+    return _backend.loads(content)
+
+def dumps(obj, indent=None, sort_keys=False):
+    """
+    Encode an object as a JSON string, using the standard library for any
+    options the selected backend does not support.
+
+    :param       obj: The object to encode
+    :type        obj: mixed
+    :param    indent: Optional indentation level
+    :type     indent: int
+    :param sort_keys: Sort dictionary keys
+    :type  sort_keys: bool
+    :rtype: str
+    """
+    try:
+
+        # orjson returns bytes and only supports two space indentation
+        if BACKEND == 'orjson':
+            if indent and not indent == 2:
+                return json.dumps(obj, indent=indent, sort_keys=sort_keys)
+            option = (_backend.OPT_INDENT_2 if indent else 0) | (_backend.OPT_SORT_KEYS if sort_keys else 0)
+            return _backend.dumps(obj, option=option).decode('utf-8')
+
+        # ujson escapes forward slashes by default
+        if BACKEND == 'ujson':
+            return _backend.dumps(obj, indent=indent or 0, sort_keys=sort_keys, escape_forward_slashes=False)
+        return _backend.dumps(obj, indent=indent, sort_keys=sort_keys)
+
+    # Types the backend cannot encode
+    except TypeError:
+        return json.dumps(obj, indent=indent, sort_keys=sort_keys)
@@ -0,0 +1,30 @@
+import sys
+
+# Running on Python 3
+PY3 = sys.version_info[0] >= 3
+
+if PY3:
+    from queue import Queue, Empty
+    from urllib.parse import urlparse
+    string_types = (str,)
+    text_type    = str
+else:
+    from Queue import Queue, Empty
+    from urlparse import urlparse
+    string_types = (basestring,)
+    text_type    = unicode
+
+def to_bytes(value, encoding='utf-8'):
+    """
+    Encode text as bytes, i.e. before hashing or sending over a socket.
+    """
+    return value.encode(encoding) if isinstance(value, text_type) else value
+
+def to_str(value, encoding='utf-8'):
+    """
+    Convert a value to the native string type: UTF-8 encoded bytes on
+    Python 2, text on Python 3.
+    """
+    if PY3:
+        return value.decode(encoding) if isinstance(value, bytes) else str(value)
+    return text_type(value).encode(encoding) if not isinstance(value, str) else value
@@ -0,0 +1,91 @@
+from sys import stdout, exit
+from bisect import bisect_left
+from os import stat, rename
+from os.path import isfile
+
+# Lense Libraries
+from lense.client import codec
+from lense.client import SUPPORT_CACHE, CLIENT_HOME
+from lense.client.handlers import HANDLERS
+
+# Sorted request command index
+COMPLETE_INDEX = '{0}/complete.index'.format(CLIENT_HOME)
+
+# Top level commands / help targets
+COMMANDS = sorted(['help'] + list(HANDLERS.keys()))
+TARGETS  = sorted(HANDLERS.keys())
+
+def build_index():
+    """
+    Build the sorted request command index from the support cache.
+
+    :rtype: list
+    """
+    with open(SUPPORT_CACHE, 'r') as f:
+        commands = sorted(codec.loads(f.read()).keys())
+    try:
+        with open('{0}.tmp'.format(COMPLETE_INDEX), 'w') as f:
+            f.write('\n'.join(commands))
+        rename('{0}.tmp'.format(COMPLETE_INDEX), COMPLETE_INDEX)
+    except (IOError, OSError):
+        pass
+    return commands
+
+def load_index():
+    """
+    Load the request command index, rebuilding it if the support cache has
+    changed since it was built.
+
+    :rtype: list
+    """
+    if not isfile(SUPPORT_CACHE):
+        return []
+    if not isfile(COMPLETE_INDEX) or stat(COMPLETE_INDEX).st_mtime < stat(SUPPORT_CACHE).st_mtime:
+        return build_index()
+    with open(COMPLETE_INDEX, 'r') as f:
+        return [c for c in f.read().split('\n') if c]
+
+def prefixed(words, prefix):
+    """
+    Return the words in a sorted list starting with a prefix.
+
+    :param  words: Sorted words
+    :type   words: list
+    :param prefix: The prefix to match
+    :type  prefix: str
+    :rtype: list
+    """
+    matches = []
+    for word in words[bisect_left(words, prefix):]:
+        if not word.startswith(prefix):
+            break
+        matches.append(word)
+    return matches
+
+def complete(words):
+    """
+    Print completions for the words on the command line, the last word being
+    the one completed. Runs without bootstrapping the client.
+
+    :param words: Command line words after the executable
+    :type  words: list
+    """
+    words   = words or ['']
+    current = words[-1]
+
+    # Top level command
+    if len(words) == 1:
+        matches = prefixed(COMMANDS, current)
+
+    # Help target
+    elif len(words) == 2 and words[0] == 'help':
+        matches = prefixed(TARGETS, current)
+
+    # Request command
+    elif len(words) == 2 and words[0] == 'request':
+        matches = prefixed(load_index(), current)
+    else:
+        matches = []
+    if matches:
+        stdout.write('\n'.join(matches) + '\n')
+    exit(0)
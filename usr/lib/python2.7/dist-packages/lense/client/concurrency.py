@@ -0,0 +1,128 @@
+from time import time
+from threading import Thread, Condition
+
+# Lense Libraries
+from lense.client.compat import Queue, Empty
+
+class ClientConcurrency(object):
+    """
+    Class object for adaptively limiting concurrent API requests using an
+    additive increase / multiplicative decrease (AIMD) controller.
+    """
+
+    # Response codes signalling an overloaded engine
+    OVERLOAD = [429, 503]
+
+    def __init__(self):
+
+        # Limit settings
+        self.minimum   = int(LENSE.CLIENT.conf('concurrency', 'min', 1))
+        self.maximum   = int(LENSE.CLIENT.conf('concurrency', 'max', 32))
+        self.limit     = float(LENSE.CLIENT.conf('concurrency', 'initial', 4))
+        self.tolerance = float(LENSE.CLIENT.conf('concurrency', 'tolerance', 2.0))
+        self.backoff   = float(LENSE.CLIENT.conf('concurrency', 'backoff', 0.5))
+
+        # Requests in flight / condition
+        self.inflight  = 0
+        self._cond     = Condition()
+
+        # Baseline latency by endpoint and path / last decrease
+        self.baselines = {}
+        self._reduced  = 0
+
+    def acquire(self):
+        """
+        Block until the number of requests in flight is under the limit.
+        """
+        with self._cond:
+            while self.inflight >= int(self.limit):
+                self._cond.wait()
+            self.inflight += 1
+
+    def release(self):
+        """
+        Release a request slot.
+        """
+        with self._cond:
+            self.inflight -= 1
+            self._cond.notify()
+
+    def sample(self, latency, code, key=None):
+        """
+        Adjust the limit from the latency and status of a finished request.
+        Latency is compared to the baseline of the same endpoint and path, so
+        slow resources do not look congested next to fast ones.
+
+        :param latency: The request latency in seconds
+        :type  latency: float
+        :param    code: The response status code, None on connection errors
+        :type     code: int
+        :param     key: The request endpoint, method and path
+        :type      key: tuple
+        """
+        with self._cond:
+            overload = code in self.OVERLOAD or code is None
+            baseline = self.baselines.get(key, None)
+
+            # Track the uncongested latency, slowly forgetting old minimums
+            if not overload:
+                if baseline is None or latency < baseline:
+                    self.baselines[key] = latency
+                else:
+                    self.baselines[key] = baseline + (latency - baseline) * 0.01
+
+            # Overloaded or slower than usual, back off at most once per baseline interval
+            if overload or (baseline is not None and latency > baseline * self.tolerance):
+                now = time()
+                if now - self._reduced > (baseline or latency):
+                    self.limit    = max(self.minimum, self.limit * self.backoff)
+                    self._reduced = now
+
+            # Latency stable, grow the limit
+            else:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+        LENSE.CLIENT.METRICS.gauge('concurrency_limit', int(self.limit))
+
+    def map(self, func, items, workers=None):
+        """
+        Call a function for each item concurrently, bounded by the adaptive
+        limit or by a fixed number of workers.
+
+        :param    func: The function to call with each item
+        :type     func: callable
+        :param   items: The items to process
+        :type    items: list
+        :param workers: Fixed number of workers, bypassing the adaptive limit
+        :type  workers: int
+        :rtype: list of (item, result, error) in item order
+        """
+        items   = list(items)
+        results = [None] * len(items)
+        queue   = Queue()
+        for i, item in enumerate(items):
+            queue.put((i, item))
+
+        def worker():
+            while True:
+                try:
+                    i, item = queue.get_nowait()
+                except Empty:
+                    return
+                if not workers:
+                    self.acquire()
+                try:
+                    results[i] = (item, func(item), None)
+                except Exception as e:
+                    results[i] = (item, None, e)
+                finally:
+                    if not workers:
+                        self.release()
+
+        # Start workers and wait for them to drain the queue
+        threads = [Thread(target=worker) for _ in range(min(len(items), workers or self.maximum))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
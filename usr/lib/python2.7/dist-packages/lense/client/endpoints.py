@@ -0,0 +1,165 @@
+from time import time
+from threading import Lock
+
+# Lense Libraries
+from lense.client.compat import string_types
+
+class ClientEndpoint(object):
+    """
+    Class object for tracking the health of a single engine endpoint.
+    """
+    def __init__(self, url):
+        self.url         = url
+
+        # Requests in flight / latency EWMA / consecutive failures
+        self.outstanding = 0
+        self.ewma        = 0.0
+        self.failures    = 0
+
+        # Ejected from selection until
+        self.ejected     = 0
+
+    def available(self, now):
+        """
+        Check if the endpoint is available for selection.
+        """
+        return self.ejected <= now
+
+class ClientEndpoints(object):
+    """
+    Class object for selecting between one or more engine endpoints with
+    health-aware load balancing and passive ejection of failing nodes.
+    """
+
+    # Supported selection strategies
+    STRATEGIES = ['round_robin', 'least_outstanding', 'ewma']
+
+    def __init__(self, urls, strategy='round_robin', eject_after=3, eject_for=30.0):
+        """
+        :param        urls: Endpoint URLs (proto://host:port)
+        :type         urls: list
+        :param    strategy: The selection strategy
+        :type     strategy: str
+        :param eject_after: Consecutive failures before ejecting a node
+        :type  eject_after: int
+        :param   eject_for: Seconds to eject a failing node for
+        :type    eject_for: float
+        """
+        self.endpoints   = [ClientEndpoint(url) for url in urls]
+        self.strategy    = strategy if strategy in self.STRATEGIES else 'round_robin'
+        self.eject_after = int(eject_after)
+        self.eject_for   = float(eject_for)
+
+        # Round robin position / thread lock
+        self._next       = 0
+        self._lock       = Lock()
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    @property
+    def primary(self):
+        """
+        Return the URL of the first endpoint.
+        """
+        return self.endpoints[0].url
+
+    def select(self, exclude=None):
+        """
+        Select an endpoint for a request.
+
+        :param exclude: Endpoints already tried for this request
+        :type  exclude: list
+        :rtype: ClientEndpoint
+        """
+        exclude = exclude or []
+        with self._lock:
+            now        = time()
+            candidates = [e for e in self.endpoints if e.available(now) and not e in exclude]
+
+            # Fall back to endpoints already tried, then to ejected endpoints
+            if not candidates:
+                candidates = [e for e in self.endpoints if e.available(now)] or \
+                    [min(self.endpoints, key=lambda e: e.ejected)]
+
+            # Select an endpoint
+            if self.strategy == 'least_outstanding':
+                endpoint = min(candidates, key=lambda e: e.outstanding)
+            elif self.strategy == 'ewma':
+                endpoint = min(candidates, key=lambda e: e.ewma * (e.outstanding + 1))
+            else:
+                endpoint = candidates[self._next % len(candidates)]
+                self._next += 1
+            endpoint.outstanding += 1
+            return endpoint
+
+    def finish(self, endpoint, latency, ok):
+        """
+        Update endpoint health after a request.
+
+        :param endpoint: The endpoint used
+        :type  endpoint: ClientEndpoint
+        :param  latency: The request latency in seconds
+        :type   latency: float
+        :param       ok: Did the endpoint respond without a server/connection failure
+        :type        ok: bool
+        """
+        with self._lock:
+            endpoint.outstanding -= 1
+            endpoint.ewma = latency if not endpoint.ewma else (endpoint.ewma * 0.7 + latency * 0.3)
+
+            # Healthy response
+            if ok:
+                endpoint.failures = 0
+                return
+
+            # Eject after consecutive failures
+            endpoint.failures += 1
+            if len(self.endpoints) > 1 and endpoint.failures >= self.eject_after:
+                endpoint.ejected  = time() + self.eject_for
+                endpoint.failures = 0
+                LENSE.LOG.info('Ejected failing endpoint for {0} seconds: {1}'.format(self.eject_for, endpoint.url))
+
+    @staticmethod
+    def parse(host, proto, port):
+        """
+        Construct an endpoint URL from "host", "host:port" or "proto://host:port".
+
+        :param  host: The host string
+        :type   host: str
+        :param proto: Default protocol
+        :type  proto: str
+        :param  port: Default port
+        :type   port: int
+        :rtype: str
+        """
+        host = host.strip().rstrip('/')
+        if not '://' in host:
+            host = '{0}://{1}'.format(proto, host)
+        if not ':' in host.split('://', 1)[1]:
+            host = '{0}:{1}'.format(host, port)
+        return host
+
+    @classmethod
+    def from_hosts(cls, hosts):
+        """
+        Construct endpoints from a list of hosts, using the engine defaults
+        and the "endpoints" selection settings from client.conf.
+
+        :param hosts: A list of hosts, or a comma separated string
+        :type  hosts: list
+        """
+        if isinstance(hosts, string_types):
+            hosts = [h for h in hosts.split(',') if h.strip()]
+        return cls([cls.parse(h, LENSE.CONF.engine.proto, LENSE.CONF.engine.port) for h in hosts],
+            strategy    = LENSE.CLIENT.conf('endpoints', 'strategy', 'round_robin'),
+            eject_after = LENSE.CLIENT.conf('endpoints', 'eject_after', 3),
+            eject_for   = LENSE.CLIENT.conf('endpoints', 'eject_for', 30.0))
+
+    @classmethod
+    def from_conf(cls):
+        """
+        Construct endpoints from the engine block in client.conf, using the
+        "hosts" list if defined.
+        """
+        return cls.from_hosts(LENSE.CLIENT.conf('engine', 'hosts', None) or [LENSE.CONF.engine.host])
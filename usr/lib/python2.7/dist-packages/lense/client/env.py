@@ -0,0 +1,121 @@
+import re
+from errno import ENOENT
+from os import stat, remove
+from os.path import isfile
+
+# Lense Libraries
+from lense.client import CLIENT_HOME
+
+# Parsed environment files by path, for this process only
+PARSED        = {}
+
+# Parsed environment file cache written by earlier versions
+ENV_CACHE     = '{0}/env.cache.json'.format(CLIENT_HOME)
+
+# Exported Lense variables / named profile variables
+ENV_REGEX     = re.compile(r'^\s*export\s+(LENSE_[A-Za-z0-9_]+)=(?:"([^"]*)"|\'([^\']*)\'|(\S*))\s*$')
+PROFILE_REGEX = re.compile(r'^LENSE_PROFILE_(.+)_API_(USER|GROUP|KEY|ENDPOINT)$')
+
+class ClientEnvironment(object):
+    """
+    Class object for loading API credential profiles from a user's env.sh
+    file. Parsed profiles are kept in memory by file modification time, so
+    the file is only read again after it changes.
+
+    The default profile is read from LENSE_API_USER, LENSE_API_GROUP,
+    LENSE_API_KEY and LENSE_API_ENDPOINT. Named profiles are read from
+    LENSE_PROFILE_<NAME>_API_<ATTR>, for example:
+
+    export LENSE_PROFILE_STAGING_API_USER="admin"
+    """
+    def __init__(self, path):
+        """
+        :param path: The environment file
+        :type  path: str
+        """
+        self.path     = path
+
+        # Profiles / other exported Lense variables
+        self.profiles = None
+        self.environ  = None
+
+    def _parse(self):
+        """
+        Parse the environment file.
+        """
+        profiles = {'default': {}}
+        environ  = {}
+        with open(self.path, 'r') as f:
+            for line in f:
+                match = ENV_REGEX.match(line)
+                if not match:
+                    continue
+                key   = match.group(1)
+                value = [v for v in match.groups()[1:] if v is not None][0]
+
+                # Named profile attribute
+                profile = PROFILE_REGEX.match(key)
+                if profile:
+                    profiles.setdefault(profile.group(1).lower(), {})[profile.group(2).lower()] = value
+                    continue
+
+                # Default profile attribute
+                if key.startswith('LENSE_API_'):
+                    profiles['default'][key[10:].lower()] = value
+                environ[key] = value
+        return profiles, environ
+
+    def load(self):
+        """
+        Load profiles parsed earlier in this process or by parsing the
+        environment file. A missing file yields no profiles.
+        """
+        if not self.profiles is None:
+            return
+        self.profiles = {}
+        self.environ  = {}
+
+        # No environment file
+        if not isfile(self.path):
+            LENSE.LOG.info('Environment file not found: {0}'.format(self.path))
+            return
+        mtime = stat(self.path).st_mtime
+
+        # Parsed copy is current
+        entry = PARSED.get(self.path)
+        if entry and entry['mtime'] == mtime:
+            self.profiles = entry['profiles']
+            self.environ  = entry['environ']
+            return
+
+        # Parse the file, credentials are never copied to disk
+        self.profiles, self.environ = self._parse()
+        PARSED[self.path] = {'mtime': mtime, 'profiles': self.profiles, 'environ': self.environ}
+        self._remove_stale()
+
+    def _remove_stale(self):
+        """
+        Remove the on-disk copy of parsed credentials written by earlier
+        client versions.
+        """
+        try:
+            remove(ENV_CACHE)
+        except OSError as e:
+            if not e.errno == ENOENT:
+                LENSE.LOG.error('Failed to remove environment cache: {0}'.format(str(e)))
+
+    def get(self, name='default'):
+        """
+        Retrieve a named profile.
+
+        :param name: The profile name
+        :type  name: str
+        :rtype: dict
+        """
+        self.load()
+        if name == 'default':
+            return self.profiles.get(name, {})
+        return LENSE.CLIENT.ensure(self.profiles.get(name.lower()),
+            isnot = None,
+            error = 'Profile "{0}" not found in: {1}'.format(name, self.path),
+            code  = 1)
@@ -0,0 +1,275 @@
+import re
+import csv
+from sys import stdout
+
+# Lense Libraries
+from lense.client import codec
+from lense.client.compat import to_str, string_types
+
+# Supported filter operators
+FILTER_REGEX = re.compile(r'^([^!=~<>]+)(!=|=|~|<|>)(.*)$')
+
+# Filter value that is not valid JSON
+NOT_JSON     = object()
+
+def get_field(item, field):
+    """
+    Retrieve a dotted field path from an object, or None if not found.
+    """
+    for key in field.split('.'):
+        if not isinstance(item, dict) or not key in item:
+            return None
+        item = item[key]
+    return item
+
+class ClientFilter(object):
+    """
+    Class object for a simple comma separated filter expression:
+    key=value, key!=value, key~regex, key<number, key>number. Values are
+    compared as JSON (true, false, null, numbers) or as plain strings.
+    """
+    def __init__(self, expression):
+        self.rules = []
+        for rule in [r.strip() for r in (expression or '').split(',') if r.strip()]:
+            match = FILTER_REGEX.match(rule)
+            if not match:
+                LENSE.die('Invalid filter expression: {0}'.format(rule))
+            key, op, value = match.groups()
+            self.rules.append((key.strip(), op, re.compile(value) if op == '~' else value.strip()))
+
+        # Equality values decoded as JSON
+        self.decoded = dict((v, self._decode(v)) for k, op, v in self.rules if op in ['=', '!='])
+
+    def _decode(self, value):
+        """
+        Decode a filter value as JSON.
+        """
+        try:
+            return codec.loads(value)
+        except ValueError:
+            return NOT_JSON
+
+    def _equals(self, found, value):
+        """
+        Compare a field to a filter value, without matching booleans to numbers.
+        """
+        if isinstance(found, string_types):
+            return to_str(found) == value
+        decoded = self.decoded[value]
+        return found == decoded and isinstance(found, bool) == isinstance(decoded, bool)
+
+    def __nonzero__(self):
+        return bool(self.rules)
+    __bool__ = __nonzero__
+
+    def match(self, item):
+        """
+        Check if an item matches every filter rule.
+        """
+        for key, op, value in self.rules:
+            found = get_field(item, key)
+            if op == '=' and not self._equals(found, value):
+                return False
+            if op == '!=' and self._equals(found, value):
+                return False
+            if op == '~' and (found is None or not value.search(to_str(found))):
+                return False
+            if op in ['<', '>']:
+                try:
+                    if (op == '<' and not float(found) < float(value)) or (op == '>' and not float(found) > float(value)):
+                        return False
+                except (TypeError, ValueError):
+                    return False
+        return True
+
+class ClientFormatter(object):
+    """
+    Base class for streaming output formatters.
+    """
+    def __init__(self, stream=stdout, fields=None):
+        """
+        :param stream: The output stream
+        :type  stream: file
+        :param fields: Fields to project each object to
+        :type  fields: list
+        """
+        self.stream = stream
+        self.fields = fields
+        self.count  = 0
+
+    def project(self, item):
+        """
+        Project an object to the selected fields.
+        """
+        if not self.fields or not isinstance(item, dict):
+            return item
+        return dict((field, get_field(item, field)) for field in self.fields)
+
+    def start(self, single):
+        """
+        Write any output before the first object.
+        """
+        pass
+
+    def item(self, item):
+        """
+        Write a single object.
+        """
+        raise NotImplementedError
+
+    def end(self, single):
+        """
+        Write any output after the last object.
+        """
+        pass
+
+    def write(self, content, filter=None):
+        """
+        Stream response content, one object at a time.
+
+        :param content: The response content
+        :type  content: mixed
+        :param  filter: Optional filter applied to each object
+        :type   filter: ClientFilter
+        :rtype: int
+        """
+        single = not isinstance(content, list)
+        self.start(single)
+        for item in ([content] if single else content):
+            if filter and not filter.match(item):
+                continue
+            self.item(self.project(item))
+            self.count += 1
+        self.end(single)
+        self.stream.flush()
+        return self.count
+
+class ClientFormatter_JSON(ClientFormatter):
+    """
+    Indented JSON, a list is written one element at a time.
+    """
+    def __init__(self, stream=stdout, fields=None, indent=2):
+        super(ClientFormatter_JSON, self).__init__(stream, fields)
+        self.indent = indent
+
+    def start(self, single):
+        if not single:
+            self.stream.write('[')
+
+    def item(self, item):
+        if self.count:
+            self.stream.write(',')
+        self.stream.write(codec.dumps(item, indent=self.indent))
+
+    def end(self, single):
+        self.stream.write('\n' if single else ']\n')
+
+class ClientFormatter_NDJSON(ClientFormatter):
+    """
+    One compact JSON object per line.
+    """
+    def item(self, item):
+        self.stream.write(codec.dumps(item))
+        self.stream.write('\n')
+
+class ClientFormatter_CSV(ClientFormatter):
+    """
+    Comma separated values, columns from the selected fields or the keys of
+    the first object. Nested values are written as JSON.
+    """
+    def start(self, single):
+        self._writer  = csv.writer(self.stream)
+        self._columns = None
+
+    def _value(self, value):
+        if isinstance(value, (dict, list)):
+            return codec.dumps(value)
+        return '' if value is None else to_str(value)
+
+    def item(self, item):
+        if not isinstance(item, dict):
+            item = {'value': item}
+        if self._columns is None:
+            self._columns = self.fields or sorted(item.keys())
+            self._writer.writerow(self._columns)
+        self._writer.writerow([self._value(item.get(c)) for c in self._columns])
+
+class ClientFormatter_Table(ClientFormatter_CSV):
+    """
+    Aligned text table. Column widths are taken from the first rows, which
+    are buffered; longer values in later rows are truncated.
+    """
+    BUFFER = 100
+    WIDTH  = 40
+
+    def start(self, single):
+        self._columns = None
+        self._buffer  = []
+        self._widths  = None
+
+    def _row(self, values):
+        self.stream.write('  '.join(v[:w].ljust(w) for v, w in zip(values, self._widths)).rstrip() + '\n')
+
+    def _flush(self):
+        self._widths = [min(self.WIDTH, max([len(c)] + [len(r[i]) for r in self._buffer])) for i, c in enumerate(self._columns)]
+        self._row(self._columns)
+        self._row(['-' * w for w in self._widths])
+        for row in self._buffer:
+            self._row(row)
+        self._buffer = []
+
+    def item(self, item):
+        if not isinstance(item, dict):
+            item = {'value': item}
+        if self._columns is None:
+            self._columns = self.fields or sorted(item.keys())
+        row = [self._value(item.get(c)) for c in self._columns]
+        if self._widths:
+            return self._row(row)
+        self._buffer.append(row)
+        if len(self._buffer) >= self.BUFFER:
+            self._flush()
+
+    def end(self, single):
+        if self._columns and not self._widths:
+            self._flush()
+
+class ClientFormatter_YAML(ClientFormatter):
+    """
+    YAML documents, a list is written one element at a time. Requires PyYAML.
+    """
+    def __init__(self, stream=stdout, fields=None):
+        super(ClientFormatter_YAML, self).__init__(stream, fields)
+        try:
+            import yaml
+            self._yaml = yaml
+        except ImportError:
+            LENSE.die('YAML output requires the PyYAML library: pip install pyyaml')
+
+    def start(self, single):
+        self._single = single
+
+    def item(self, item):
+        self.stream.write(self._yaml.safe_dump(item if self._single else [item], default_flow_style=False))
+
+# Supported output formats
+FORMATTERS = {
+    'json': ClientFormatter_JSON,
+    'ndjson': ClientFormatter_NDJSON,
+    'csv': ClientFormatter_CSV,
+    'table': ClientFormatter_Table,
+    'yaml': ClientFormatter_YAML
+}
+
+def get_formatter(name, fields=None, stream=stdout):
+    """
+    Construct an output formatter by name.
+
+    :param   name: The output format
+    :type    name: str
+    :param fields: Fields to project each object to
+    :type  fields: list
+    """
+    if not name in FORMATTERS:
+        LENSE.die('Unsupported output format "{0}", expected one of: {1}'.format(name, ', '.join(sorted(FORMATTERS.keys()))))
+    return FORMATTERS[name](stream=stream, fields=fields)
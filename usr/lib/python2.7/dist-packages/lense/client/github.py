@@ -1,24 +1,51 @@
-from os import path, listdir
+import tarfile
+from hashlib import sha1
+from shutil import copyfileobj
+from tempfile import TemporaryFile
+from os import path, listdir, makedirs, environ
 from git import Repo, Git
+from git.exc import GitCommandError
+
+# Lense Libraries
+from lense.client import CLIENT_HOME
+from lense.client.compat import to_bytes
+from lense.client.timeouts import ClientTimeouts
+
+# Local bare mirrors of module remotes
+MIRROR_HOME = '{0}/mirrors'.format(CLIENT_HOME)
 
 class ClientGitHub(object):
     """
     Helper class for retrieving a lense project repository.
     """
-    def __init__(self, local, remote, branch):
+    def __init__(self, local, remote, branch, depth=None, single_branch=None, mirror=None, snapshot=None):
         """
-        :param  local: Local path to clone to
-        :type   local: str
-        :param remote: The GitHub repository URL
-        :type  remote: str
-        :param branch: The repository branch
-        :type  branch: str
+        :param         local: Local path to clone to
+        :type          local: str
+        :param        remote: The GitHub repository URL
+        :type         remote: str
+        :param        branch: The repository branch
+        :type         branch: str
+        :param         depth: Shallow clone history depth, 0 for full history
+        :type          depth: int
+        :param single_branch: Only clone the requested branch
+        :type  single_branch: bool
+        :param        mirror: Clone using a local bare mirror of the remote
+        :type         mirror: bool
+        :param      snapshot: Download a tarball snapshot instead of cloning
+        :type       snapshot: bool
         """
         
         # Local / remote / branch
         self.local    = LENSE.mkdir(local)
         self.remote   = remote
         self.branch   = branch
+        
+        # Clone options
+        self.depth         = int(LENSE.CLIENT.conf('git', 'depth', 0) if depth is None else depth)
+        self.single_branch = LENSE.CLIENT.conf('git', 'single_branch', True, boolean=True) if single_branch is None else single_branch
+        self.mirror        = LENSE.CLIENT.conf('git', 'mirror', False, boolean=True) if mirror is None else mirror
+        self.snapshot      = LENSE.CLIENT.conf('git', 'snapshot', False, boolean=True) if snapshot is None else snapshot
 
         # Repo / Git objects
         self._repo    = None
@@ -27,6 +54,58 @@ class ClientGitHub(object):
         # Has the repo been updated / cloned
         self.updated  = False
         self.cloned   = False
+        
+        # Local / remote commits after a fetch, is local behind remote
+        self.local_commit  = None
+        self.remote_commit = None
+        self.behind        = False
+        
+        # Network operations made against the remote
+        self.network_ops   = 0
+        
+        # Environment for git commands run by this object, aborting stalled transfers
+        self.env           = self._timeout_env()
+    
+    def _ssh_configured(self):
+        """
+        Check if the user configured an SSH command for git.
+        """
+        if 'GIT_SSH_COMMAND' in environ or 'GIT_SSH' in environ:
+            return True
+        try:
+            return bool(Git(self.local if path.isdir('{0}/.git'.format(self.local)) else None).config('--get', 'core.sshCommand'))
+        except GitCommandError:
+            return False
+    
+    def _timeout_env(self):
+        """
+        Construct environment variables applying the connect / read timeouts
+        to git commands run against the remote, leaving the process
+        environment untouched. HTTP transfers slower than one byte per second
+        for the read timeout are aborted, SSH connections give up after the
+        connect timeout. Variables and SSH commands set by the user win.
+        """
+        timeouts = ClientTimeouts.from_conf()
+        env      = {}
+        
+        # HTTP URLs
+        if self.remote.startswith(('http://', 'https://')):
+            if not 'GIT_HTTP_LOW_SPEED_LIMIT' in environ and not 'GIT_HTTP_LOW_SPEED_TIME' in environ:
+                env['GIT_HTTP_LOW_SPEED_LIMIT'] = '1'
+                env['GIT_HTTP_LOW_SPEED_TIME']  = str(int(timeouts.read))
+        
+        # SSH URLs, including scp-like user@host:path
+        elif (self.remote.startswith(('ssh://', 'git+ssh://')) or (not '://' in self.remote and ':' in self.remote.split('/', 1)[0])) \
+            and not self._ssh_configured():
+            env['GIT_SSH_COMMAND'] = 'ssh -o ConnectTimeout={0}'.format(int(timeouts.connect))
+        return env
+    
+    def _scoped(self, git):
+        """
+        Apply the timeout environment to a Git command object.
+        """
+        git.update_environment(**self.env)
+        return git
 
     def _exists(self):
         """
@@ -58,19 +137,127 @@ class ClientGitHub(object):
         self._git.checkout(branch)
         return LENSE.FEEDBACK.success('Switched to branch: {0}'.format(branch))
     
+    def _update_mirror(self):
+        """
+        Create or update the local bare mirror of the remote.
+        """
+        mirror = '{0}/{1}.git'.format(MIRROR_HOME, sha1(to_bytes(self.remote)).hexdigest())
+        
+        # Update an existing mirror
+        if path.isdir(mirror):
+            self._scoped(Repo(mirror).git).fetch('--prune', 'origin')
+            LENSE.FEEDBACK.info('Updated mirror: {0}'.format(mirror))
+            
+        # Create the mirror
+        else:
+            if not path.isdir(MIRROR_HOME):
+                makedirs(MIRROR_HOME)
+            Repo.clone_from(self.remote, mirror, env=self.env, mirror=True)
+            LENSE.FEEDBACK.info('Created mirror: {0}'.format(mirror))
+        return mirror
+    
+    def _snapshot_url(self):
+        """
+        Construct the tarball snapshot URL for the remote and branch.
+        """
+        template = LENSE.CLIENT.conf('git', 'snapshot_url', '{remote}/archive/{branch}.tar.gz')
+        return template.format(remote=self.remote.rstrip('/'), branch=self.branch)
+    
+    def _snapshot_members(self, tar):
+        """
+        Return the snapshot members with the top level directory stripped,
+        refusing members that would be written or linked outside the target
+        directory and device files.
+
+        :param tar: The snapshot archive
+        :type  tar: tarfile.TarFile
+        :rtype: list
+        """
+        root    = path.realpath(self.local)
+        members = []
+
+        def inside(target):
+            return target == root or target.startswith(root + path.sep)
+
+        for member in tar.getmembers():
+            parts = member.name.split('/', 1)
+            if len(parts) < 2 or not parts[1]:
+                continue
+            member.name = parts[1]
+            target      = path.normpath(path.join(root, member.name))
+            safe        = not path.isabs(member.name) and inside(target) and not (member.ischr() or member.isblk())
+
+            # Symbolic links are relative to the member, hard links to the archive root
+            if safe and member.issym():
+                safe = not path.isabs(member.linkname) and \
+                    inside(path.normpath(path.join(path.dirname(target), member.linkname)))
+            elif safe and member.islnk():
+                link = member.linkname.split('/', 1)
+                safe = len(link) == 2 and link[0] == parts[0] and \
+                    inside(path.normpath(path.join(root, link[1])))
+                member.linkname = link[-1]
+            LENSE.CLIENT.ensure(safe,
+                value = True,
+                error = 'Unsafe path in snapshot: {0}'.format(member.name),
+                code  = 1)
+            members.append(member)
+        return members
+
+    def _download_snapshot(self):
+        """
+        Download and extract a tarball snapshot of the remote branch.
+        """
+        url = self._snapshot_url()
+        
+        # Stream the snapshot to a temporary file
+        with TemporaryFile() as f:
+            response = LENSE.CLIENT.REST.session().get(url, stream=True, timeout=ClientTimeouts.from_conf().timeout())
+            LENSE.CLIENT.ensure(response.status_code,
+                value = 200,
+                error = 'Failed to download snapshot {0}: HTTP {1}'.format(url, response.status_code),
+                code  = 1)
+            copyfileobj(response.raw, f)
+            f.seek(0)
+            
+            # Extract, stripping the top level directory
+            with tarfile.open(fileobj=f, mode='r:*') as tar:
+                members = self._snapshot_members(tar)
+                if hasattr(tarfile, 'data_filter'):
+                    tar.extractall(self.local, members, filter='data')
+                else:
+                    tar.extractall(self.local, members)
+        LENSE.FEEDBACK.success('Downloaded snapshot: {0}'.format(url))
+    
     def _clone(self):
         """
         Clone a remote repository.
         """
         if not self._exists():
-            Repo.clone_from(self.remote, self.local)
+            
+            # Tarball snapshot, no repository history
+            if self.snapshot:
+                self.cloned = True
+                return self._download_snapshot()
+            
+            # Clone options
+            options = {'branch': self.branch}
+            if self.depth:
+                options['depth'] = self.depth
+            if self.single_branch:
+                options['single_branch'] = True
+            if self.mirror:
+                options['reference'] = self._update_mirror()
+                options['dissociate'] = True
+            
+            Repo.clone_from(self.remote, self.local, env=self.env, **options)
             LENSE.FEEDBACK.success('Cloned repository')
             LENSE.FEEDBACK.info('Remote: {0}'.format(self.remote))
             LENSE.FEEDBACK.info('Local: {0}'.format(self.local))
 
             # Store the Repo/Git objects
-            self._git  = Git(self.local)
+            self._git  = self._scoped(Git(self.local))
             self._repo = Repo(self.local)
+            self._scoped(self._repo.git)
 
             # Checkout the requested branch
             self._checkout(self.branch)
@@ -84,38 +271,47 @@ class ClientGitHub(object):
         """
         Refresh the repository objects.
         """
-        self._git  = Git(self.local)
+        self._git  = self._scoped(Git(self.local))
         self._repo = Repo(self.local)
+        self._scoped(self._repo.git)
+
+    def _ls_remote(self):
+        """
+        Get the remote branch head without fetching any objects.
+        """
+        self.network_ops += 1
+        refs = self._git.ls_remote('origin', 'refs/heads/{0}'.format(self.branch))
+        return refs.split()[0] if refs else None
 
-        # Fetch remotes
-        self._repo.remotes.origin.fetch()
-        LENSE.FEEDBACK.info('Fetched changes from remote')
+    def _fetch_branch(self):
+        """
+        Fetch only the tracked branch from the remote.
+        """
+        self.network_ops += 1
+        self._repo.remotes.origin.fetch('+refs/heads/{0}:refs/remotes/origin/{0}'.format(self.branch))
+        LENSE.FEEDBACK.info('Fetched changes from remote: {0}'.format(self.remote))
 
     def _get_local_commit(self):
         """
-        Get the latest commit tag from the local branch.
+        Get the latest commit from the local branch.
         """
-        for o in self._repo.refs:
-            if o.name == self.branch:
-                return o.commit
+        return self._repo.heads[self.branch].commit.hexsha
             
     def _get_remote_commit(self):
         """
-        Get the latest commit tag from the remote branch.
+        Get the latest fetched commit from the remote branch.
         """
-        for o in self._repo.remotes.origin.refs:
-            if o.remote_head == self.branch:
-                return o.commit
+        return self._repo.remotes.origin.refs[self.branch].commit.hexsha
 
-    def _pull(self):
+    def _fetch(self):
         """
-        Pull changes from a remote repository.
+        Check if the local branch is behind the remote, only fetching when
+        the remote head differs from the local head.
         """
-        
-        # If the repo has just been cloned
-        if self.cloned:
-            LENSE.FEEDBACK.info('Newly cloned repo, skipped pull')
-            return True
+        LENSE.CLIENT.ensure(path.isdir('{0}/.git'.format(self.local)),
+            value = True,
+            error = 'Module at {0} was installed from a snapshot, reinstall it to upgrade'.format(self.local),
+            code  = 1)
         
         # Refresh repo objects
         self._refresh()
@@ -124,30 +320,50 @@ class ClientGitHub(object):
         self._checkout(self.branch)
 
         # Remote / local commits
-        remote_commit = self._get_remote_commit()
-        local_commit  = self._get_local_commit()
+        self.remote_commit = self._ls_remote()
+        self.local_commit  = self._get_local_commit()
 
         # Show the local/remote commit info
-        LENSE.FEEDBACK.info('Local <{0}> is on commit: {1}'.format(self.local, local_commit))
-        LENSE.FEEDBACK.info('Remote <{0}> is on commit: {1}'.format(self.remote, remote_commit))
-
-        # If local is up to date
-        if remote_commit == local_commit:
-            return LENSE.FEEDBACK.info('Local matches remote, everything up to date'.format(local_commit, remote_commit))
-
-        # Update the local branch
-        origin = self._repo.remotes.origin
-        origin.pull()
+        LENSE.FEEDBACK.info('Local <{0}> is on commit: {1}'.format(self.local, self.local_commit))
+        LENSE.FEEDBACK.info('Remote <{0}> is on commit: {1}'.format(self.remote, self.remote_commit))
+        if self.remote_commit == self.local_commit:
+            return False
+        
+        # Fetch the remote branch
+        self._fetch_branch()
+        return True
 
-        # Refresh the branches
-        self._refresh()
+    def update(self):
+        """
+        Fast-forward the local branch after a fetch found changes.
+        """
+        self._git.merge('--ff-only', 'origin/{0}'.format(self.branch))
 
         # Updated success
-        LENSE.FEEDBACK.success('Local branch updated -> {0}'.format(self._get_local_commit()))
+        self.local_commit = self._get_local_commit()
+        LENSE.FEEDBACK.success('Local branch updated <{0}> -> {1}'.format(self.local, self.local_commit))
+        LENSE.LOG.info('Updated {0} with {1} network operation(s)'.format(self.local, self.network_ops))
         self.updated = True
+
+    def _pull(self):
+        """
+        Pull changes from a remote repository.
+        """
+        
+        # If the repo has just been cloned
+        if self.cloned:
+            LENSE.FEEDBACK.info('Newly cloned repo, skipped pull')
+            return True
+        
+        # If local is up to date
+        if not self._fetch():
+            return LENSE.FEEDBACK.info('Local matches remote, everything up to date')
+
+        # Update the local branch
+        self.update()
         
     @classmethod
-    def clone(cls, local, remote, branch):
+    def clone(cls, local, remote, branch, **kwargs):
         """
         Clone a remote repository.
         
@@ -157,8 +373,10 @@ class ClientGitHub(object):
         :type  remote: str
         :param branch: The repository branch
         :type  branch: str
+        :param kwargs: Clone options (depth, single_branch, mirror, snapshot)
+        :type  kwargs: dict
         """
-        github = cls(local, remote, branch)._clone()
+        github = cls(local, remote, branch, **kwargs)._clone()
         
     @classmethod
     def pull(cls, local, remote, branch):
@@ -172,4 +390,22 @@ class ClientGitHub(object):
         :param branch: The repository branch
         :type  branch: str
         """
-        github = cls(local, remote, branch)._pull()
\ No newline at end of file
+        github = cls(local, remote, branch)._pull()
+        
+    @classmethod
+    def fetch(cls, local, remote, branch):
+        """
+        Fetch changes from a remote repository without updating the local
+        branch. Returns the repository object, call update() to pull changes
+        if behind is True.
+        
+        :param  local: Local path to clone to
+        :type   local: str
+        :param remote: The GitHub repository URL
+        :type  remote: str
+        :param branch: The repository branch
+        :type  branch: str
+        """
+        github = cls(local, remote, branch)
+        github.behind = github._fetch()
+        return github
\ No newline at end of file
@@ -1,4 +1,13 @@
 from lense import import_class
+from lense.client.profiler import PROFILER
+
+# Command handler classes and modules, loaded on demand
+HANDLERS = {
+    "request": ('ClientHandler_Request', 'lense.client.handlers.request'),
+    "test": ('ClientHandler_Test', 'lense.client.handlers.test'),
+    "module": ('ClientHandler_Module', 'lense.client.handlers.module'),
+    "stats": ('ClientHandler_Stats', 'lense.client.handlers.stats')
+}
 
 class ClientHandlers(object):
     """
@@ -21,11 +30,7 @@ class ClientHandlers(object):
         """
         Return all available handlers.
         """
-        return {
-            "request": import_class('ClientHandler_Request', 'lense.client.handlers.request', init=False),
-            "test": import_class('ClientHandler_Test', 'lense.client.handlers.test', init=False),
-            "module": import_class('ClientHandler_Module', 'lense.client.handlers.module', init=False)
-        }
+        return dict((name, import_class(cls, module, init=False)) for name, (cls, module) in HANDLERS.items())
         
     def get_args(self, handler=None):
         """
@@ -44,7 +49,8 @@ class ClientHandlers(object):
         """
         Retrieve and initialize a command handler.
         """
-        return LENSE.CLIENT.ensure(self.all().get(handler, None),
-            isnot = None,
-            error = 'Attempted to load unsupported handler: {0}'.format(handler),
-            code  = 1)
\ No newline at end of file
+        with PROFILER.phase('handler_import'):
+            return LENSE.CLIENT.ensure(self.all().get(handler, None),
+                isnot = None,
+                error = 'Attempted to load unsupported handler: {0}'.format(handler),
+                code  = 1)
\ No newline at end of file
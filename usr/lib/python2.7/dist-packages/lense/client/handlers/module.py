@@ -1,6 +1,5 @@
+from __future__ import print_function
 import re
-import json
-from urllib import urlopen
 from os import listdir, path, environ
 
 # Django Libraries
@@ -8,7 +7,10 @@ from django import setup as django_setup
 from django.conf import settings as django_settings
 
 # Lense Libraries
+from lense.client import codec
 from lense.common.utils import ensure_root
+from lense.client.registry import ClientModuleRegistry
+from lense.client.manifest import ClientManifestFetcher
 from lense.client.handlers.base import ClientHandler_Base
 
 class ClientHandler_Module(ClientHandler_Base):
@@ -25,7 +27,33 @@ class ClientHandler_Module(ClientHandler_Base):
     }
     
     # Supported options
-    options = []
+    options = [
+        {
+            "long": "all",
+            "help": "Upgrade all installed modules [upgrade]",
+            "action": "store_true"
+        },
+        {
+            "long": "jobs",
+            "help": "Number of modules to fetch in parallel [upgrade], defaults to 8",
+            "action": "store"
+        },
+        {
+            "long": "depth",
+            "help": "Shallow clone with the given history depth [install]",
+            "action": "store"
+        },
+        {
+            "long": "mirror",
+            "help": "Clone using a local mirror cache in ~/.lense/mirrors [install]",
+            "action": "store_true"
+        },
+        {
+            "long": "snapshot",
+            "help": "Download a tarball snapshot instead of cloning [install]",
+            "action": "store_true"
+        }
+    ]
     
     # Supported commands
     commands = {
@@ -36,7 +64,7 @@ class ClientHandler_Module(ClientHandler_Base):
             "help": "Remove a module"
         },
         "upgrade": {
-            "help": "Upgrade a module"
+            "help": "Upgrade one or more modules (comma separated) or all modules with --all"
         },
         "list": {
             "help": "Show installed modules"
@@ -57,8 +85,8 @@ class ClientHandler_Module(ClientHandler_Base):
         self.module = LENSE.CLIENT.ARGS.get('module', None)
         self.root   = '/etc/lense/modules'
         
-        # Install modules
-        self.installed = self._get_installed()
+        # Installed modules index
+        self.registry = ClientModuleRegistry(self.root)
         
     def _check_module_arg(self):
         """
@@ -67,23 +95,6 @@ class ClientHandler_Module(ClientHandler_Base):
         if not self.module:
             LENSE.die('Must specify a module name/URI!')
         
-    def _get_installed(self):
-        """
-        Discover currently installed modules.
-        """
-        modules = []
-        for module in listdir(self.root):
-            try:
-                module_root = '{0}/{1}'.format(self.root, module)
-                if path.isdir(module_root):
-                    modules.append(json.loads(open('{0}/manifest.json'.format(module_root), 'r').read()))
-                
-            # Failed to load module manifest
-            except Exception as e:
-                LENSE.LOG.exception('Failed to load module "{0}" manifest: {1}'.format(module, str(e)))
-                LENSE.die('Could not load manifest for module: {0}'.format(module))
-        return modules
-        
     def _parse_github_url(self):
         """
         Validate and extract attributes from a GitHub URL when installing a module.
@@ -121,53 +132,138 @@ class ClientHandler_Module(ClientHandler_Base):
         # Return the manifest
         return manifest
         
-    def _get_local_manifest(self):
+    def _get_local_manifest(self, module=None):
         """
         Retrieve a local manifest for a module.
         """
-        try:
-            manifest_path = '{0}/{1}/manifest.json'.format(self.root, self.module)
-            return self._validate_manifest(json.loads(open(manifest_path).read()))
-        except Exception as e:
-            LENSE.die('Failed to load module "{0}" manifest: {1}'.format(self.module, str(e)))
+        module   = module or self.module
+        manifest = self.registry.get(module)
+        if not manifest:
+            LENSE.die('Failed to load module "{0}" manifest, see {1} for details'.format(module, LENSE.CONF.client.log))
+        return self._validate_manifest(manifest)
         
     def _get_github_manifest(self):
         """
         Retrieve a remote GitHub manifest before installing.
         """
         github_url = self._parse_github_url()
-        
-        # Raw manifest contents
-        raw_manifest = 'https://raw.githubusercontent.com/{0}/{1}/master/manifest.json'.format(
-            github_url['account'],
-            github_url['repository']
-        )
+        fetcher    = ClientManifestFetcher()
         
         # Get the manifest contents
         try:
-            response = urlopen(raw_manifest)
+            manifest = fetcher.get(github_url['account'], github_url['repository'])
+            
+            # Manifest tracks another branch
+            branch = (manifest.get('source') or {}).get('branch', 'master')
+            if not branch == 'master':
+                manifest = fetcher.get(github_url['account'], github_url['repository'], branch)
             
             # Validate the manifest
-            return self._validate_manifest(json.loads(response.read()))
+            return self._validate_manifest(manifest)
         
         # Failed to retrieve/parse module manifest
         except Exception as e:
             LENSE.die('Failed to load module manifest: {0}'.format(str(e)))
         
+    def _get_handler_manifests(self, manifests):
+        """
+        Load and validate every handler manifest in a module before any
+        handler is registered.
+        
+        :param manifests: The handler manifests directory
+        :type  manifests: str
+        :rtype: list
+        """
+        handlers = []
+        errors   = []
+        for manifest in sorted(listdir(manifests)):
+            manifest_path = '{0}/{1}'.format(manifests, manifest)
+            try:
+                handler_data = codec.loads(open(manifest_path, 'r').read())
+                
+                # Required handler attributes
+                if not isinstance(handler_data, dict):
+                    raise ValueError('Handler manifest must be a dictionary')
+                for k in ['name', 'path', 'method']:
+                    if not k in handler_data:
+                        raise ValueError('Missing required key: {0}'.format(k))
+                
+                # Disable module validation
+                handler_data['validate'] = False
+                handlers.append(handler_data)
+                
+            # Invalid handler manifest
+            except Exception as e:
+                errors.append('{0}: {1}'.format(manifest, str(e)))
+        
+        # Do not register anything if a manifest is invalid
+        if errors:
+            for error in errors:
+                LENSE.FEEDBACK.error('Invalid handler manifest: {0}'.format(error))
+            LENSE.die('Failed to validate {0} handler manifest(s)'.format(len(errors)))
+        return handlers
+    
+    def _supports_bulk(self):
+        """
+        Check if the engine advertises a bulk handler create endpoint.
+        """
+        for handler in (LENSE.CLIENT.support or {}).values():
+            if handler.get('path') == 'handler/bulk' and handler.get('method') == 'POST':
+                return True
+        return False
+    
+    def _register_handler(self, handler_data):
+        """
+        Register a single handler with the engine.
+        """
+        return LENSE.CLIENT.REST.request('handler', 'POST', codec.dumps(handler_data), ensure=False)
+    
+    def _register_handlers(self, handlers):
+        """
+        Register handlers with the engine, in a single bulk request if the
+        engine supports it, otherwise concurrently.
+        
+        :param handlers: Validated handler manifests
+        :type  handlers: list
+        """
+        
+        # Bulk registration
+        if self._supports_bulk():
+            response = LENSE.CLIENT.REST.request('handler/bulk', 'POST', codec.dumps({'handlers': handlers}), ensure=False)
+            if not response.code == 200:
+                LENSE.die('Failed to register {0} handler(s): HTTP {1}'.format(len(handlers), response.code))
+            return LENSE.FEEDBACK.success('Registered {0} handler(s) in bulk'.format(len(handlers)))
+        
+        # Concurrent registration
+        failed = 0
+        for handler_data, response, error in LENSE.CLIENT.CONCURRENCY.map(self._register_handler, handlers):
+            if error or not response.code == 200:
+                failed += 1
+                LENSE.FEEDBACK.error('Failed to register handler "{0}": {1}'.format(handler_data['name'],
+                    str(error) if error else 'HTTP {0}'.format(response.code)))
+            else:
+                LENSE.FEEDBACK.success('Registered handler "{0}": path={1}, method={2}'.format(handler_data['name'], handler_data['path'], handler_data['method']))
+        
+        # Registration summary
+        limit = int(LENSE.CLIENT.CONCURRENCY.limit)
+        if failed:
+            LENSE.die('Failed to register {0} of {1} handler(s), concurrency_limit={2}'.format(failed, len(handlers), limit))
+        LENSE.FEEDBACK.info('Registered {0} handler(s), concurrency_limit={1}'.format(len(handlers), limit))
+        
     def list(self):
         """
         List installed modules.
         """
-        print ''
-        for module in self.installed:
-            print 'Module: {0}'.format(module['name'])
-            print 'Description: {0}'.format(module['description'])
-            print 'Version: {0}'.format(module['version'])
-            print 'Author: {0}'.format(module['author'])
-            print 'Source:'
-            print '> Type: {0}'.format(module['source']['type'])
-            print '> URI: {0}'.format(module['source']['uri'])
-            print '> Branch: {0}\n'.format(module['source'].get('branch', 'master'))
+        print('')
+        for module in self.registry.all():
+            print('Module: {0}'.format(module['name']))
+            print('Description: {0}'.format(module['description']))
+            print('Version: {0}'.format(module['version']))
+            print('Author: {0}'.format(module['author']))
+            print('Source:')
+            print('> Type: {0}'.format(module['source']['type']))
+            print('> URI: {0}'.format(module['source']['uri']))
+            print('> Branch: {0}\n'.format(module['source'].get('branch', 'master')))
         
     def install(self):
         """
@@ -184,9 +280,12 @@ class ClientHandler_Module(ClientHandler_Base):
     
         # Download the module
         LENSE.CLIENT.GITHUB.clone(
-            local  = local,
-            remote = self.module,
-            branch = manifest['source'].get('branch', 'master')
+            local    = local,
+            remote   = self.module,
+            branch   = manifest['source'].get('branch', 'master'),
+            depth    = LENSE.CLIENT.ARGS.get('depth'),
+            mirror   = LENSE.CLIENT.ARGS.get('mirror') or None,
+            snapshot = LENSE.CLIENT.ARGS.get('snapshot') or None
         )
         
         # Set the Django settings module
@@ -198,23 +297,18 @@ class ClientHandler_Module(ClientHandler_Base):
         # Engine module objects
         if path.isdir('{0}/engine'.format(local)):
             
-            # Handler manifests
-            handler_manifests = '{0}/engine/handlers/manifests'.format(local)
+            # Load and validate all handler manifests
+            handlers = self._get_handler_manifests('{0}/engine/handlers/manifests'.format(local))
             
             # Construct REST client
             LENSE.CLIENT.REST.construct(**LENSE.CLIENT.get_authentication())
             
-            # Load handler manifests
-            for manifest in listdir(handler_manifests):
-                handler_data = json.loads(open('{0}/{1}'.format(handler_manifests, manifest)).read())
-                
-                # Disable module validation
-                handler_data['validate'] = False
-                
-                # Create the handler
-                response = LENSE.CLIENT.REQUEST.request('handler', 'POST', handler_data)
-            
-                print response
+            # Register the handlers
+            self._register_handlers(handlers)
+        
+        # Index the module
+        self.registry.update(manifest['name'])
+        self.registry.save()
         
         # Module installation success
         LENSE.FEEDBACK.success('Installed module: {0}@{1}'.format(manifest['name'], manifest['source']['uri']))
@@ -233,23 +327,65 @@ class ClientHandler_Module(ClientHandler_Base):
         
         # Remove the module directory
         LENSE.rmdir('{0}/{1}'.format(self.root, manifest['name']))
+        self.registry.remove(manifest['name'])
+        self.registry.save()
         LENSE.FEEDBACK.success('Uninstalled module: {0}'.format(manifest['name']))
     
+    def _fetch_module(self, manifest):
+        """
+        Fetch a module remote and check if the module is behind.
+        """
+        github = LENSE.CLIENT.GITHUB.fetch(
+            local  = '{0}/{1}'.format(self.root, manifest['name']),
+            remote = manifest['source']['uri'],
+            branch = manifest['source'].get('branch', 'master')
+        )
+        github.module = manifest['name']
+        return github
+    
+    def _update_module(self, github):
+        """
+        Update a module that is behind its remote.
+        """
+        github.update()
+        return github
+    
     def upgrade(self):
         """
-        Upgrade a Lense module.
+        Upgrade one or more Lense modules.
         """
         ensure_root()
         
-        # Check module argument
-        self._check_module_arg()
+        # Target modules
+        if LENSE.CLIENT.ARGS.get('all', False):
+            manifests = [self._validate_manifest(m) for m in self.registry.all()]
+        else:
+            self._check_module_arg()
+            manifests = [self._get_local_manifest(m.strip()) for m in self.module.split(',') if m.strip()]
         
-        # Get the local manifest
-        manifest = self._get_local_manifest()
+        # Fetch all module remotes concurrently
+        workers = int(LENSE.CLIENT.ARGS.get('jobs') or 8)
+        status  = {}
+        behind  = []
+        for manifest, github, error in LENSE.CLIENT.CONCURRENCY.map(self._fetch_module, manifests, workers=workers):
+            if error:
+                status[manifest['name']] = 'failed: {0}'.format(str(error))
+            elif github.behind:
+                behind.append(github)
+            else:
+                status[manifest['name']] = 'up to date'
         
-        # Update the module
-        LENSE.CLIENT.GITHUB.pull(
-            local  = '{0}/{1}'.format(self.root, manifest['name']),
-            remote = manifest['source']['uri'],
-            branch = manifest['source'].get('branch', 'master')
-        )
\ No newline at end of file
+        # Update only the modules that changed
+        for github, result, error in LENSE.CLIENT.CONCURRENCY.map(self._update_module, behind, workers=workers):
+            if error:
+                status[github.module] = 'failed: {0}'.format(str(error))
+            else:
+                status[github.module] = 'updated -> {0}'.format(github.local_commit)
+                self.registry.update(github.module)
+        self.registry.save()
+        
+        # Upgrade summary
+        LENSE.FEEDBACK.block(['{0}: {1}'.format(m['name'], status[m['name']]) for m in manifests], 'UPGRADE')
+        failed = len([s for s in status.values() if s.startswith('failed')])
+        if failed:
+            LENSE.die('Failed to upgrade {0} of {1} module(s)'.format(failed, len(manifests)))
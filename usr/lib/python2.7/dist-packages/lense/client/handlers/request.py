@@ -1,25 +1,29 @@
-import json
-from itertools import imap
+from __future__ import print_function
+from sys import stdin, exit
+from os.path import isfile
 from collections import OrderedDict
 
 # Lense Libraries
-from lense.client import SUPPORT_CACHE
 from lense.client.args.options import OPTIONS
+from lense.client.retry import ClientRetryPolicy
+from lense.common.http import HTTP_POST, HTTP_PUT
 from lense.client.handlers.base import ClientHandler_Base
 
+# Streamed request body chunk size
+CHUNK_SIZE = 65536
+
 def get_commands():
     """
-    Return a list of supported commands from the cache file.
+    Return a list of supported commands from the support cache.
     """
     commands = {}
-    with open(SUPPORT_CACHE, 'r') as f:
-        cache   = json.loads(f.read())
-        longest = max(imap(len, cache))
-        for name, attrs in cache.iteritems():
-            indent = longest - len(name) + 1
-            commands[name] = {
-                "help": "{0}{1}".format(' ' * indent, attrs['desc'])
-            }
+    support  = LENSE.CLIENT.support
+    longest  = max(len(name) for name in support) if support else 0
+    for name, attrs in support.items():
+        indent = longest - len(name) + 1
+        commands[name] = {
+            "help": "{0}{1}".format(' ' * indent, attrs['desc'])
+        }
     return OrderedDict(sorted(commands.items()))
 
 class ClientHandler_Request(ClientHandler_Base):
@@ -43,6 +47,21 @@ class ClientHandler_Request(ClientHandler_Base):
             "help": "Pass additional data as a quoted JSON string: --data '{\"key\":\"value\"}'",
             "action": "store"
         },
+        {
+            "long": "data-file",
+            "help": "Stream the request body from a file, or from stdin with '-': --data-file users.json",
+            "action": "store"
+        },
+        {
+            "long": "chunked",
+            "help": "Send the --data-file body with chunked transfer encoding.",
+            "action": "store_true"
+        },
+        {
+            "long": "ndjson",
+            "help": "Post each line of the --data-file as its own request (implied for .ndjson and .jsonl files).",
+            "action": "store_true"
+        },
         {
             "short": "i",
             "long": "info",
@@ -54,11 +73,51 @@ class ClientHandler_Request(ClientHandler_Base):
             "long": "raw",
             "help": "Dump the raw JSON output from the server to stdout.",
             "action": "store_true"
+        },
+        {
+            "short": "f",
+            "long": "format",
+            "help": "Output format: json, ndjson, csv, table or yaml (default: json).",
+            "action": "store"
+        },
+        {
+            "long": "fields",
+            "help": "Comma separated fields to output, dotted paths for nested fields: --fields uuid,name. Sent to the engine when supported.",
+            "action": "store"
+        },
+        {
+            "long": "select",
+            "help": "Alias for --fields.",
+            "action": "store"
+        },
+        {
+            "long": "filter",
+            "help": "Only output objects matching all comma separated rules: key=value, key!=value, key~regex, key<n, key>n. Sent to the engine when supported.",
+            "action": "store"
+        },
+        {
+            "long": "no-cache",
+            "help": "Bypass the client response cache.",
+            "action": "store_true"
+        },
+        {
+            "long": "cache-ttl",
+            "help": "Cache GET responses for the given number of seconds.",
+            "action": "store"
         }
     ] + OPTIONS
     
-    # Supported commands
-    commands = get_commands()
+    # Supported commands, loaded on first use
+    _commands = None
+    
+    @property
+    def commands(self):
+        """
+        Supported commands from the support cache.
+        """
+        if self._commands is None:
+            self._commands = get_commands()
+        return self._commands
     
     def __init__(self):
         super(ClientHandler_Request, self).__init__(self.id)
@@ -66,17 +125,108 @@ class ClientHandler_Request(ClientHandler_Base):
         # Raw output / command information
         self.raw  = LENSE.CLIENT.ARGS.get('raw', False)
         self.info = LENSE.CLIENT.ARGS.get('info', False)
+        
+        # Request body file / chunked encoding / one request per line
+        self.data_file = LENSE.CLIENT.ARGS.get('data_file')
+        self.chunked   = LENSE.CLIENT.ARGS.get('chunked', False)
+        self.ndjson    = LENSE.CLIENT.ARGS.get('ndjson', False) or (self.data_file or '').endswith(('.ndjson', '.jsonl'))
                 
     def command_info(self):
         """
         Print supported command information and exit.
         """
         info = LENSE.CLIENT.support.get(self.command)
-        print '\nName:   {0}'.format(info['name'])
-        print 'UUID:   {0}'.format(info['uuid'])
-        print 'Desc:   {0}'.format(info['desc'])
-        print 'Path:   {0}'.format(info['path'])
-        print 'Method: {0}\n'.format(info['method'])
+        print('\nName:   {0}'.format(info['name']))
+        print('UUID:   {0}'.format(info['uuid']))
+        print('Desc:   {0}'.format(info['desc']))
+        print('Path:   {0}'.format(info['path']))
+        print('Method: {0}\n'.format(info['method']))
+        
+    def _open_data_file(self):
+        """
+        Open the request body file, or stdin.
+        """
+        if self.data_file == '-':
+            return getattr(stdin, 'buffer', stdin)
+        if not isfile(self.data_file):
+            LENSE.die('Could not locate data file: {0}'.format(self.data_file))
+        return open(self.data_file, 'rb')
+        
+    def _chunks(self, f, size=CHUNK_SIZE):
+        """
+        Read a file in chunks, sent with chunked transfer encoding.
+        """
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                return
+            yield chunk
+        
+    def _stream(self, support):
+        """
+        Send the data file as a single streamed request body. Streamed
+        bodies cannot be replayed, so the request is not retried.
+        """
+        f = self._open_data_file()
+        try:
+            
+            # Files with a known size are sent with a Content-Length
+            data = self._chunks(f) if (self.chunked or self.data_file == '-') else f
+            return LENSE.CLIENT.REST.request(
+                path    = support['path'],
+                method  = support['method'],
+                data    = data,
+                support = support,
+                retry   = ClientRetryPolicy(attempts=1))
+        finally:
+            if not self.data_file == '-':
+                f.close()
+        
+    def _batches(self, f, size):
+        """
+        Read non-empty lines from a file in batches of (line number, line).
+        """
+        batch = []
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                batch.append((number, line.strip()))
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+        
+    def _upload(self, support):
+        """
+        Post each record of an NDJSON data file as its own request over the
+        pooled session, bounded by the adaptive concurrency limit. Records
+        are read in batches so the file is never held in memory.
+        """
+        def post(record):
+            return LENSE.CLIENT.REST.request(support['path'], support['method'], record[1], ensure=False, support=support)
+        
+        # Post each batch of records
+        posted, failed = 0, 0
+        f = self._open_data_file()
+        try:
+            for batch in self._batches(f, LENSE.CLIENT.CONCURRENCY.maximum * 4):
+                for record, response, error in LENSE.CLIENT.CONCURRENCY.map(post, batch):
+                    if error or not response.code == 200:
+                        failed += 1
+                        reason  = str(error) if error else 'HTTP {0}: {1}'.format(response.code, response.content)
+                        LENSE.FEEDBACK.error('Record on line {0} failed: {1}'.format(record[0], reason))
+                    else:
+                        posted += 1
+        finally:
+            if not self.data_file == '-':
+                f.close()
+        
+        # Upload summary
+        summary = 'records_posted={0}, records_failed={1}, concurrency_limit={2}'.format(posted, failed, int(LENSE.CLIENT.CONCURRENCY.limit))
+        if failed:
+            LENSE.die(summary)
+        LENSE.FEEDBACK.success(summary)
+        exit(0)
         
     def default(self):
         """
@@ -91,17 +241,28 @@ class ClientHandler_Request(ClientHandler_Base):
         # Construct REST client
         LENSE.CLIENT.REST.construct(**LENSE.CLIENT.get_authentication())
         
+        # Request body file
+        support = LENSE.CLIENT.support.get(self.command)
+        if self.data_file:
+            if not support['method'].upper() in [HTTP_POST, HTTP_PUT]:
+                LENSE.die('--data-file requires a POST or PUT command, "{0}" uses {1}'.format(self.command, support['method']))
+            if self.ndjson:
+                return self._upload(support)
+            response = self._stream(support)
+        
         # Request parameters
-        params = {
-            'path': LENSE.CLIENT.support.get(self.command)['path'],
-            'method': LENSE.CLIENT.support.get(self.command)['method'],
-            'data': LENSE.CLIENT.ARGS.get('data')
-        }
+        else:
+            params  = {
+                'path': support['path'],
+                'method': support['method'],
+                'data': LENSE.CLIENT.ARGS.get('data'),
+                'support': support
+            }
         
-        # Make the request
-        response = LENSE.CLIENT.REST.request(**params)
+            # Make the request
+            response = LENSE.CLIENT.REST.request(**params)
         
-        # OK
+        # OK, skip anything the engine already applied
         if response.code == 200:
-            LENSE.CLIENT.http_response(response, self.raw)
+            LENSE.CLIENT.http_response(response, self.raw, LENSE.CLIENT.REST.passthrough(support).keys())
         LENSE.CLIENT.http_error(response, self.raw)
\ No newline at end of file
@@ -0,0 +1,197 @@
+import re
+from sys import exit
+from time import time
+from math import log, ceil
+
+# Lense Libraries
+from lense.client import codec
+from lense.client.formatters import get_formatter
+from lense.client.handlers.base import ClientHandler_Base
+
+# Latency histogram bucket growth, percentiles are accurate to 10%
+BUCKET_GROWTH = 1.1
+
+# Duration suffixes for --since
+DURATIONS     = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+class ClientStats(object):
+    """
+    Class object for streaming request statistics, latency percentiles are
+    estimated from a logarithmic histogram so memory does not grow with the
+    number of requests.
+    """
+    def __init__(self):
+        self.count   = 0
+        self.errors  = 0
+        self.latency = 0.0
+        self.bytes   = 0
+        self.buckets = {}
+
+    def add(self, entry):
+        """
+        Add a journal entry.
+        """
+        latency = entry['latency'] * 1000
+        bucket  = int(ceil(log(latency, BUCKET_GROWTH))) if latency > 1 else 0
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count   += 1
+        self.latency += latency
+        self.bytes   += entry.get('bytes') or 0
+        # Connection failures, client and server errors
+        if entry['status'] is None or entry['status'] >= 400:
+            self.errors += 1
+
+    def percentile(self, p):
+        """
+        Estimate a latency percentile in milliseconds.
+        """
+        rank = ceil(self.count * p / 100.0)
+        seen = 0
+        for bucket in sorted(self.buckets.keys()):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return round(BUCKET_GROWTH ** bucket, 1)
+        return 0.0
+
+    def row(self, **attrs):
+        """
+        Return the statistics as an output row.
+        """
+        attrs.update({
+            'requests': self.count,
+            'errors': self.errors,
+            'error_rate': round(float(self.errors) / self.count, 4) if self.count else 0,
+            'avg_ms': round(self.latency / self.count, 1) if self.count else 0,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'bytes': self.bytes
+        })
+        return attrs
+
+class ClientHandler_Stats(ClientHandler_Base):
+    """
+    Class object for aggregating the client request journal.
+    """
+    id      = 'stats'
+
+    # Command description
+    desc    = {
+        "title": "Lense Request Statistics",
+        "summary": "Show statistics from the client request journal",
+        "usage": "lense stats [options]"
+    }
+
+    # Supported options
+    options = [
+        {
+            "long": "top",
+            "help": "Number of paths to show, defaults to 10.",
+            "action": "store"
+        },
+        {
+            "long": "sort",
+            "help": "Sort paths by: p50_ms, p95_ms, p99_ms, avg_ms, requests, errors, error_rate (default: p95_ms).",
+            "action": "store"
+        },
+        {
+            "long": "since",
+            "help": "Only include requests from the given period: 30m, 12h, 7d.",
+            "action": "store"
+        },
+        {
+            "long": "path",
+            "help": "Only include request paths matching a regular expression.",
+            "action": "store"
+        },
+        {
+            "short": "f",
+            "long": "format",
+            "help": "Output format: json, ndjson, csv, table or yaml (default: table).",
+            "action": "store"
+        }
+    ]
+
+    # Supported commands
+    commands = {}
+
+    def __init__(self):
+        super(ClientHandler_Stats, self).__init__(self.id)
+
+        # Paths shown / sort key / time window / path filter
+        self.top   = self._top(LENSE.CLIENT.ARGS.get('top', 10))
+        self.sort  = LENSE.CLIENT.ARGS.get('sort', 'p95_ms')
+        self.since = self._since(LENSE.CLIENT.ARGS.get('since'))
+        self.path  = re.compile(LENSE.CLIENT.ARGS.get('path')) if LENSE.CLIENT.ARGS.get('path') else None
+
+    def _top(self, top):
+        """
+        Validate the number of paths to show.
+        """
+        top = str(top).strip()
+        LENSE.CLIENT.ensure(top.isdigit() and int(top) > 0,
+            value = True,
+            error = 'Invalid --top "{0}", expected a positive number'.format(top),
+            code  = 1)
+        return int(top)
+
+    def _since(self, period):
+        """
+        Convert a period (30m, 12h, 7d) to a start timestamp.
+        """
+        if not period:
+            return None
+        match = re.match(r'^(\d+)([smhd]?)$', period)
+        if not match:
+            LENSE.die('Invalid period "{0}", expected a number with an optional s, m, h or d suffix'.format(period))
+        return time() - int(match.group(1)) * DURATIONS[match.group(2) or 's']
+
+    def _entries(self):
+        """
+        Stream journal entries, oldest first.
+        """
+        for journal in LENSE.CLIENT.JOURNAL.files():
+            with open(journal, 'r') as f:
+                for line in f:
+                    try:
+                        entry = codec.loads(line)
+                    except ValueError:
+                        continue
+                    if self.since and entry['ts'] < self.since:
+                        continue
+                    if self.path and not self.path.search(entry['path']):
+                        continue
+                    yield entry
+
+    def default(self):
+        """
+        Aggregate the journal and print statistics by path.
+        """
+        total = ClientStats()
+        paths = {}
+        for entry in self._entries():
+            key = (entry['method'], entry['path'])
+            if not key in paths:
+                paths[key] = ClientStats()
+            paths[key].add(entry)
+            total.add(entry)
+
+        # No requests recorded
+        if not total.count:
+            LENSE.FEEDBACK.info('No requests found in journal: {0}'.format(LENSE.CLIENT.JOURNAL.path))
+            if not LENSE.CLIENT.JOURNAL.enabled:
+                LENSE.FEEDBACK.info('The request journal is disabled, set "enabled" in the "journal" block of client.conf')
+            exit(0)
+
+        # Top paths
+        rows = [stats.row(method=k[0], path=k[1]) for k, stats in paths.items()]
+        if not self.sort in rows[0]:
+            LENSE.die('Unsupported sort key: {0}'.format(self.sort))
+        rows = sorted(rows, key=lambda r: r[self.sort], reverse=True)[:self.top]
+
+        # Print statistics
+        fields = ['method', 'path', 'requests', 'errors', 'error_rate', 'avg_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'bytes']
+        get_formatter(LENSE.CLIENT.ARGS.get('format') or 'table', fields=fields).write(rows)
+        LENSE.FEEDBACK.success('requests={0}, paths={1}, error_rate={2}, p50_ms={3}, p95_ms={4}, p99_ms={5}'.format(
+            total.count, len(paths), round(float(total.errors) / total.count, 4),
+            total.percentile(50), total.percentile(95), total.percentile(99)))
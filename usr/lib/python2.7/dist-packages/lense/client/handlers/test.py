@@ -1,10 +1,12 @@
-import json
 from time import time
 from sys import getsizeof, exit
 from os.path import isfile
 
 # Lense Libraries
+from lense.client import codec
 from lense.client.args.options import OPTIONS
+from lense.client.retry import ClientRetryPolicy
+from lense.client.timeouts import ClientTimeouts
 from lense.common.exceptions import RequestError
 from lense.client.handlers.base import ClientHandler_Base
 
@@ -62,7 +64,7 @@ class ClientHandler_Test(ClientHandler_Base):
             LENSE.die('Could not locate test manifest: {0}'.format(manifest))
         
         try:
-            self.manifest = json.loads(open(LENSE.CLIENT.ARGS.get('manifest'), 'r').read())
+            self.manifest = codec.loads(open(LENSE.CLIENT.ARGS.get('manifest'), 'r').read())
         except Exception as e:
             LENSE.die('Failed to parse test manifest: {0}'.format(str(e)))
         
@@ -76,7 +78,7 @@ class ClientHandler_Test(ClientHandler_Base):
             return [True, None]
         
         # Validate the response data
-        for k,v in expects.iteritems():
+        for k,v in expects.items():
             if not k in data:
                 return [False, {'key': k, 'value': [v,None]}]
             if not data[k] == v:
@@ -121,7 +123,7 @@ class ClientHandler_Test(ClientHandler_Base):
             LENSE.die('Test manifest must contain a "sections" block')
         
         # Process the manifest
-        for section_key, section_block in self.manifest['sections'].iteritems():
+        for section_key, section_block in self.manifest['sections'].items():
         
             # Make sure a test block exists
             if not isinstance(section_block.get('tests', None), list):
@@ -160,13 +162,27 @@ class ClientHandler_Test(ClientHandler_Base):
                 params = {
                     'path': test_block['path'],
                     'method': test_block['method'],
-                    'data': json.dumps(test_block.get('data', {})),
-                    'ensure': False
+                    'data': codec.dumps(test_block.get('data', {})),
+                    'ensure': False,
+                    'retry': ClientRetryPolicy.from_conf(test_block['retry']) if 'retry' in test_block else None,
+                    'timeouts': ClientTimeouts.from_conf(test_block['timeout']) if 'timeout' in test_block else None
                 }
                 
                 # Make the request
                 req_start = time()
-                response  = LENSE.CLIENT.REST.request(**params)
+                try:
+                    response  = LENSE.CLIENT.REST.request(**params)
+                    
+                # Request timed out
+                except RequestError as e:
+                    LENSE.FEEDBACK.error('{0}, request_time={1} seconds'.format(str(e), str(time() - req_start)))
+                    has_errors = True
+                    
+                    # Do not continue after error
+                    if not self.cont:
+                        LENSE.FEEDBACK.error('Test block failed!')
+                        exit(e.code)
+                    continue
                 req_time  = '{0} seconds'.format(str(time() - req_start))
                 
                 # Expects block
@@ -181,13 +197,14 @@ class ClientHandler_Test(ClientHandler_Base):
                     
                     # Response data mismatch
                     if not data_ok[0]:
-                        LENSE.FEEDBACK.error('expects.code={0}, response.code={1}, data.expects[{2}]={3} data.returned[{2}]={4}, request_time={5}'.format(
+                        LENSE.FEEDBACK.error('expects.code={0}, response.code={1}, data.expects[{2}]={3} data.returned[{2}]={4}, request_time={5}, retries={6}'.format(
                             expects['code'],
                             response.code,
                             data_ok[1]['key'],
                             data_ok[1]['value'][0],
                             data_ok[1]['value'][1],
-                            req_time
+                            req_time,
+                            response.retries
                         ))
                         has_errors = True
                         
@@ -198,20 +215,22 @@ class ClientHandler_Test(ClientHandler_Base):
                         
                     # Response data match
                     else:
-                        LENSE.FEEDBACK.success('expects.code={0}, response.code={1}, data.returned=OK, rsp_size_bytes={2}, request_time={3}'.format(
+                        LENSE.FEEDBACK.success('expects.code={0}, response.code={1}, data.returned=OK, rsp_size_bytes={2}, request_time={3}, retries={4}'.format(
                             expects['code'],
                             response.code,
                             getsizeof(response.content),
-                            req_time
+                            req_time,
+                            response.retries
                         ))
                     
                 # Response code mismatch
                 else:
-                    LENSE.FEEDBACK.error('expects.code={0}, response.code={1}, rsp_size_bytes={2}, request_time={3}'.format(
+                    LENSE.FEEDBACK.error('expects.code={0}, response.code={1}, rsp_size_bytes={2}, request_time={3}, retries={4}'.format(
                         expects['code'],
                         response.code,
                         getsizeof(response.content),
-                        req_time
+                        req_time,
+                        response.retries
                     ))
                     has_errors = True
                     
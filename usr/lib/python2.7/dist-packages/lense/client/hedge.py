@@ -0,0 +1,144 @@
+from collections import deque
+from threading import Thread, Event, Lock
+
+# Lense Libraries
+from lense.client.compat import Queue, Empty
+
+class ClientHedge(object):
+    """
+    Class object for hedging read-only requests: if a request has not
+    answered within a percentile of recent latency, a duplicate is sent to
+    another endpoint and the first response wins.
+    """
+    def __init__(self):
+
+        # Hedge settings
+        self.enabled     = LENSE.CLIENT.conf('hedge', 'enabled', False, boolean=True)
+        self.percentile  = float(LENSE.CLIENT.conf('hedge', 'percentile', 95))
+        self.min_samples = int(LENSE.CLIENT.conf('hedge', 'min_samples', 20))
+        self.budget      = float(LENSE.CLIENT.conf('hedge', 'budget', 0.1))
+
+        # Recent latencies / hedge tokens
+        self._latency    = deque(maxlen=200)
+        self._tokens     = 0.0
+        self._lock       = Lock()
+
+    def observe(self, latency):
+        """
+        Record the latency of a read-only request and earn hedge budget.
+
+        :param latency: The request latency in seconds
+        :type  latency: float
+        """
+        with self._lock:
+            self._latency.append(latency)
+            self._tokens = min(10.0, self._tokens + self.budget)
+
+    def delay(self):
+        """
+        Return the hedge delay in seconds, or None if there are too few
+        latency samples.
+        """
+        with self._lock:
+            if len(self._latency) < self.min_samples:
+                return None
+            ordered = sorted(self._latency)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100.0))]
+
+    def _allow(self):
+        """
+        Consume one hedge from the budget.
+        """
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def _final(self, response):
+        """
+        Check if a response may win a race: any response the retry policy
+        would not retry on another endpoint (2xx-4xx).
+        """
+        return response is not None and response.status_code < 500
+
+    def _close(self, response):
+        """
+        Close a losing response, aborting its connection if the body has not
+        been read.
+        """
+        if response is not None:
+            response.close()
+
+    def race(self, primary, backup):
+        """
+        Run the primary call and, if it is slower than the hedge delay and the
+        budget allows, the backup call. The first non-retryable response wins,
+        the losing request is aborted by closing its connection. Both calls
+        should stream the response so the loser's body is never read.
+
+        :param primary: Callable making the primary request
+        :type  primary: callable
+        :param  backup: Callable making the hedged request
+        :type   backup: callable
+        :rtype: object
+        """
+        delay   = self.delay()
+        results = Queue()
+        settled = Event()
+        lock    = Lock()
+
+        def run(call):
+            try:
+                result = (call(), None)
+            except Exception as e:
+                result = (None, e)
+
+            # Abort the loser arriving after the race was settled
+            with lock:
+                if settled.is_set():
+                    return self._close(result[0])
+                results.put(result)
+
+        def start(call):
+            thread = Thread(target=run, args=[call])
+            thread.daemon = True
+            thread.start()
+
+        # Start the primary request
+        start(primary)
+        try:
+            response, error = results.get(timeout=delay)
+
+        # Primary request is slow
+        except Empty:
+            if not self._allow():
+                response, error = results.get()
+            else:
+                LENSE.LOG.info('Hedging slow request after {0:.3f} seconds'.format(delay))
+                LENSE.CLIENT.METRICS.incr('hedged_requests_total')
+                start(backup)
+
+                # First non-retryable response wins, otherwise prefer a response to an error
+                response, error = results.get()
+                if not self._final(response):
+                    other = results.get()
+                    if self._final(other[0]) or response is None:
+                        self._close(response)
+                        response, error = other
+                    else:
+                        self._close(other[0])
+
+        # Settle the race, closing any result not yet collected
+        with lock:
+            settled.set()
+            while True:
+                try:
+                    self._close(results.get_nowait()[0])
+                except Empty:
+                    break
+
+        # Both requests failed
+        if error:
+            raise error
+        return response
@@ -1,21 +1,29 @@
-import json
+from __future__ import print_function
+import atexit
 from sys import exit
+from time import time
 from threading import Thread
-from os import makedirs, environ, geteuid
+from os import makedirs, environ, geteuid, rename, stat
 from os.path import expanduser, isfile, isdir
 
 # Lense Libraries
+from lense.client import codec
 from lense import import_class
+from lense.client.profiler import PROFILER
+from lense.client.timeouts import ClientTimeouts
+from lense.client.formatters import ClientFilter, ClientFormatter_JSON, get_formatter
 from lense.client import CLIENT_HOME, SUPPORT_CACHE
+from lense.client.compat import string_types
 from lense.common.exceptions import ClientError, RequestError
 
 class ClientResponse(object):
     """
     Class object for a successfull HTTP response
     """
-    def __init__(self, content, code=200):
+    def __init__(self, content, code=200, retries=0):
         self.content = content
         self.code    = code
+        self.retries = retries
 
 class ClientInterface(object):
     """
@@ -24,6 +32,12 @@ class ClientInterface(object):
     def __init__(self):
         self.HANDLERS = None
         self.ARGS     = None
+        self.METRICS  = None
+        self.THROTTLE = None
+        self.CONCURRENCY = None
+        self.HEDGE       = None
+        self.COALESCER   = None
+        self.JOURNAL     = None
         self.REST     = import_class('ClientREST', 'lense.client.rest', init=False)
         self.GITHUB   = import_class('ClientGitHub', 'lense.client.github', init=False)
         
@@ -31,8 +45,9 @@ class ClientInterface(object):
         self.sysuser  = environ.get('SUDO_USER', environ.get('LOGNAME', None))
         self.as_sudo  = True if geteuid() == 0 else False
         
-        # Support cache
-        self.support  = None
+        # Support cache / background refresh
+        self._support = None
+        self._refresh = None
         
     def bootstrap(self):
         """
@@ -43,36 +58,91 @@ class ClientInterface(object):
         if not isdir(CLIENT_HOME):
             makedirs(CLIENT_HOME)
         
-        # Cache file already exists
-        if isfile(SUPPORT_CACHE):
-            LENSE.LOG.info('Loading supported API operations cache <- {0}'.format(SUPPORT_CACHE))
-            self.support = json.loads(open(SUPPORT_CACHE, 'r').read())
-        
-        # Generate cache
-        else:
-        
-            # Get server API support
-            response = LENSE.CLIENT.REST.request_anonymous('handler/list', 'GET')
-            
-            # Failed to retrieve server API support
-            LENSE.CLIENT.ensure_request(response.code,
-                value = 200,
-                error = 'Failed to retrieve server API support',
-                code  = response.code)
-            
-            # Write the support cache
-            with open(SUPPORT_CACHE, 'w') as f:
-                f.write(json.dumps(response.content))
-            LENSE.LOG.info('Cached supported API operations -> {0}'.format(SUPPORT_CACHE))
-            
-            # Load the support cache
-            LENSE.LOG.info('Loading supported API operations cache <- {0}'.format(SUPPORT_CACHE))
-            self.support  = response.content
+        # Client metrics / request throttling / adaptive concurrency / request journal
+        self.METRICS     = import_class('ClientMetrics', 'lense.client.metrics')
+        self.THROTTLE    = import_class('ClientThrottle', 'lense.client.throttle')
+        self.CONCURRENCY = import_class('ClientConcurrency', 'lense.client.concurrency')
+        self.HEDGE       = import_class('ClientHedge', 'lense.client.hedge')
+        self.COALESCER   = import_class('ClientCoalescer', 'lense.client.coalesce')
+        self.JOURNAL     = import_class('ClientJournal', 'lense.client.journal')
         
         # Load objects
         self.HANDLERS = import_class('ClientHandlers', 'lense.client.handlers')
         self.ARGS     = import_class('ClientArgs', 'lense.client.args', init=False)
 
+    def _fetch_support(self):
+        """
+        Retrieve the supported API operations from the engine and write the
+        support cache.
+        """
+        timeouts = ClientTimeouts.from_conf({
+            'connect': self.conf('support', 'connect_timeout', 3),
+            'read': self.conf('support', 'read_timeout', 10)
+        })
+        response = self.REST.request_anonymous('handler/list', 'GET', timeouts=timeouts)
+        
+        # Failed to retrieve server API support
+        self.ensure_request(response.code,
+            value = 200,
+            error = 'Failed to retrieve server API support',
+            code  = response.code)
+        
+        # Write the support cache
+        with open('{0}.tmp'.format(SUPPORT_CACHE), 'w') as f:
+            f.write(codec.dumps(response.content))
+        rename('{0}.tmp'.format(SUPPORT_CACHE), SUPPORT_CACHE)
+        LENSE.LOG.info('Cached supported API operations -> {0}'.format(SUPPORT_CACHE))
+        return response.content
+        
+    def _refresh_support(self):
+        """
+        Background worker for refreshing a stale support cache.
+        """
+        try:
+            self._fetch_support()
+        except Exception as e:
+            LENSE.LOG.error('Failed to refresh supported API operations cache: {0}'.format(str(e)))
+        
+    def _wait_refresh(self):
+        """
+        Give a background support cache refresh a chance to finish on exit.
+        """
+        if self._refresh and self._refresh.is_alive():
+            self._refresh.join(float(self.conf('support', 'refresh_wait', 2)))
+        
+    @property
+    def support(self):
+        """
+        Supported API operations, loaded on first use. A missing support cache
+        is fetched from the engine, a stale one is used while it is refreshed
+        in the background.
+        """
+        if not self._support is None:
+            return self._support
+        
+        # Cache file already exists
+        with PROFILER.phase('support_cache'):
+            if isfile(SUPPORT_CACHE):
+                self.METRICS.cache('support', True)
+                LENSE.LOG.info('Loading supported API operations cache <- {0}'.format(SUPPORT_CACHE))
+                with open(SUPPORT_CACHE, 'r') as f:
+                    self._support = codec.loads(f.read())
+                
+                # Stale cache, revalidate in the background
+                max_age = float(self.conf('support', 'max_age', 86400))
+                if max_age and time() - stat(SUPPORT_CACHE).st_mtime > max_age:
+                    LENSE.LOG.info('Supported API operations cache is stale, refreshing in the background')
+                    self._refresh = Thread(target=self._refresh_support)
+                    self._refresh.daemon = True
+                    self._refresh.start()
+                    atexit.register(self._wait_refresh)
+            
+            # Generate cache
+            else:
+                self.METRICS.cache('support', False)
+                self._support = self._fetch_support()
+        return self._support
+        
     def get_authentication(self):
         """
         Return a dictionary of authentication attributes.
@@ -86,7 +156,7 @@ class ClientInterface(object):
         }
         
         # Make sure required authentication parameters are set
-        for k,v in auth.iteritems():
+        for k,v in auth.items():
             if not v: LENSE.die('Missing required parameter "{0}", not found in arguments or environment'.format(k))
 
         # Return authentication parameters
@@ -106,65 +176,72 @@ class ClientInterface(object):
                 params[key] = getattr(self, key)
         return params
         
-    def _thread_worker(self, key, path, method, data=None):
+    def _thread_worker(self, request):
         """
         Worker method for handled threaded API calls.
         
-        :param    key: The key to access the response object with
-        :type     key: str
-        :param   path: The request path
-        :type    path: str
-        :param method: The request method
-        :type  method: str
-        :param   data: Additional request data
-        :type    data: dict
+        :param request: The response key and request attributes: [path, method, data]
+        :type  request: tuple
         """
+        key, attr = request
         
-        self._response[key] = self.request(path=path, method=method, data=data)
+        # Get any request data
+        data = None if (len(attr) == 2) else attr[2]
+        return self.REST.request(path=attr[0], method=attr[1], data=data)
         
     def request_threaded(self, requests):
         """
-        Multi-threaded request handler.
-        """
+        Multi-threaded request handler, bounded by the adaptive concurrency
+        limit.
         
-        # Threads / responses
-        threads = []
+        :param requests: Request attributes [path, method, data] by response key
+        :type  requests: dict
+        :rtype: dict
+        """
+        responses = {}
         
         # Process each request
-        for key, attr in requests.iteritems():
-        
-            # Get any request data
-            data   = None if (len(attr) == 2) else attr[2]
-        
-            # Create the thread, append, and start
-            thread = Thread(target=self._thread_worker, args=[key, attr[0], attr[1], data])
-            threads.append(thread)
-            thread.start()
-            
-        # Wait for the API calls to complete
-        for thread in threads:
-            thread.join()
+        for request, response, error in self.CONCURRENCY.map(self._thread_worker, requests.items()):
+            if error:
+                raise error
+            responses[request[0]] = response
+        LENSE.FEEDBACK.info('Threaded requests complete: requests={0}, concurrency_limit={1}'.format(len(responses), int(self.CONCURRENCY.limit)))
             
         # Return the response object
-        return self._response
+        return responses
         
-    def http_response(self, response, raw=False):
+    def http_response(self, response, raw=False, server=None):
         """
-        Print a successfull HTTP response.
+        Write a successfull HTTP response through the selected output
+        formatter, applying any field projection and filter. Objects are
+        written one at a time, but the response content is already decoded.
+        
+        :param response: The API response
+        :type  response: ClientResponse
+        :param      raw: Dump compact JSON output
+        :type       raw: bool
+        :param   server: Arguments already applied by the engine (fields, filter)
+        :type    server: list
         """
-        content = response.content
+        server = server or []
+        output = self.ARGS.get('format')
+        fields = None if 'fields' in server else (self.ARGS.get('fields') or self.ARGS.get('select'))
+        fields = [f.strip() for f in fields.split(',') if f.strip()] if fields else None
+        filter = ClientFilter(None if 'filter' in server else self.ARGS.get('filter'))
         
-        # Raw output
-        if raw:
-            print json.dumps(response.content)
-            
-        # Formatted output
+        # Raw output defaults to compact JSON
+        if raw and not output:
+            formatter = ClientFormatter_JSON(fields=fields, indent=None)
         else:
-            try:
-                content = '\n\n{0}\n'.format(json.dumps(response.content, indent=2))
-            except:
-                pass
-            LENSE.FEEDBACK.success('HTTP {0}: objects_retrieved={1}{2}'.format(response.code, len(response.content), content))
+            formatter = get_formatter(output or 'json', fields=fields)
+        
+        # Stream the response content
+        with PROFILER.phase('render'):
+            if not raw:
+                print('')
+            count = formatter.write(response.content, filter)
+            if not raw:
+                LENSE.FEEDBACK.success('HTTP {0}: objects_retrieved={1}, retries={2}'.format(response.code, count, response.retries))
         
         # Request finished
         exit(0)
@@ -183,11 +260,40 @@ class ClientInterface(object):
         LENSE.FEEDBACK.error(message)
         exit(1)
         
-    def response(self, content, code=200):
+    def response(self, content, code=200, retries=0):
         """
         Return a ClientResponse object.
         """
-        return ClientResponse(content, code)
+        return ClientResponse(content, code, retries)
+        
+    def conf(self, section, key, default=None, boolean=False):
+        """
+        Retrieve an optional client configuration value.
+        
+        :param section: The configuration section
+        :type  section: str
+        :param     key: The configuration key
+        :type      key: str
+        :param default: Value to return if the key is not set
+        :type  default: mixed
+        :param boolean: Parse the value as a flag, i.e. "false" or "0" is False
+        :type  boolean: bool
+        """
+        value = self.confget(getattr(LENSE.CONF, section, None), key)
+        value = default if value is None else value
+        if boolean and isinstance(value, string_types):
+            return value.strip().lower() in ['1', 'true', 'yes', 'on']
+        return bool(value) if boolean else value
+    
+    @staticmethod
+    def confget(block, key, default=None):
+        """
+        Retrieve a key from a configuration block or dictionary.
+        """
+        if block is None:
+            return default
+        value = block.get(key) if isinstance(block, dict) else getattr(block, key, None)
+        return default if value is None else value
         
     def ensure(self, *args, **kwargs):
         """
@@ -0,0 +1,122 @@
+import atexit
+from time import time
+from threading import Thread, Lock
+from os import rename, remove
+from os.path import expanduser, isfile
+
+# Lense Libraries
+from lense.client.compat import Queue, Empty
+from lense.client import codec
+from lense.client import CLIENT_HOME
+
+class ClientJournal(object):
+    """
+    Class object for an append-only NDJSON journal of API requests, written
+    by a background thread and rotated by size.
+    """
+    def __init__(self):
+
+        # Journal settings
+        self.enabled   = LENSE.CLIENT.conf('journal', 'enabled', False, boolean=True)
+        self.path      = expanduser(LENSE.CLIENT.conf('journal', 'path', '{0}/journal.ndjson'.format(CLIENT_HOME)))
+        self.max_bytes = int(LENSE.CLIENT.conf('journal', 'max_bytes', 10485760))
+        self.backups   = int(LENSE.CLIENT.conf('journal', 'backups', 5))
+
+        # Pending entries / writer thread
+        self._queue    = Queue()
+        self._thread   = None
+        self._lock     = Lock()
+
+    def files(self):
+        """
+        Return the journal files, oldest first.
+        """
+        rotated = ['{0}.{1}'.format(self.path, i) for i in range(self.backups, 0, -1)]
+        return [f for f in rotated + [self.path] if isfile(f)]
+
+    def _rotate(self):
+        """
+        Rotate the journal: journal.ndjson -> journal.ndjson.1 -> ...
+        """
+        oldest = '{0}.{1}'.format(self.path, self.backups)
+        if isfile(oldest):
+            remove(oldest)
+        for i in range(self.backups - 1, 0, -1):
+            if isfile('{0}.{1}'.format(self.path, i)):
+                rename('{0}.{1}'.format(self.path, i), '{0}.{1}'.format(self.path, i + 1))
+        if self.backups:
+            rename(self.path, '{0}.1'.format(self.path))
+        else:
+            remove(self.path)
+
+    def _writer(self):
+        """
+        Write queued entries, draining the queue before each flush.
+        """
+        while True:
+            entries = [self._queue.get()]
+            while True:
+                try:
+                    entries.append(self._queue.get_nowait())
+                except Empty:
+                    break
+
+            # Write the entries, a None entry stops the writer
+            try:
+                with open(self.path, 'a') as f:
+                    f.write(''.join('{0}\n'.format(codec.dumps(e)) for e in entries if e))
+                    size = f.tell()
+                if size >= self.max_bytes:
+                    self._rotate()
+            except (IOError, OSError) as e:
+                LENSE.LOG.error('Failed to write request journal: {0}'.format(str(e)))
+            if None in entries:
+                return
+
+    def close(self):
+        """
+        Flush pending entries and stop the writer thread.
+        """
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join(5)
+
+    def write(self, endpoint, path, method, status, latency, size=0, sent=0):
+        """
+        Queue a journal entry for a request attempt.
+
+        :param endpoint: The endpoint URL
+        :type  endpoint: str
+        :param     path: The request path
+        :type      path: str
+        :param   method: The request method
+        :type    method: str
+        :param   status: The response status code, None on connection errors
+        :type    status: int
+        :param  latency: The request latency in seconds
+        :type   latency: float
+        :param     size: Response body bytes
+        :type      size: int
+        :param     sent: Request body bytes
+        :type      sent: int
+        """
+        if not self.enabled:
+            return
+
+        # Start the writer on the first entry
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._writer)
+                self._thread.daemon = True
+                self._thread.start()
+                atexit.register(self.close)
+        self._queue.put({
+            'ts': round(time(), 3),
+            'endpoint': endpoint,
+            'path': path,
+            'method': method.upper(),
+            'status': status,
+            'latency': round(latency, 6),
+            'bytes': size,
+            'sent': sent
+        })
@@ -0,0 +1,94 @@
+from hashlib import sha1
+from os import makedirs, rename
+from os.path import isdir, isfile
+
+# Lense Libraries
+from lense.client import codec
+from lense.client.compat import to_bytes
+from lense.client import CLIENT_HOME
+
+# Cached remote module manifests
+MANIFEST_CACHE = '{0}/manifests'.format(CLIENT_HOME)
+
+class ClientManifestFetcher(object):
+    """
+    Class object for fetching remote module manifests through the pooled
+    HTTP session, revalidating cached copies with ETag / Last-Modified.
+    """
+    def __init__(self):
+
+        # Manifest URL template / request timeout
+        self.url     = LENSE.CLIENT.conf('manifest', 'url', 'https://raw.githubusercontent.com/{account}/{repository}/{branch}/manifest.json')
+        self.timeout = float(LENSE.CLIENT.conf('manifest', 'timeout', 10))
+
+        # Cache directory
+        if not isdir(MANIFEST_CACHE):
+            makedirs(MANIFEST_CACHE)
+
+    def _cache_file(self, uri):
+        return '{0}/{1}.json'.format(MANIFEST_CACHE, sha1(to_bytes(uri)).hexdigest())
+
+    def _load(self, uri):
+        """
+        Load a cached manifest entry.
+        """
+        if not isfile(self._cache_file(uri)):
+            return None
+        try:
+            with open(self._cache_file(uri), 'r') as f:
+                return codec.loads(f.read())
+        except (IOError, ValueError):
+            return None
+
+    def _save(self, uri, entry):
+        """
+        Store a manifest entry in the cache.
+        """
+        cache_file = self._cache_file(uri)
+        with open('{0}.tmp'.format(cache_file), 'w') as f:
+            f.write(codec.dumps(entry))
+        rename('{0}.tmp'.format(cache_file), cache_file)
+
+    def get(self, account, repository, branch='master'):
+        """
+        Retrieve a remote module manifest.
+
+        :param    account: The GitHub account
+        :type     account: str
+        :param repository: The GitHub repository
+        :type  repository: str
+        :param     branch: The repository branch
+        :type      branch: str
+        :rtype: dict
+        """
+        uri     = self.url.format(account=account, repository=repository, branch=branch)
+        cached  = self._load(uri)
+        headers = {}
+
+        # Revalidate the cached manifest
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        # Fetch the manifest
+        response = LENSE.CLIENT.REST.session().get(uri, headers=headers, timeout=self.timeout)
+
+        # Cached copy is current
+        if cached and response.status_code == 304:
+            LENSE.LOG.info('Module manifest not modified, using cache: {0}'.format(uri))
+            return cached['manifest']
+
+        # Manifest retrieved
+        LENSE.CLIENT.ensure(response.status_code,
+            value = 200,
+            error = 'Failed to retrieve manifest {0}: HTTP {1}'.format(uri, response.status_code),
+            code  = 1)
+        manifest = codec.loads(response.content)
+        self._save(uri, {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'manifest': manifest
+        })
+        return manifest
@@ -0,0 +1,280 @@
+import re
+import atexit
+import socket
+from fcntl import flock, LOCK_EX, LOCK_UN
+from os import rename
+from os.path import expanduser
+from threading import Lock
+
+# Lense Libraries
+from lense.client import codec
+from lense.client import CLIENT_HOME
+from lense.client.compat import to_bytes
+
+# Latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# StatsD lines per packet
+STATSD_PACKET   = 20
+
+class ClientMetrics(object):
+    """
+    Class object for collecting client side counters, gauges and latency
+    histograms and exporting them as a Prometheus text file or StatsD lines.
+    """
+    def __init__(self):
+
+        # Export settings
+        self.enabled  = LENSE.CLIENT.conf('metrics', 'enabled', False, boolean=True)
+        self.export   = LENSE.CLIENT.conf('metrics', 'export', 'prometheus')
+        self.prefix   = LENSE.CLIENT.conf('metrics', 'prefix', 'lense_client')
+        self.path     = expanduser(LENSE.CLIENT.conf('metrics', 'path', '{0}/metrics.prom'.format(CLIENT_HOME)))
+        self.statsd   = LENSE.CLIENT.conf('metrics', 'statsd', '127.0.0.1:8125')
+        self.buffer   = int(LENSE.CLIENT.conf('metrics', 'statsd_buffer', 500))
+
+        # Counters / gauges / histograms
+        self.counters   = {}
+        self.gauges     = {}
+        self.histograms = {}
+        self._lock      = Lock()
+
+        # Buffered StatsD timings, sent when the buffer is full
+        self._timings   = []
+
+        # Export when the client exits
+        if self.enabled:
+            atexit.register(self.flush)
+
+    def _key(self, name, labels):
+        """
+        Construct a metric key from a name and optional labels.
+        """
+        return (name, tuple(sorted((labels or {}).items())))
+
+    def incr(self, name, labels=None, value=1):
+        """
+        Increment a counter.
+
+        :param   name: The metric name
+        :type    name: str
+        :param labels: Optional metric labels
+        :type  labels: dict
+        :param  value: The increment value
+        :type   value: int
+        """
+        if not self.enabled: return
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name, value, labels=None):
+        """
+        Set a gauge value.
+        """
+        if not self.enabled: return
+        with self._lock:
+            self.gauges[self._key(name, labels)] = value
+
+    def observe(self, name, value, labels=None):
+        """
+        Record a latency observation in seconds.
+        """
+        if not self.enabled: return
+        key     = self._key(name, labels)
+        timings = None
+        with self._lock:
+            buckets, total, count = self.histograms.get(key, ([0] * len(LATENCY_BUCKETS), 0.0, 0))
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    buckets[i] += 1
+            self.histograms[key] = (buckets, total + value, count + 1)
+
+            # StatsD keeps raw timings until the buffer is full
+            if self.export == 'statsd':
+                self._timings.append((key, value))
+                if len(self._timings) >= self.buffer:
+                    timings, self._timings = self._timings, []
+
+        # Send full buffers
+        if timings:
+            try:
+                self._send_statsd(self._timing_lines(timings))
+            except Exception as e:
+                LENSE.LOG.error('Failed to export client metrics: {0}'.format(str(e)))
+
+    def request(self, path, method, code, latency, sent=0, received=0):
+        """
+        Record metrics for a completed API request.
+
+        :param     path: The request path
+        :type      path: str
+        :param   method: The request method
+        :type    method: str
+        :param     code: The response status code
+        :type      code: int
+        :param  latency: The request latency in seconds
+        :type   latency: float
+        :param     sent: Request body size in bytes
+        :type      sent: int
+        :param received: Response body size in bytes
+        :type  received: int
+        """
+        if not self.enabled: return
+        labels = {'path': path, 'method': method.upper()}
+        self.incr('requests_total', dict(labels, code=str(code)))
+        self.incr('request_bytes_total', labels, sent)
+        self.incr('response_bytes_total', labels, received)
+        self.observe('request_seconds', latency, labels)
+
+    def cache(self, cache, hit):
+        """
+        Record a cache hit or miss.
+
+        :param cache: The cache name (support, token)
+        :type  cache: str
+        :param   hit: Was the lookup a hit
+        :type    hit: bool
+        """
+        self.incr('cache_total', {'cache': cache, 'result': 'hit' if hit else 'miss'})
+
+    def _labels(self, labels, extra=None):
+        """
+        Format Prometheus labels.
+        """
+        labels = list(labels) + (extra or [])
+        if not labels:
+            return ''
+        return '{{{0}}}'.format(','.join('{0}="{1}"'.format(k, str(v).replace('"', '\\"')) for k, v in labels))
+
+    def _load_state(self, f):
+        """
+        Merge metrics from previous runs stored in the state file.
+        """
+        try:
+            state = codec.loads(f.read() or '{}')
+        except ValueError:
+            state = {}
+        for name, labels, value in state.get('counters', []):
+            key = (name, tuple(tuple(l) for l in labels))
+            self.counters[key] = self.counters.get(key, 0) + value
+        for name, labels, value in state.get('gauges', []):
+            self.gauges.setdefault((name, tuple(tuple(l) for l in labels)), value)
+        for name, labels, buckets, total, count in state.get('histograms', []):
+            key = (name, tuple(tuple(l) for l in labels))
+            current = self.histograms.get(key, ([0] * len(LATENCY_BUCKETS), 0.0, 0))
+            self.histograms[key] = ([a + b for a, b in zip(current[0], buckets)], current[1] + total, current[2] + count)
+
+    def _dump_state(self, f):
+        """
+        Store cumulative metrics in the state file.
+        """
+        f.seek(0)
+        f.truncate()
+        f.write(codec.dumps({
+            'counters': [[k[0], k[1], v] for k, v in self.counters.items()],
+            'gauges': [[k[0], k[1], v] for k, v in self.gauges.items()],
+            'histograms': [[k[0], k[1], v[0], v[1], v[2]] for k, v in self.histograms.items()]
+        }))
+
+    def prometheus(self):
+        """
+        Render metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        types = set()
+
+        def declare(name, metric_type):
+            if not name in types:
+                lines.append('# TYPE {0}_{1} {2}'.format(self.prefix, name, metric_type))
+                types.add(name)
+
+        for (name, labels), value in sorted(self.counters.items()):
+            declare(name, 'counter')
+            lines.append('{0}_{1}{2} {3}'.format(self.prefix, name, self._labels(labels), value))
+        for (name, labels), value in sorted(self.gauges.items()):
+            declare(name, 'gauge')
+            lines.append('{0}_{1}{2} {3}'.format(self.prefix, name, self._labels(labels), value))
+        for (name, labels), (buckets, total, count) in sorted(self.histograms.items()):
+            declare(name, 'histogram')
+            for bound, bucket in zip(LATENCY_BUCKETS, buckets):
+                lines.append('{0}_{1}_bucket{2} {3}'.format(self.prefix, name, self._labels(labels, [('le', bound)]), bucket))
+            lines.append('{0}_{1}_bucket{2} {3}'.format(self.prefix, name, self._labels(labels, [('le', '+Inf')]), count))
+            lines.append('{0}_{1}_sum{2} {3}'.format(self.prefix, name, self._labels(labels), total))
+            lines.append('{0}_{1}_count{2} {3}'.format(self.prefix, name, self._labels(labels), count))
+        return '\n'.join(lines) + '\n'
+
+    def _statsd_name(self, name, labels):
+        """
+        Flatten a metric name and labels into a StatsD bucket name.
+        """
+        parts = [self.prefix, name] + [str(v) for k, v in labels]
+        return '.'.join(re.sub(r'[^a-zA-Z0-9_\-]', '_', p) for p in parts)
+
+    def statsd_lines(self):
+        """
+        Render metrics as StatsD lines.
+        """
+        lines = []
+        for (name, labels), value in self.counters.items():
+            lines.append('{0}:{1}|c'.format(self._statsd_name(name, labels), value))
+        for (name, labels), value in self.gauges.items():
+            lines.append('{0}:{1}|g'.format(self._statsd_name(name, labels), value))
+        return lines + self._timing_lines(self._timings)
+
+    def _timing_lines(self, timings):
+        """
+        Render buffered timings as StatsD lines.
+        """
+        return ['{0}:{1:.3f}|ms'.format(self._statsd_name(name, labels), value * 1000) for (name, labels), value in timings]
+
+    def _flush_prometheus(self):
+        """
+        Write cumulative metrics to a Prometheus text file.
+        """
+        state = '{0}.state'.format(self.path)
+        with open(state, 'a+') as f:
+            flock(f, LOCK_EX)
+            try:
+                f.seek(0)
+                self._load_state(f)
+                self._dump_state(f)
+
+                # Replace the text file atomically
+                with open('{0}.tmp'.format(self.path), 'w') as prom:
+                    prom.write(self.prometheus())
+                rename('{0}.tmp'.format(self.path), self.path)
+            finally:
+                flock(f, LOCK_UN)
+
+    def _send_statsd(self, lines):
+        """
+        Send StatsD lines to a local StatsD sink.
+        """
+        host, port = self.statsd.rsplit(':', 1)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            for i in range(0, len(lines), STATSD_PACKET):
+                sock.sendto(to_bytes('\n'.join(lines[i:i + STATSD_PACKET])), (host, int(port)))
+        finally:
+            sock.close()
+
+    def _flush_statsd(self):
+        """
+        Send metrics to a local StatsD sink.
+        """
+        self._send_statsd(self.statsd_lines())
+        self._timings = []
+
+    def flush(self):
+        """
+        Export collected metrics.
+        """
+        if not self.enabled: return
+        try:
+            with self._lock:
+                if self.export == 'statsd':
+                    self._flush_statsd()
+                else:
+                    self._flush_prometheus()
+        except Exception as e:
+            LENSE.LOG.error('Failed to export client metrics: {0}'.format(str(e)))
@@ -0,0 +1,98 @@
+import atexit
+from time import time
+from os import environ
+from sys import argv, stderr
+from threading import Lock
+from collections import OrderedDict
+from contextlib import contextmanager
+
+class ClientProfiler(object):
+    """
+    Class object for collecting per-phase wall-clock timings and optional
+    cProfile statistics for a client run.
+    """
+    def __init__(self):
+
+        # Phase timings / thread lock
+        self.phases    = OrderedDict()
+        self._lock     = Lock()
+
+        # Print phase breakdown / cProfile dump file
+        self.timings   = '--profile' in argv
+        self.dump      = environ.get('LENSE_CLIENT_PROFILE', None)
+
+        # Run start time / cProfile object
+        self._start    = None
+        self._cprofile = None
+
+    def start(self):
+        """
+        Start profiling the client run.
+        """
+        self._start = time()
+
+        # Collect cProfile statistics
+        if self.dump:
+            from cProfile import Profile
+            self._cprofile = Profile()
+            self._cprofile.enable()
+
+        # Report when the client exits
+        if self.timings or self.dump:
+            atexit.register(self.report)
+
+    def record(self, name, elapsed):
+        """
+        Record the elapsed time for a phase.
+
+        :param    name: The phase name
+        :type     name: str
+        :param elapsed: Elapsed time in seconds
+        :type  elapsed: float
+        """
+        with self._lock:
+            count, total = self.phases.get(name, (0, 0.0))
+            self.phases[name] = (count + 1, total + elapsed)
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Context manager for timing a named phase of the client run.
+
+        :param name: The phase name
+        :type  name: str
+        """
+        if not self.timings:
+            yield
+            return
+
+        # Time the phase
+        start = time()
+        try:
+            yield
+        finally:
+            self.record(name, time() - start)
+
+    def report(self):
+        """
+        Write the cProfile statistics and print the phase breakdown.
+        """
+
+        # Dump cProfile statistics
+        if self._cprofile:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.dump)
+            stderr.write('cProfile statistics written -> {0}\n'.format(self.dump))
+
+        # Phase breakdown
+        if self.timings:
+            total = time() - self._start if self._start else 0.0
+
+            # Phases may be nested (i.e. http inside token)
+            stderr.write('\nPhase            Calls    Seconds\n')
+            for name, (count, elapsed) in self.phases.items():
+                stderr.write('{0:<16} {1:>5} {2:>10.4f}\n'.format(name, count, elapsed))
+            stderr.write('{0:<16} {1:>5} {2:>10.4f}\n'.format('total', 1, total))
+
+# Shared profiler, created before the project is initialized
+PROFILER = ClientProfiler()
@@ -0,0 +1,177 @@
+from hashlib import sha1
+from os import listdir, rename, stat, access, W_OK
+from os.path import isdir, isfile, dirname
+
+# Lense Libraries
+from lense.client import codec
+
+class ClientModuleRegistry(object):
+    """
+    Class object for an index of installed Lense modules, validated
+    incrementally by manifest modification time.
+    """
+    def __init__(self, root):
+        """
+        :param root: The modules root directory
+        :type  root: str
+        """
+        self.root    = root
+        self.index   = '{0}.index.json'.format(root.rstrip('/'))
+
+        # Index contents / changed flag
+        self.modules = {}
+        self.mtime   = None
+        self.changed = False
+
+        # Load the index
+        self._load()
+
+    def _load(self):
+        """
+        Load the index file, rebuilding it in memory if missing or unreadable.
+        The index is only written by commands that change modules.
+        """
+        if isfile(self.index):
+            try:
+                with open(self.index, 'r') as f:
+                    index = codec.loads(f.read())
+                self.modules = index['modules']
+                self.mtime   = index['mtime']
+                return
+            except Exception as e:
+                LENSE.LOG.error('Failed to load module index, rebuilding: {0}'.format(str(e)))
+        self.rebuild()
+
+    def writable(self):
+        """
+        Check if the index file can be written by the current user.
+        """
+        if isfile(self.index) and not access(self.index, W_OK):
+            return False
+        return access(dirname(self.index) or '.', W_OK)
+
+    def save(self):
+        """
+        Write the index file if it is stale and writable, on failure the
+        in-memory index is used for the rest of the command.
+        """
+        if not self.changed or not self.writable():
+            return
+        try:
+            with open('{0}.tmp'.format(self.index), 'w') as f:
+                f.write(codec.dumps({'mtime': self.mtime, 'modules': self.modules}, indent=2))
+            rename('{0}.tmp'.format(self.index), self.index)
+            self.changed = False
+        except (IOError, OSError) as e:
+            LENSE.LOG.error('Failed to save module index: {0}'.format(str(e)))
+
+    def _manifest(self, name):
+        return '{0}/{1}/manifest.json'.format(self.root, name)
+
+    def _entry(self, name):
+        """
+        Parse a module manifest into an index entry.
+
+        :param name: The module directory name
+        :type  name: str
+        :rtype: dict
+        """
+        manifest_path = self._manifest(name)
+        with open(manifest_path, 'rb') as f:
+            contents = f.read()
+        manifest = codec.loads(contents)
+        return {
+            'name': manifest.get('name', name),
+            'version': manifest.get('version'),
+            'description': manifest.get('description'),
+            'author': manifest.get('author'),
+            'source': manifest.get('source', {}),
+            'path': '{0}/{1}'.format(self.root, name),
+            'manifest': manifest,
+            'mtime': stat(manifest_path).st_mtime,
+            'sha1': sha1(contents).hexdigest()
+        }
+
+    def rebuild(self):
+        """
+        Rebuild the index by scanning the modules root.
+        """
+        self.modules = {}
+        for name in listdir(self.root):
+            if isdir('{0}/{1}'.format(self.root, name)):
+                self.update(name)
+        self.mtime   = stat(self.root).st_mtime
+        self.changed = True
+
+    def update(self, name):
+        """
+        Add or refresh a module in the index.
+
+        :param name: The module name
+        :type  name: str
+        """
+        try:
+            self.modules[name] = self._entry(name)
+            self.changed       = True
+        except Exception as e:
+            LENSE.LOG.exception('Failed to load module "{0}" manifest: {1}'.format(name, str(e)))
+            self.modules.pop(name, None)
+            self.changed       = True
+            return False
+        return True
+
+    def remove(self, name):
+        """
+        Remove a module from the index.
+
+        :param name: The module name
+        :type  name: str
+        """
+        if self.modules.pop(name, None):
+            self.changed = True
+
+    def validate(self, name):
+        """
+        Refresh a module entry if its manifest has changed since indexing.
+
+        :param name: The module name
+        :type  name: str
+        :rtype: bool
+        """
+        manifest_path = self._manifest(name)
+        if not isfile(manifest_path):
+            self.remove(name)
+            return False
+        if not name in self.modules or not self.modules[name]['mtime'] == stat(manifest_path).st_mtime:
+            return self.update(name)
+        return True
+
+    def get(self, name):
+        """
+        Retrieve a validated module manifest.
+
+        :param name: The module name
+        :type  name: str
+        :rtype: dict or None
+        """
+        found = self.validate(name)
+        return self.modules[name]['manifest'] if found else None
+
+    def all(self):
+        """
+        Return manifests for all installed modules, picking up modules added
+        or removed outside of the client when the modules root has changed.
+        """
+        root_mtime = stat(self.root).st_mtime
+        if not root_mtime == self.mtime:
+            names = [n for n in listdir(self.root) if isdir('{0}/{1}'.format(self.root, n))]
+            for name in set(self.modules.keys()) - set(names):
+                self.remove(name)
+            for name in names:
+                self.validate(name)
+            self.mtime   = root_mtime
+            self.changed = True
+        else:
+            for name in list(self.modules.keys()):
+                self.validate(name)
+        return [self.modules[name]['manifest'] for name in sorted(self.modules.keys())]
@@ -1,10 +1,18 @@
-import json
 import requests
+from requests.adapters import HTTPAdapter
+from copy import deepcopy
+from time import time, sleep
 from os.path import isfile
-from exceptions import ValueError
 
 # Lense Libraries
+from lense.client import codec
 from lense.client import TOKEN_CACHE
+from lense.client.compat import string_types
+from lense.client.profiler import PROFILER
+from lense.client.retry import ClientRetryPolicy
+from lense.client.timeouts import ClientTimeouts
+from lense.client.endpoints import ClientEndpoints
+from lense.client.cache import ClientResponseCache
 from lense.common.http import HEADER, MIME_TYPE, PATH, HTTP_GET, HTTP_POST, HTTP_PUT
 
 class ClientREST(object):
@@ -18,18 +26,29 @@ class ClientREST(object):
         LENSE.CONF.engine.port
     )
     
-    def __init__(self, user, group, key, endpoint=None):
+    # Configured engine endpoints / pooled HTTP session
+    _endpoints = None
+    _session   = None
+    
+    def __init__(self, user, group, key, endpoint=None, retry=None, timeouts=None):
         
         # API user / group / key / token
         self.user     = user
         self.group    = group
         self.key      = key
         
-        # Endpoint override
+        # Retry policy / timeouts / response cache
+        self.retry    = retry or ClientRetryPolicy.from_conf()
+        self.timeouts = timeouts or ClientTimeouts.from_conf()
+        self.cache    = ClientResponseCache()
+        
+        # Engine endpoints / endpoint override
+        self.endpoints = self._get_endpoints()
         self._set_endpoint(endpoint)
         
         # API user token
-        self.token    = self._get_token()
+        with PROFILER.phase('token'):
+            self.token = self._get_token()
         
     def _set_endpoint(self, endpoint):
         """
@@ -47,7 +66,45 @@ class ClientREST(object):
                 return LENSE.LOG.error('Failed to override endpoint, missing required key: {0}'.format(k))
         
         # Set the new endpoint
-        self.endpoint = '{0}://{1}:{2}'.format(endpoint['proto'], endpoint['host'], endpoint['port'])
+        self.endpoint  = '{0}://{1}:{2}'.format(endpoint['proto'], endpoint['host'], endpoint['port'])
+        self.endpoints = ClientEndpoints.from_hosts([self.endpoint])
+        
+    def _get_endpoints(self):
+        """
+        Get the engine endpoints from the --host argument (a comma separated
+        list of hosts) or from the client configuration.
+        """
+        hosts = LENSE.CLIENT.ARGS.get('host')
+        if not hosts:
+            return ClientREST.pool()
+        
+        # Endpoints from the command line
+        endpoints     = ClientEndpoints.from_hosts(hosts)
+        self.endpoint = endpoints.primary
+        return endpoints
+    
+    @classmethod
+    def session(cls):
+        """
+        Return the pooled HTTP session shared by all clients and threads.
+        """
+        if cls._session is None:
+            size    = int(LENSE.CLIENT.conf('concurrency', 'max', 32))
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            cls._session = session
+        return cls._session
+    
+    @classmethod
+    def pool(cls):
+        """
+        Return the configured engine endpoints shared by all clients.
+        """
+        if cls._endpoints is None:
+            cls._endpoints = ClientEndpoints.from_conf()
+        return cls._endpoints
         
     def _get_token(self):
         """
@@ -58,20 +115,23 @@ class ClientREST(object):
         cache = {}
         if isfile(TOKEN_CACHE):
             with open(TOKEN_CACHE, 'r') as f:
-                cache = json.loads(f.read())
+                cache = codec.loads(f.read())
                 
                 # Get the user's token
                 if self.user in cache:
+                    LENSE.CLIENT.METRICS.cache('token', True)
                     return cache[self.user]
+        LENSE.CLIENT.METRICS.cache('token', False)
                 
         # Request a token
         if self.user and self.group and self.key:
             token = self.request(PATH.GET_TOKEN, HTTP_GET, data=None, extract='token')
+            LENSE.CLIENT.METRICS.incr('token_refresh_total')
             
             # Cache the token
             with open(TOKEN_CACHE, 'w') as f:
                 cache[self.user] = token
-                f.write(json.dumps(cache))
+                f.write(codec.dumps(cache))
         
     def headers(self):
         """
@@ -86,34 +146,55 @@ class ClientREST(object):
             HEADER.API_KEY: self.key
         }
         
-    def request(self, path, method, data, extract=False, ensure=True):
+    def request(self, path, method, data, extract=False, ensure=True, retry=None, support=None, timeouts=None):
         """
         Make a request to the API endpoint.
         
-        :param   path: The request path
-        :type    path: str
-        :param method: The request method
-        :type  method: str
-        :param   data: Optional request data
-        :type    data: dict
+        :param    path: The request path
+        :type     path: str
+        :param  method: The request method
+        :type   method: str
+        :param    data: Optional request data
+        :type     data: dict
+        :param   retry: Retry policy overriding the client policy
+        :type    retry: ClientRetryPolicy
+        :param support: The support cache entry for the request handler
+        :type  support: dict
+        :param timeouts: Timeouts overriding the client timeouts
+        :type  timeouts: ClientTimeouts
         """
-        method_handler = getattr(requests, method.lower())
-        request_url    = '{0}/{1}'.format(self.endpoint, path)
+        params    = self.request_params(method, data, support)
+        
+        # Cached read-only response
+        cache_key = self._cache_key(path, method, params, extract)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached:
+                LENSE.LOG.info('Request cached: path={0}, method={1}, user={2}, group={3}'.format(path, method, self.user, self.group))
+                return LENSE.CLIENT.response(cached['content'], cached['code'])
         
         # Make the request
-        response = method_handler(request_url, **self.request_params(method, data))
+        response, content = self._fetch(path, method, retry or self.retry, timeouts or self.timeouts, params, not extract)
+        
+        # Writes invalidate cached responses for the resource
+        if method.upper() != HTTP_GET:
+            self.cache.invalidate(path)
         
         # Make sure the response is OK
         if ensure:
             LENSE.CLIENT.ensure_request(response.status_code,
                 value = 200,
-                error = ClientREST.get_error(response),
-                debug = 'Request OK: path={0}, method={1}, user={2}, group={3}'.format(path, method, self.user, self.group),
+                error = ClientREST.get_error(response, response.retries),
+                debug = 'Request OK: path={0}, method={1}, user={2}, group={3}, retries={4}'.format(path, method, self.user, self.group, response.retries),
                 code  = response.status_code)
             
         # Return directly to the caller
         else:
-            return LENSE.CLIENT.response(ClientREST.get_data(response), response.status_code) 
+            if not response.status_code == 200:
+                content = ClientREST.get_data(response)
+            elif cache_key:
+                self.cache.set(cache_key, path, response.status_code, content)
+            return LENSE.CLIENT.response(content, response.status_code, response.retries) 
         
         # If extracting and returning a data key
         if extract:
@@ -123,11 +204,48 @@ class ClientREST(object):
                 code  = 500)
             
         # Return response data
-        return LENSE.CLIENT.response(ClientREST.get_data(response), response.status_code)
+        if cache_key:
+            self.cache.set(cache_key, path, response.status_code, content)
+        return LENSE.CLIENT.response(content, response.status_code, response.retries)
     
-    def request_params(self, method, data):
+    def _fetch(self, path, method, retry, timeouts, params, coalesce=True):
+        """
+        Send a request and decode a successful response. Identical concurrent
+        GET requests share one network call and each caller receives its own
+        copy of the decoded data.
+        
+        :rtype: tuple of (response, data), data is None on failure
+        """
+        def fetch():
+            response = ClientREST.send(self.endpoints, path, method, retry, timeouts, **params)
+            return (response, ClientREST.get_data(response) if response.status_code == 200 else None)
+        
+        # Only coalesce read-only requests
+        if not coalesce or method.upper() != HTTP_GET:
+            return fetch()
+        
+        # Requests are identical for the same endpoint, path, parameters and identity
+        key = (self.endpoints.primary, path, codec.dumps(params.get('params'), sort_keys=True), self.user, self.group)
+        return LENSE.CLIENT.COALESCER.do(key, fetch, copy=lambda r: (r[0], deepcopy(r[1])))
+    
+    def _cache_key(self, path, method, params, extract):
+        """
+        Return the response cache key for a cacheable request, or None.
+        """
+        if not self.cache.enabled or extract or method.upper() != HTTP_GET:
+            return None
+        return self.cache.key(self.endpoints.primary, path, params.get('params'), self.user, self.group)
+    
+    def request_params(self, method, data, support=None):
         """
         Construct request parameters to pass to Python requests module.
+        
+        :param  method: The request method
+        :type   method: str
+        :param    data: Optional request data
+        :type     data: str
+        :param support: The support cache entry for the request handler
+        :type  support: dict
         """
         
         # Data key / data
@@ -149,33 +267,253 @@ class ClientREST(object):
                 params[data_key] = {}
             params[data_key]['count'] = count
     
+        # Server side field selection / filtering
+        passthrough = ClientREST.passthrough(support)
+        if passthrough:
+            if not 'params' in params:
+                params['params'] = {}
+            params['params'].update(passthrough)
+    
         # Return request parameters
         return params
     
+    @classmethod
+    def passthrough(cls, support):
+        """
+        Return the field selection and filter arguments that the request
+        handler advertises support for in its support cache entry, to be
+        applied by the engine instead of the client.
+        
+        :param support: The support cache entry for the request handler
+        :type  support: dict
+        :rtype: dict
+        """
+        advertised = (support or {}).get('supports') or []
+        passthrough = {}
+        for key, value in [
+            ('fields', LENSE.CLIENT.ARGS.get('fields') or LENSE.CLIENT.ARGS.get('select')),
+            ('filter', LENSE.CLIENT.ARGS.get('filter'))]:
+            if value and key in advertised:
+                passthrough[key] = value
+        return passthrough
+    
     @classmethod
     def load_data(cls, data_key, data_obj):
         """
         Load data argument into a JSON structure.
         """
-        return json.loads(data_obj) if data_key == 'params' else data_obj
+        return codec.loads(data_obj) if data_key == 'params' else data_obj
     
     @classmethod
-    def get_error(cls, response):
+    def send(cls, endpoints, path, method, retry, timeouts=None, **kwargs):
+        """
+        Send a request to an engine endpoint, retrying transient failures of
+        idempotent requests according to the retry policy and failing over
+        to other endpoints when available. Every attempt is bounded by the
+        connect / read timeouts and all attempts by the overall deadline.
+        
+        :param endpoints: The engine endpoints
+        :type  endpoints: ClientEndpoints
+        :param     path: The request path
+        :type      path: str
+        :param   method: The request method
+        :type    method: str
+        :param    retry: The retry policy
+        :type     retry: ClientRetryPolicy
+        :param timeouts: The request timeouts
+        :type  timeouts: ClientTimeouts
+        :param   kwargs: Parameters for the Python requests module
+        :type    kwargs: dict
+        :rtype: object
+        """
+        attempt  = 0
+        tried    = []
+        timeouts = timeouts or ClientTimeouts.from_conf()
+        expires  = timeouts.expires()
+        
+        while True:
+            attempt += 1
+            
+            # Make sure the deadline has not passed
+            remaining = timeouts.remaining(expires)
+            LENSE.CLIENT.ensure_request(remaining is None or remaining > 0,
+                value = True,
+                error = 'Request deadline of {0}s exceeded: path={1}, method={2}, attempts={3}'.format(timeouts.deadline, path, method, attempt - 1),
+                code  = 504)
+            kwargs['timeout'] = timeouts.timeout(expires)
+            
+            # Select an endpoint not yet tried for this request
+            endpoint = endpoints.select(tried)
+            tried.append(endpoint)
+            
+            # Make the request, hedging read-only requests
+            try:
+                if cls.hedged(endpoints, method):
+                    response = LENSE.CLIENT.HEDGE.race(
+                        lambda: cls.call(endpoints, endpoint, path, method, stream=True, **kwargs),
+                        lambda: cls.call(endpoints, endpoints.select(tried), path, method, stream=True, **kwargs))
+                else:
+                    response = cls.call(endpoints, endpoint, path, method, **kwargs)
+            
+            # Connection failed
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not retry.retry(method, attempt, error=e):
+                    
+                    # Timed out, fail with a request error
+                    if isinstance(e, requests.Timeout):
+                        LENSE.CLIENT.ensure_request(False,
+                            value = True,
+                            error = 'Request timed out: endpoint={0}, path={1}, method={2}, attempts={3}, timeout={4}'.format(endpoint.url, path, method, attempt, kwargs['timeout']),
+                            code  = 504)
+                    raise
+                reason = type(e).__name__
+                
+                # Fail over to an untried endpoint immediately
+                wait   = 0 if len(tried) < len(endpoints) else retry.delay(attempt)
+            
+            # Response received
+            else:
+                if not retry.retry(method, attempt, response=response):
+                    if response.status_code < 400:
+                        retry.success()
+                    response.retries = attempt - 1
+                    return response
+                reason = str(response.status_code)
+                wait   = retry.delay(attempt, response)
+                response.close()
+            
+            # Wait before retrying, failing now if the wait would pass the deadline
+            remaining = timeouts.remaining(expires)
+            LENSE.CLIENT.ensure_request(remaining is None or wait < remaining,
+                value = True,
+                error = 'Request deadline of {0}s would be exceeded waiting {1:.3f}s to retry: path={2}, method={3}, reason={4}, attempts={5}'.format(timeouts.deadline, wait, path, method, reason, attempt),
+                code  = 504)
+            LENSE.LOG.info('Retrying request: endpoint={0}, path={1}, method={2}, reason={3}, attempt={4}, wait={5:.3f}'.format(endpoint.url, path, method, reason, attempt, wait))
+            LENSE.CLIENT.METRICS.incr('retries_total', {'path': path, 'method': method.upper(), 'reason': reason})
+            sleep(wait)
+    
+    @classmethod
+    def hedged(cls, endpoints, method):
+        """
+        Check if a request may be hedged.
+        """
+        return LENSE.CLIENT.HEDGE.enabled and method.upper() == HTTP_GET and len(endpoints) > 1
+    
+    @classmethod
+    def call(cls, endpoints, endpoint, path, method, **kwargs):
+        """
+        Make a request attempt against a selected endpoint and update the
+        endpoint health.
+        
+        :param endpoints: The engine endpoints
+        :type  endpoints: ClientEndpoints
+        :param  endpoint: The selected endpoint
+        :type   endpoint: ClientEndpoint
+        :rtype: object
+        """
+        start   = time()
+        latency = None
+        healthy = True
+        try:
+            response = cls.attempt(endpoint.url, path, method, **kwargs)
+            latency  = response.elapsed.total_seconds()
+            healthy  = response.status_code < 500
+        except (requests.ConnectionError, requests.Timeout):
+            healthy  = False
+            raise
+        
+        # Always release the endpoint, only server and connection failures count against it
+        finally:
+            endpoints.finish(endpoint, time() - start if latency is None else latency, healthy)
+        
+        # Read-only latency
+        if method.upper() == HTTP_GET and response.status_code == 200:
+            LENSE.CLIENT.HEDGE.observe(latency)
+        return response
+    
+    @classmethod
+    def attempt(cls, endpoint, path, method, **kwargs):
+        """
+        Make a single request attempt against an endpoint.
+        
+        :param endpoint: The endpoint URL
+        :type  endpoint: str
+        :param     path: The request path
+        :type      path: str
+        :param   method: The request method
+        :type    method: str
+        :param   kwargs: Parameters for the Python requests module
+        :type    kwargs: dict
+        :rtype: object
+        """
+        method_handler = getattr(cls.session(), method.lower())
+        request_url    = '{0}/{1}'.format(endpoint, path)
+        
+        # Wait for the throttle and make the request
+        with LENSE.CLIENT.THROTTLE.slot(endpoint, path):
+            with PROFILER.phase('http'):
+                start = time()
+                try:
+                    response = method_handler(request_url, **kwargs)
+                    
+                # Connection failures count as overload
+                except (requests.ConnectionError, requests.Timeout):
+                    LENSE.CLIENT.CONCURRENCY.sample(time() - start, None, (endpoint, method.upper(), path))
+                    LENSE.CLIENT.JOURNAL.write(endpoint, path, method, None, time() - start)
+                    raise
+                latency = time() - start
+        
+        # Record metrics / adjust the concurrency limit
+        cls.record(path, method, response, latency, endpoint, kwargs.get('stream', False))
+        LENSE.CLIENT.CONCURRENCY.sample(latency, response.status_code, (endpoint, method.upper(), path))
+        return response
+    
+    @classmethod
+    def record(cls, path, method, response, latency, endpoint=None, streamed=False):
+        """
+        Record client metrics and a journal entry for a completed request.
+        
+        :param     path: The request path
+        :type      path: str
+        :param   method: The request method
+        :type    method: str
+        :param response: The Python requests response object
+        :type  response: object
+        :param  latency: The request latency in seconds
+        :type   latency: float
+        :param endpoint: The endpoint URL
+        :type  endpoint: str
+        :param streamed: The body is not read yet, use the Content-Length header
+        :type  streamed: bool
+        """
+        body     = getattr(response.request, 'body', None)
+        sent     = len(body) if isinstance(body, string_types + (bytes,)) else 0
+        received = int(response.headers.get('Content-Length') or 0) if streamed else len(response.content)
+        LENSE.CLIENT.METRICS.request(path, method, response.status_code, latency,
+            sent     = sent,
+            received = received)
+        LENSE.CLIENT.JOURNAL.write(endpoint, path, method, response.status_code, latency, received, sent)
+    
+    @classmethod
+    def get_error(cls, response, retries=0):
         """
         Extract error message from an HTTP response.
         
         :param response: The Python requests response object
         :type  response: object
+        :param  retries: Number of retries made before the response
+        :type   retries: int
         """
+        suffix = ' (after {0} retries)'.format(retries) if retries else ''
         try:
-            response_json = response.json()
+            response_json = codec.loads(response.content)
             
             # Return the error message
             return LENSE.CLIENT.ensure(response_json.get('error', False),
                 error = 'Could not find error message in HTTP response',
-                code  = 500)
+                code  = 500) + suffix
         except ValueError as e:
-            return 'Internal server error. Please check Apache logs on the API server'
+            return 'Internal server error. Please check Apache logs on the API server' + suffix
         
     @classmethod
     def get_data(cls, response, key=None, default=None):
@@ -187,7 +525,7 @@ class ClientREST(object):
         :param      key: Extract a key from data
         :type       key: str
         """
-        response_json = response.json()
+        response_json = codec.loads(response.content)
         
         # If the data key is present
         if 'data' in response_json:
@@ -202,15 +540,16 @@ class ClientREST(object):
         return {}
     
     @classmethod
-    def request_anonymous(cls, path, method, data={}, extract=False):
+    def request_anonymous(cls, path, method, data={}, extract=False, timeouts=None):
         """
         Make an anonymous request to the API server.
+        
+        :param timeouts: Timeouts overriding the configured timeouts
+        :type  timeouts: ClientTimeouts
         """
-        method_handler = getattr(requests, method.lower())
-        request_url    = '{0}/{1}'.format(cls.endpoint, path)
         
         # Make the request
-        response = method_handler(request_url, headers={
+        response = cls.send(cls.pool(), path, method, ClientRetryPolicy.from_conf(), timeouts, headers={
             HEADER.CONTENT_TYPE: MIME_TYPE.APPLICATION.JSON,
             HEADER.ACCEPT: MIME_TYPE.TEXT.PLAIN
         }, params=data)
@@ -218,7 +557,7 @@ class ClientREST(object):
         # Make sure the response is OK
         LENSE.CLIENT.ensure_request(response.status_code,
             value = 200,
-            error = 'Request failed: HTTP {0}: {1}'.format(response.status_code, cls.get_error(response)),
+            error = 'Request failed: HTTP {0}: {1}'.format(response.status_code, cls.get_error(response, response.retries)),
             debug = 'Request OK: path={0}, method={1}, user=anonymous, group=anonymous'.format(path, method),
             code  = response.status_code)
         
@@ -230,11 +569,11 @@ class ClientREST(object):
                 code  = 500)
             
         # Return response data
-        return LENSE.CLIENT.response(cls.get_data(response), response.status_code)
+        return LENSE.CLIENT.response(cls.get_data(response), response.status_code, response.retries)
     
     @classmethod
-    def construct(cls, user, group, key, endpoint=None):
+    def construct(cls, user, group, key, endpoint=None, retry=None, timeouts=None):
         """
         Class method for constructing the client REST interface.
         """
-        LENSE.CLIENT.REST = cls(user, group, key, endpoint)
\ No newline at end of file
+        LENSE.CLIENT.REST = cls(user, group, key, endpoint, retry, timeouts)
\ No newline at end of file
@@ -0,0 +1,149 @@
+from time import time
+from random import uniform
+from threading import Lock
+from email.utils import parsedate_tz, mktime_tz
+
+class ClientRetryPolicy(object):
+    """
+    Class object for deciding if and when a failed API request is retried,
+    using exponential backoff with full jitter and a process wide retry
+    budget refilled by successful requests.
+    """
+
+    # Retry tokens shared by all policies in this process
+    _tokens   = None
+    _lock     = Lock()
+
+    # Default idempotent methods / retryable status codes
+    METHODS   = ['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE']
+    CODES     = [429, 502, 503, 504]
+
+    def __init__(self, attempts=3, backoff=0.1, max_backoff=5.0, max_retry_after=60.0, budget=50, refill=0.1, methods=None, codes=None):
+        """
+        :param        attempts: Maximum attempts per request, including the first
+        :type         attempts: int
+        :param         backoff: Base backoff in seconds
+        :type          backoff: float
+        :param     max_backoff: Maximum backoff in seconds
+        :type      max_backoff: float
+        :param max_retry_after: Longest Retry-After in seconds to wait for, longer responses are returned
+        :type  max_retry_after: float
+        :param          budget: Maximum retry tokens for all requests in this process
+        :type           budget: int
+        :param          refill: Retry tokens earned by each successful request
+        :type           refill: float
+        :param         methods: Idempotent methods that may be retried
+        :type          methods: list
+        :param           codes: Response codes that may be retried
+        :type            codes: list
+        """
+        self.attempts        = int(attempts)
+        self.backoff         = float(backoff)
+        self.max_backoff     = float(max_backoff)
+        self.max_retry_after = float(max_retry_after)
+        self.budget          = int(budget)
+        self.refill          = float(refill)
+        self.methods         = [m.upper() for m in (methods or self.METHODS)]
+        self.codes           = [int(c) for c in (codes or self.CODES)]
+
+    def _take_budget(self):
+        """
+        Consume one token from the process wide retry budget.
+        """
+        with ClientRetryPolicy._lock:
+            if ClientRetryPolicy._tokens is None:
+                ClientRetryPolicy._tokens = float(self.budget)
+            if ClientRetryPolicy._tokens < 1:
+                return False
+            ClientRetryPolicy._tokens -= 1
+            return True
+
+    def success(self):
+        """
+        Refill the retry budget after a successful request.
+        """
+        with ClientRetryPolicy._lock:
+            tokens = self.budget if ClientRetryPolicy._tokens is None else ClientRetryPolicy._tokens
+            ClientRetryPolicy._tokens = min(float(self.budget), tokens + self.refill)
+
+    def retry(self, method, attempt, response=None, error=None):
+        """
+        Check if a request should be retried.
+
+        :param   method: The request method
+        :type    method: str
+        :param  attempt: The attempt that just finished (starting at 1)
+        :type   attempt: int
+        :param response: The Python requests response object
+        :type  response: object
+        :param    error: A connection error raised by the attempt
+        :type     error: Exception
+        :rtype: bool
+        """
+        if attempt >= self.attempts:
+            return False
+        if not method.upper() in self.methods:
+            return False
+        if response is not None and not response.status_code in self.codes:
+            return False
+        if response is None and error is None:
+            return False
+
+        # The server asked for a longer wait than allowed, return its response
+        retry_after = self.retry_after(response)
+        if retry_after is not None and retry_after > self.max_retry_after:
+            LENSE.LOG.info('Retry-After of {0}s exceeds {1}s, not retrying'.format(retry_after, self.max_retry_after))
+            return False
+        if not self._take_budget():
+            LENSE.LOG.info('Retry budget of {0} exhausted, not retrying'.format(self.budget))
+            return False
+        return True
+
+    def retry_after(self, response):
+        """
+        Extract the delay from a Retry-After header in seconds.
+        """
+        value = response.headers.get('Retry-After', None) if response is not None else None
+        if not value:
+            return None
+
+        # Delay in seconds
+        if value.strip().isdigit():
+            return float(value)
+
+        # HTTP date
+        parsed = parsedate_tz(value)
+        return max(0.0, mktime_tz(parsed) - time()) if parsed else None
+
+    def delay(self, attempt, response=None):
+        """
+        Return the delay in seconds before the next attempt, a Retry-After
+        header is honoured even when longer than the maximum backoff (but
+        never longer than the maximum Retry-After, see retry()).
+
+        :param  attempt: The attempt that just finished (starting at 1)
+        :type   attempt: int
+        :param response: The Python requests response object
+        :type  response: object
+        :rtype: float
+        """
+        retry_after = self.retry_after(response)
+        if retry_after is not None:
+            return retry_after
+        return uniform(0, min(self.max_backoff, self.backoff * (2 ** (attempt - 1))))
+
+    @classmethod
+    def from_conf(cls, overrides=None):
+        """
+        Construct a retry policy from the "retry" block in client.conf with
+        optional overrides (i.e. a "retry" block in a test manifest).
+
+        :param overrides: Retry attributes overriding the configuration
+        :type  overrides: dict
+        """
+        attrs = {}
+        for k in ['attempts', 'backoff', 'max_backoff', 'max_retry_after', 'budget', 'refill', 'methods', 'codes']:
+            value = LENSE.CLIENT.confget(overrides, k, LENSE.CLIENT.conf('retry', k))
+            if value is not None:
+                attrs[k] = value
+        return cls(**attrs)
@@ -0,0 +1,241 @@
+import re
+from time import time, sleep
+from os import makedirs
+from os.path import isdir
+from contextlib import contextmanager
+from threading import Lock, BoundedSemaphore
+from fcntl import flock, LOCK_EX, LOCK_NB, LOCK_UN
+
+# Lense Libraries
+from lense.client.compat import urlparse
+from lense.client import codec
+from lense.client import CLIENT_HOME
+
+# Shared limiter state for multiple processes
+THROTTLE_HOME = '{0}/throttle'.format(CLIENT_HOME)
+
+class TokenBucket(object):
+    """
+    Token bucket rate limiter shared by all threads in the process.
+    """
+    def __init__(self, rate, burst):
+        """
+        :param  rate: Tokens added per second
+        :type   rate: float
+        :param burst: Maximum number of tokens
+        :type  burst: float
+        """
+        self.rate   = float(rate)
+        self.burst  = float(max(burst, 1))
+        self.tokens = self.burst
+        self.stamp  = time()
+        self._lock  = Lock()
+
+    def _take(self, tokens, stamp):
+        """
+        Refill and try to take a token, returning the new state and the
+        time to wait if no token is available.
+        """
+        now    = time()
+        tokens = min(self.burst, tokens + (now - stamp) * self.rate)
+        if tokens >= 1:
+            return tokens - 1, now, 0
+        return tokens, now, (1 - tokens) / self.rate
+
+    def acquire(self):
+        """
+        Block until a token is available.
+        """
+        while True:
+            with self._lock:
+                self.tokens, self.stamp, wait = self._take(self.tokens, self.stamp)
+            if not wait:
+                return
+            sleep(wait)
+
+class FileTokenBucket(TokenBucket):
+    """
+    Token bucket rate limiter shared by multiple processes through a
+    locked state file.
+    """
+    def __init__(self, rate, burst, path):
+        super(FileTokenBucket, self).__init__(rate, burst)
+        self.path = path
+
+    def acquire(self):
+        """
+        Block until a token is available.
+        """
+        while True:
+            with open(self.path, 'a+') as f:
+                flock(f, LOCK_EX)
+                try:
+                    f.seek(0)
+                    try:
+                        state = codec.loads(f.read() or '{}')
+                    except ValueError:
+                        state = {}
+                    tokens, stamp, wait = self._take(state.get('tokens', self.burst), state.get('stamp', time()))
+                    f.seek(0)
+                    f.truncate()
+                    f.write(codec.dumps({'tokens': tokens, 'stamp': stamp}))
+                finally:
+                    flock(f, LOCK_UN)
+            if not wait:
+                return
+            sleep(wait)
+
+class InFlightGovernor(object):
+    """
+    Limit the number of requests in flight for all threads in the process.
+    """
+    def __init__(self, limit):
+        """
+        :param limit: Maximum requests in flight
+        :type  limit: int
+        """
+        self.limit      = int(limit)
+        self._semaphore = BoundedSemaphore(self.limit)
+
+    def acquire(self):
+        self._semaphore.acquire()
+
+    def release(self):
+        self._semaphore.release()
+
+class FileInFlightGovernor(InFlightGovernor):
+    """
+    Limit the number of requests in flight for multiple processes by locking
+    one of a fixed number of slot files.
+    """
+    def __init__(self, limit, path):
+        super(FileInFlightGovernor, self).__init__(limit)
+        self.path  = path
+        self._held = {}
+        self._lock = Lock()
+
+    def acquire(self):
+        """
+        Block until a slot file is locked.
+        """
+        super(FileInFlightGovernor, self).acquire()
+        while True:
+            for slot in range(self.limit):
+                with self._lock:
+                    if slot in self._held:
+                        continue
+                    f = open('{0}.{1}'.format(self.path, slot), 'a')
+                    try:
+                        flock(f, LOCK_EX | LOCK_NB)
+                    except IOError:
+                        f.close()
+                        continue
+                    self._held[slot] = f
+                    return
+            sleep(0.01)
+
+    def release(self):
+        """
+        Release a slot file held by this process.
+        """
+        with self._lock:
+            slot, f = self._held.popitem()
+        flock(f, LOCK_UN)
+        f.close()
+        super(FileInFlightGovernor, self).release()
+
+class ClientThrottle(object):
+    """
+    Class object for rate limiting and bounding in flight API requests per
+    endpoint and per API path.
+    """
+    def __init__(self):
+
+        # Limiters by endpoint / path key
+        self._limiters = {}
+        self._lock     = Lock()
+
+        # Share limits with other client processes
+        self.shared    = LENSE.CLIENT.conf('throttle', 'shared', False, boolean=True)
+        if self.shared and not isdir(THROTTLE_HOME):
+            makedirs(THROTTLE_HOME)
+
+    def _settings(self, endpoint, path):
+        """
+        Return the rate / burst / in flight settings for an endpoint or path.
+        """
+        if path is None:
+            block = LENSE.CLIENT.confget(LENSE.CLIENT.conf('throttle', 'endpoints'), endpoint)
+            defaults = {
+                'rate': LENSE.CLIENT.conf('throttle', 'rate', 0),
+                'burst': LENSE.CLIENT.conf('throttle', 'burst', 10),
+                'max_in_flight': LENSE.CLIENT.conf('throttle', 'max_in_flight', 0)
+            }
+        else:
+            block = LENSE.CLIENT.confget(LENSE.CLIENT.conf('throttle', 'paths'), path)
+            defaults = {'rate': 0, 'burst': 10, 'max_in_flight': 0}
+        return dict((k, LENSE.CLIENT.confget(block, k, v)) for k, v in defaults.items())
+
+    def _build(self, key, settings):
+        """
+        Construct the rate limiter and in flight governor for a key.
+        """
+        name     = '{0}/{1}'.format(THROTTLE_HOME, re.sub(r'[^a-zA-Z0-9_\-\.]', '_', key))
+        bucket   = None
+        governor = None
+        if settings['rate']:
+            if self.shared:
+                bucket = FileTokenBucket(settings['rate'], settings['burst'], '{0}.bucket'.format(name))
+            else:
+                bucket = TokenBucket(settings['rate'], settings['burst'])
+        if settings['max_in_flight']:
+            if self.shared:
+                governor = FileInFlightGovernor(settings['max_in_flight'], '{0}.slot'.format(name))
+            else:
+                governor = InFlightGovernor(settings['max_in_flight'])
+        return (bucket, governor)
+
+    def limiters(self, endpoint, path):
+        """
+        Return the limiters that apply to a request.
+
+        :param endpoint: The endpoint URL
+        :type  endpoint: str
+        :param     path: The request path
+        :type      path: str
+        :rtype: list
+        """
+        netloc = urlparse(endpoint).netloc
+        keys   = [(netloc, None), (netloc, path)]
+        with self._lock:
+            for key in keys:
+                if not key in self._limiters:
+                    self._limiters[key] = self._build(
+                        '{0}:{1}'.format(*key) if key[1] else key[0],
+                        self._settings(key[0], key[1])
+                    )
+            return [self._limiters[key] for key in keys]
+
+    @contextmanager
+    def slot(self, endpoint, path):
+        """
+        Context manager for waiting on the rate limiters and holding an in
+        flight slot for the duration of a request.
+
+        :param endpoint: The endpoint URL
+        :type  endpoint: str
+        :param     path: The request path
+        :type      path: str
+        """
+        held = []
+        try:
+            for bucket, governor in self.limiters(endpoint, path):
+                if governor:
+                    governor.acquire()
+                    held.append(governor)
+                if bucket:
+                    bucket.acquire()
+            yield
+        finally:
+            for governor in reversed(held):
+                governor.release()
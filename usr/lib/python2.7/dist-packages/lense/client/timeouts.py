@@ -0,0 +1,78 @@
+from time import time
+
+class ClientTimeouts(object):
+    """
+    Class object for per-attempt connect / read timeouts and an overall
+    deadline covering every attempt, retry backoff and failover of a request.
+    """
+    def __init__(self, connect=5.0, read=30.0, deadline=0):
+        """
+        :param  connect: Seconds to wait for a connection
+        :type   connect: float
+        :param     read: Seconds to wait between bytes of the response
+        :type      read: float
+        :param deadline: Total seconds for the request, 0 for no deadline
+        :type  deadline: float
+        """
+        self.connect  = float(connect)
+        self.read     = float(read)
+        self.deadline = float(deadline or 0)
+
+    def expires(self):
+        """
+        Return the absolute expiry time of a request starting now, or None.
+        """
+        return time() + self.deadline if self.deadline else None
+
+    def remaining(self, expires):
+        """
+        Return the seconds left before a request expires, or None.
+
+        :param expires: The request expiry time
+        :type  expires: float
+        """
+        return None if expires is None else expires - time()
+
+    def timeout(self, expires=None):
+        """
+        Return a (connect, read) timeout for the Python requests module,
+        capped by the time left before the request expires.
+
+        :param expires: The request expiry time
+        :type  expires: float
+        :rtype: tuple
+        """
+        remaining = self.remaining(expires)
+        if remaining is None:
+            return (self.connect, self.read)
+        return (min(self.connect, remaining), min(self.read, remaining))
+
+    @classmethod
+    def from_conf(cls, overrides=None):
+        """
+        Construct timeouts from the "timeouts" block in client.conf, the
+        --timeout argument (an overall deadline in seconds) and optional
+        overrides (i.e. a "timeout" block in a test manifest). A number in
+        place of an overrides block sets the deadline.
+
+        :param overrides: Timeout attributes overriding the configuration
+        :type  overrides: dict
+        """
+        if isinstance(overrides, (int, float)):
+            overrides = {'deadline': overrides}
+        attrs = {}
+        for k in ['connect', 'read', 'deadline']:
+            value = LENSE.CLIENT.conf('timeouts', k)
+            if value is not None:
+                attrs[k] = value
+
+        # Deadline from the command line
+        if hasattr(LENSE.CLIENT.ARGS, 'container') and LENSE.CLIENT.ARGS.get('timeout'):
+            attrs['deadline'] = LENSE.CLIENT.ARGS.get('timeout')
+
+        # Overrides take precedence
+        for k in ['connect', 'read', 'deadline']:
+            value = LENSE.CLIENT.confget(overrides, k)
+            if value is not None:
+                attrs[k] = value
+        return cls(**attrs)
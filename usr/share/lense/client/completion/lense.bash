@@ -0,0 +1,10 @@
+# Bash completion for the Lense client
+#
+# source /usr/share/lense/client/completion/lense.bash
+
+_lense()
+{
+    local IFS=$'\n'
+    COMPREPLY=( $(lense __complete "${COMP_WORDS[@]:1:COMP_CWORD}" 2>/dev/null) )
+}
+complete -F _lense lense